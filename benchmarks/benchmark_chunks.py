@@ -0,0 +1,73 @@
+# benchmark_chunks.py
+"""
+Description: Time FileTools.chunks_generator against the previous implementation on a list, an ndarray and a
+generator, and with overlapping windows.
+
+The previous implementation needed len() and slicing, so a generator had to be materialised as a list first; that
+cost, and the peak memory it implies, is included in its time.
+
+Example usage:
+
+python -m benchmarks.benchmark_chunks --help
+python -m benchmarks.benchmark_chunks -n 10000000 -c 1000
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from src.file_tools import FileTools
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Benchmark chunking large sequences and iterables')
+    parser.add_argument('-n', '--num_elements', type=int, default=10000000, help='Number of elements')
+    parser.add_argument('-c', '--chunk_size', type=int, default=1000, help='Elements per chunk')
+    parser.add_argument('-s', '--step', type=int, default=500, help='Step for the overlapping window runs')
+
+    return parser.parse_args()
+
+
+def previous_chunks_generator(input_list: list, chunk_size: int) -> list:
+    """chunks_generator as it was"""
+    remainder = len(input_list) - (int(len(input_list)/chunk_size) * chunk_size)
+    for i in range(0, int(len(input_list) / chunk_size)):
+        yield input_list[i * chunk_size: (i + 1) * chunk_size]
+    if remainder > 0:
+        yield input_list[-remainder:]
+
+
+def consume(chunks) -> int:
+    return sum(len(chunk) for chunk in chunks)
+
+
+def main():
+    args = parse_args()
+    n, chunk_size = args.num_elements, args.chunk_size
+    as_list = list(range(n))
+    as_array = np.arange(n)
+
+    runs = [
+        ('previous, list', lambda: previous_chunks_generator(as_list, chunk_size)),
+        ('chunks_generator, list', lambda: FileTools.chunks_generator(as_list, chunk_size)),
+        ('previous, ndarray', lambda: previous_chunks_generator(as_array, chunk_size)),
+        ('chunks_generator, ndarray', lambda: FileTools.chunks_generator(as_array, chunk_size)),
+        ('previous, generator via list', lambda: previous_chunks_generator(list(x for x in range(n)), chunk_size)),
+        ('chunks_generator, generator', lambda: FileTools.chunks_generator((x for x in range(n)), chunk_size)),
+        (f'windows step {args.step}, list', lambda: FileTools.chunks_generator(as_list, chunk_size, args.step)),
+        (f'windows step {args.step}, generator',
+         lambda: FileTools.chunks_generator((x for x in range(n)), chunk_size, args.step)),
+    ]
+
+    print(f'{n} elements, chunks of {chunk_size}')
+    print(f'{"run":<36} {"seconds":>8} {"elements":>12}')
+    for name, run in runs:
+        start = time.perf_counter()
+        elements = consume(run())
+        elapsed = time.perf_counter() - start
+        print(f'{name:<36} {elapsed:>8.2f} {elements:>12}')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+# benchmark_decompression.py
+"""
+Description: Compare archive formats for mirroring datasets, by compressed size and by the time
+ArchiveExtractor.extract takes to unpack each. zstd is included when the zstandard package is installed.
+
+Example usage:
+
+python -m benchmarks.benchmark_decompression --help
+python -m benchmarks.benchmark_decompression -m 64 -n 2000
+"""
+
+import argparse
+import io
+import os
+import random
+import tarfile
+import tempfile
+import time
+import zipfile
+
+from pathlib import Path
+from src.archive_extractor import ArchiveExtractor, zstandard
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Benchmark extraction throughput per archive format')
+    parser.add_argument('-m', '--megabytes', type=int, default=64, help='Total uncompressed size, in MB')
+    parser.add_argument('-n', '--members', type=int, default=2000, help='Number of files in each archive')
+    parser.add_argument('-r', '--random_fraction', type=float, default=0.5,
+                        help='Fraction of each file that is incompressible, as for JPEG content')
+
+    return parser.parse_args()
+
+
+def make_members(megabytes: int, members: int, random_fraction: float) -> dict:
+    rng = random.Random(0)
+    words = [bytes(rng.choice(b'abcdefghijklmnop') for _ in range(rng.randint(3, 10))) for _ in range(2000)]
+    size = megabytes * 1000000 // members
+    random_size = int(size * random_fraction)
+    content = {}
+    for i in range(members):
+        text = b' '.join(rng.choice(words) for _ in range((size - random_size) // 7))[:size - random_size]
+        content[f'data/class_{i % 7}/file_{i:05d}.bin'] = text + os.urandom(random_size)
+
+    return content
+
+
+def write_archives(content: dict, temp_dir: str) -> dict:
+    """Write the same content in each available format, returning {format: path}"""
+    tar_buffer = io.BytesIO()
+    with tarfile.open(fileobj=tar_buffer, mode='w') as tar_ref:
+        for name, data in content.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tar_ref.addfile(info, io.BytesIO(data))
+    tar_bytes = tar_buffer.getvalue()
+
+    paths = {'tar': os.path.join(temp_dir, 'data.tar')}
+    with open(paths['tar'], 'wb') as outfile:
+        outfile.write(tar_bytes)
+
+    for compression in ('gz', 'bz2', 'xz'):
+        paths[f'tar.{compression}'] = os.path.join(temp_dir, f'data.tar.{compression}')
+        with tarfile.open(paths[f'tar.{compression}'], f'w:{compression}') as tar_ref:
+            for name, data in content.items():
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                tar_ref.addfile(info, io.BytesIO(data))
+
+    if zstandard is not None:
+        paths['tar.zst'] = os.path.join(temp_dir, 'data.tar.zst')
+        with open(paths['tar.zst'], 'wb') as outfile:
+            outfile.write(zstandard.ZstdCompressor(level=3).compress(tar_bytes))
+
+    paths['zip'] = os.path.join(temp_dir, 'data.zip')
+    with zipfile.ZipFile(paths['zip'], 'w', compression=zipfile.ZIP_DEFLATED) as zip_ref:
+        for name, data in content.items():
+            zip_ref.writestr(name, data)
+
+    return paths
+
+
+def main():
+    args = parse_args()
+    content = make_members(args.megabytes, args.members, args.random_fraction)
+    total = sum(len(data) for data in content.values())
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        paths = write_archives(content, temp_dir)
+        if zstandard is None:
+            print('zstandard not installed, skipping tar.zst')
+        print(f'{args.members} files, {total / 1e6:.0f} MB uncompressed')
+        print(f'{"format":>8} {"MB":>8} {"ratio":>6} {"seconds":>8} {"MB/s out":>9} {"identical":>10}')
+
+        for archive_type, archive_path in paths.items():
+            target_dir = os.path.join(temp_dir, f'extracted_{archive_type}')
+            start = time.perf_counter()
+            ArchiveExtractor.extract(archive_path, target_dir, strip_top_level_dir=False)
+            elapsed = time.perf_counter() - start
+
+            identical = all(Path(target_dir, name).read_bytes() == data
+                            for name, data in content.items())
+            compressed = os.path.getsize(archive_path)
+            print(f'{archive_type:>8} {compressed / 1e6:>8.1f} {total / compressed:>6.2f} {elapsed:>8.2f} '
+                  f'{total / 1e6 / elapsed:>9.1f} {str(identical):>10}')
+
+
+if __name__ == "__main__":
+    main()
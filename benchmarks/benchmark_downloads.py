@@ -0,0 +1,50 @@
+# benchmark_downloads.py
+"""
+Description: Time DownloadHelper.download_url against a local server that throttles each connection, to show the
+aggregate throughput of segmented downloads.
+
+Example usage:
+
+python -m benchmarks.benchmark_downloads --help
+python -m benchmarks.benchmark_downloads -m 32 -r 4
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from src.download_helper import DownloadHelper
+from tests.http_test_server import LocalFileServer
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Benchmark single and segmented downloads from a throttled server')
+    parser.add_argument('-m', '--megabytes', type=int, default=16, help='Size of file to download, in MiB')
+    parser.add_argument('-r', '--rate', type=float, default=4, help='Throttle per connection, in MB/s')
+    parser.add_argument('-s', '--segments', type=int, nargs='+', default=[1, 2, 4, 8],
+                        help='Segment counts to time; files under DownloadHelper.MIN_SEGMENT_SIZE per segment use one')
+
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    content = os.urandom(args.megabytes * 1024 * 1024)
+
+    print(f'{args.megabytes} MiB file, server throttled to {args.rate} MB/s per connection')
+    print(f'{"segments":>8} {"seconds":>10} {"MiB/s":>8} {"identical":>10}')
+    with tempfile.TemporaryDirectory() as temp_dir, \
+            LocalFileServer({'/data.bin': content}, rate=int(args.rate * 1000000)) as server:
+        for segments in args.segments:
+            target_path = os.path.join(temp_dir, f'data_{segments}.bin')
+            start = time.perf_counter()
+            DownloadHelper.download_url(server.url('/data.bin'), target_path, segments=segments)
+            elapsed = time.perf_counter() - start
+            with open(target_path, 'rb') as infile:
+                identical = infile.read() == content
+            print(f'{segments:>8} {elapsed:>10.2f} {args.megabytes / elapsed:>8.1f} {str(identical):>10}')
+
+
+if __name__ == "__main__":
+    main()
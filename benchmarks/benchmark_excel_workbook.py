@@ -0,0 +1,89 @@
+# benchmark_excel_workbook.py
+"""
+Description: Time FileTools.df_from_excel_workbook against the previous implementation on a synthetic many-sheet
+workbook, with some sheets excluded, serially, in a process pool, and with a column subset.
+
+Example usage:
+
+python -m benchmarks.benchmark_excel_workbook --help
+python -m benchmarks.benchmark_excel_workbook -s 50 -r 2000 -w 4
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.file_tools import FileTools
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Benchmark reading a many-sheet Excel workbook')
+    parser.add_argument('-s', '--sheets', type=int, default=50, help='Number of worksheets')
+    parser.add_argument('-r', '--rows', type=int, default=2000, help='Rows per worksheet')
+    parser.add_argument('-x', '--excluded', type=int, default=10, help='Number of worksheets excluded')
+    parser.add_argument('-w', '--workers', type=int, default=os.cpu_count() or 1, help='Processes for the pool run')
+
+    return parser.parse_args()
+
+
+def previous_df_from_excel_workbook(src_path: str, sheet_exceptions: list) -> pd.DataFrame:
+    """df_from_excel_workbook as it was: every sheet parsed, exclusions dropped afterwards"""
+    wb = pd.ExcelFile(src_path)
+    df_sheets = pd.read_excel(wb, sheet_name=None)
+    for sheet in sheet_exceptions:
+        df_sheets.pop(sheet, None)
+    for k, v in df_sheets.items():
+        v.insert(0, 'Source', k)
+    df = pd.concat(df_sheets)
+    df.reset_index(inplace=True, drop=True)
+
+    return df
+
+
+def write_workbook(file_path: str, sheets: int, rows: int):
+    rng = np.random.default_rng(0)
+    with pd.ExcelWriter(file_path) as writer:
+        for i in range(sheets):
+            pd.DataFrame({'Id': np.arange(rows), 'Value': rng.random(rows), 'Code': rng.integers(0, 100, rows),
+                          'Label': [f'label {j % 37}' for j in range(rows)]}).to_excel(writer, sheet_name=f'Sheet{i}',
+                                                                                       index=False)
+
+
+def main():
+    args = parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        file_path = os.path.join(temp_dir, 'workbook.xlsx')
+        write_workbook(file_path, args.sheets, args.rows)
+        excluded = [f'Sheet{i}' for i in range(args.excluded)]
+
+        runs = [
+            ('previous', lambda: previous_df_from_excel_workbook(file_path, excluded)),
+            ('df_from_excel_workbook', lambda: FileTools.df_from_excel_workbook(file_path, excluded)),
+            (f'{args.workers} workers', lambda: FileTools.df_from_excel_workbook(file_path, excluded,
+                                                                                 workers=args.workers)),
+            (f'{args.workers} workers, 2 columns',
+             lambda: FileTools.df_from_excel_workbook(file_path, excluded, workers=args.workers,
+                                                      usecols=['Id', 'Code'], dtype={'Id': 'int64', 'Code': 'int16'})),
+        ]
+
+        print(f'{args.sheets} sheets of {args.rows} rows, {args.excluded} excluded')
+        print(f'{"run":<32} {"seconds":>8} {"rows":>10}')
+        baseline = None
+        for name, run in runs:
+            start = time.perf_counter()
+            df = run()
+            elapsed = time.perf_counter() - start
+            if baseline is None:
+                baseline = df
+            elif 'columns' not in name:
+                pd.testing.assert_frame_equal(df, baseline)
+            print(f'{name:<32} {elapsed:>8.2f} {len(df):>10}')
+
+
+if __name__ == "__main__":
+    main()
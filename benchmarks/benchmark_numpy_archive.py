@@ -0,0 +1,110 @@
+# benchmark_numpy_archive.py
+"""
+Description: Time FileTools.create_numpy_archive_from_images_dir on a directory of synthetic JPEGs.
+
+Example usage:
+
+python -m benchmarks.benchmark_numpy_archive --help
+python -m benchmarks.benchmark_numpy_archive -n 2000
+python -m benchmarks.benchmark_numpy_archive -n 500 --size 2000 -e
+python -m benchmarks.benchmark_numpy_archive -s data/isic2018/ISIC2018_Task3_Training_Input
+"""
+
+import argparse
+import filecmp
+import numpy as np
+import os
+import tempfile
+import time
+
+from PIL import Image
+from src.file_tools import FileTools
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Benchmark numpy archive creation from an images directory')
+    parser.add_argument('-s', '--src_dir', type=str, default='',
+                        help='Directory of source images (default: generate synthetic images)')
+    parser.add_argument('-n', '--num_images', type=int, default=500,
+                        help='Number of synthetic images to generate')
+    parser.add_argument('--size', type=int, default=600, help='Edge length of synthetic images')
+    parser.add_argument('--new_shape', type=int, nargs=2, default=(64, 64), help='Target shape of archived images')
+    parser.add_argument('-e', '--compare_engines', action='store_true',
+                        help='Compare resize engines (serial) instead of worker counts')
+
+    return parser.parse_args()
+
+
+def make_synthetic_images(target_dir: str, num_images: int, size: int):
+    rng = np.random.default_rng(0)
+    # Smooth gradients plus noise compress like photographs rather than like pure noise
+    gradient = np.linspace(0, 255, size, dtype='float')[np.newaxis, :, np.newaxis]
+    for i in range(num_images):
+        noise = rng.normal(0, 20, (size, size, 3))
+        img = np.clip(gradient + noise + i % 64, 0, 255).astype('uint8')
+        Image.fromarray(img).save(os.path.join(target_dir, f'image{i:06d}.jpg'), quality=90)
+
+
+def worker_counts() -> list:
+    counts = [1]
+    while counts[-1] * 2 <= (os.cpu_count() or 1):
+        counts.append(counts[-1] * 2)
+    if counts[-1] != os.cpu_count():
+        counts.append(os.cpu_count())
+
+    return counts
+
+
+def benchmark_workers(src_dir: str, temp_dir: str, new_shape: tuple, num_images: int):
+    """Time each worker count and check the archive matches the serial one byte for byte."""
+    print(f'{"workers":>8} {"seconds":>10} {"images/s":>10} {"identical":>10}')
+    serial_path = ''
+    for workers in worker_counts():
+        target_path = os.path.join(temp_dir, f'archive_{workers}')
+        start = time.perf_counter()
+        FileTools.create_numpy_archive_from_images_dir(src_dir, target_path, new_shape, workers=workers)
+        elapsed = time.perf_counter() - start
+        if serial_path == '':
+            serial_path = target_path + '.npy'
+        identical = filecmp.cmp(serial_path, target_path + '.npy', shallow=False)
+        print(f'{workers:>8} {elapsed:>10.2f} {num_images / elapsed:>10.1f} {str(identical):>10}')
+
+
+def benchmark_resize_engines(src_dir: str, temp_dir: str, new_shape: tuple, num_images: int):
+    """Time each resize engine and report pixel differences against the reference 'skimage' engine."""
+    print(f'{"engine":>8} {"seconds":>10} {"images/s":>10} {"speedup":>8} {"max diff":>9} {"mean diff":>10}')
+    reference = None
+    reference_elapsed = 0
+    for engine in FileTools.RESIZE_ENGINES:
+        target_path = os.path.join(temp_dir, f'archive_{engine}')
+        start = time.perf_counter()
+        FileTools.create_numpy_archive_from_images_dir(src_dir, target_path, new_shape, resize_engine=engine)
+        elapsed = time.perf_counter() - start
+        images = np.load(target_path + '.npy')
+        if reference is None:
+            reference, reference_elapsed = images, elapsed
+        diff = np.abs(images - reference)
+        print(f'{engine:>8} {elapsed:>10.2f} {num_images / elapsed:>10.1f} {reference_elapsed / elapsed:>8.1f} '
+              f'{diff.max():>9} {diff.mean():>10.3f}')
+
+
+def main():
+    args = parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        src_dir = args.src_dir
+        if src_dir == '':
+            src_dir = os.path.join(temp_dir, 'images')
+            os.mkdir(src_dir)
+            make_synthetic_images(src_dir, args.num_images, args.size)
+        num_images = len([f for f in os.listdir(src_dir) if f.endswith('.jpg')])
+
+        print(f'{num_images} images, new_shape {tuple(args.new_shape)}, {os.cpu_count()} cores')
+        if args.compare_engines:
+            benchmark_resize_engines(src_dir, temp_dir, tuple(args.new_shape), num_images)
+        else:
+            benchmark_workers(src_dir, temp_dir, tuple(args.new_shape), num_images)
+
+
+if __name__ == "__main__":
+    main()
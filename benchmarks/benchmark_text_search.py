@@ -0,0 +1,96 @@
+# benchmark_text_search.py
+"""
+Description: Time FileTools.list_lines_with_term against the previous line-by-line implementation on a synthetic
+log, and TextSearch with several terms, memory-mapped and block-read.
+
+Example usage:
+
+python -m benchmarks.benchmark_text_search --help
+python -m benchmarks.benchmark_text_search -m 1024
+"""
+
+import argparse
+import os
+import random
+import string
+import tempfile
+import time
+
+from src.file_tools import FileTools
+from src.text_search import TextSearch
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Benchmark searching a large log for terms')
+    parser.add_argument('-m', '--megabytes', type=int, default=1024, help='Size of log to search, in MB')
+    parser.add_argument('-f', '--hit_fraction', type=float, default=0.01, help='Fraction of lines with a term')
+    parser.add_argument('-t', '--terms', type=str, nargs='+', default=['ERROR', 'Traceback', 'timeout'],
+                        help='Terms for the multi-term runs; the first is used for single-term runs')
+
+    return parser.parse_args()
+
+
+def line_by_line(file_path: str, term: str, exceptions: str = '') -> list:
+    """list_lines_with_term as it was: one readline, find and 32 str.replace passes per hit"""
+    punctuation = [c for c in string.punctuation if c not in exceptions]
+
+    found_list = []
+    with open(file_path, 'r') as infile:
+        for line in infile:
+            if line.find(term) > -1:
+                line = line.replace('\n', '').replace('\\n', '')
+                for c in punctuation:
+                    line = line.replace(c, ' ').strip()
+                found_list.append(line)
+
+    return found_list
+
+
+def write_log(file_path: str, megabytes: int, hit_fraction: float, terms: list):
+    rng = random.Random(0)
+    lines = [f'2023-02-{day:02d} 12:{minute:02d}:00 INFO worker-{worker} processed batch {batch} in 0.{batch}s '
+             f'[module.sub:{worker * 7}] key=value, other="quoted"\n'
+             for day, minute, worker, batch in zip(range(1, 29), range(60), range(10), range(1000, 2000))]
+    hits = [f'2023-02-14 12:00:00 {term} worker-3 failed: connection reset (errno=104)\n' for term in terms]
+    block = ''.join(rng.choice(hits) if rng.random() < hit_fraction else rng.choice(lines) for _ in range(10000))
+    block = block.encode('utf-8')
+
+    with open(file_path, 'wb') as outfile:
+        for _ in range(max(1, megabytes * 1000000 // len(block))):
+            outfile.write(block)
+
+
+def main():
+    args = parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        file_path = os.path.join(temp_dir, 'big.log')
+        write_log(file_path, args.megabytes, args.hit_fraction, args.terms)
+        size_mb = os.path.getsize(file_path) / 1e6
+        term = args.terms[0]
+
+        runs = [
+            (f'line by line, "{term}"', lambda: line_by_line(file_path, term)),
+            (f'list_lines_with_term, "{term}"', lambda: FileTools.list_lines_with_term(file_path, term)),
+            (f'TextSearch blocks, {len(args.terms)} terms',
+             lambda: [line for _, line in TextSearch(args.terms).search_file(file_path)]),
+            (f'TextSearch mmap, {len(args.terms)} terms',
+             lambda: [line for _, line in TextSearch(args.terms).search_file(file_path, use_mmap=True)]),
+        ]
+
+        print(f'{size_mb:.0f} MB log, {args.hit_fraction:.1%} of lines with a term')
+        print(f'{"run":<36} {"seconds":>8} {"MB/s":>8} {"lines":>10}')
+        baseline = None
+        for name, run in runs:
+            start = time.perf_counter()
+            found = run()
+            elapsed = time.perf_counter() - start
+            if baseline is None:
+                baseline = found
+            elif len(args.terms) == 1 or 'list_lines' in name:
+                assert found == baseline, f'{name} differs from line by line'
+            print(f'{name:<36} {elapsed:>8.2f} {size_mb / elapsed:>8.0f} {len(found):>10}')
+
+
+if __name__ == "__main__":
+    main()
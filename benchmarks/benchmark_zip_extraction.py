@@ -0,0 +1,73 @@
+# benchmark_zip_extraction.py
+"""
+Description: Time ArchiveExtractor.extract_zip with different numbers of worker processes on a synthetic zip of
+many small, compressible members, similar in shape to an ISIC training archive.
+
+Example usage:
+
+python -m benchmarks.benchmark_zip_extraction --help
+python -m benchmarks.benchmark_zip_extraction -n 10000 -w 1 2 4 8
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+import zipfile
+
+from pathlib import Path
+from src.archive_extractor import ArchiveExtractor
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Benchmark serial and parallel zip extraction')
+    parser.add_argument('-n', '--members', type=int, default=10000, help='Number of files in the zip')
+    parser.add_argument('-s', '--size', type=int, default=50000, help='Approximate size of each file, in bytes')
+    parser.add_argument('-w', '--workers', type=int, nargs='+', default=[1, 2, 4, os.cpu_count()],
+                        help='Worker counts to time')
+
+    return parser.parse_args()
+
+
+def make_zip(archive_path: str, members: int, size: int):
+    rng = random.Random(0)
+    words = [bytes(rng.choice(b'abcdefghij') for _ in range(8)) for _ in range(1000)]
+    with zipfile.ZipFile(archive_path, 'w', compression=zipfile.ZIP_DEFLATED) as zip_ref:
+        zip_ref.writestr('data/', b'')
+        for i in range(members):
+            content = b' '.join(rng.choice(words) for _ in range(size // 9)) + os.urandom(size // 10)
+            zip_ref.writestr(f'data/class_{i % 7}/image_{i:05d}.jpg', content)
+
+
+def tree(root_dir: str) -> dict:
+    return {Path(root, name).relative_to(root_dir).as_posix(): Path(root, name).read_bytes()
+            for root, _, names in os.walk(root_dir) for name in names}
+
+
+def main():
+    args = parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        archive_path = os.path.join(temp_dir, 'data.zip')
+        make_zip(archive_path, args.members, args.size)
+        print(f'{args.members} members, {os.path.getsize(archive_path) / 1e6:.1f} MB zip, {os.cpu_count()} cpus')
+        print(f'{"workers":>8} {"seconds":>10} {"speedup":>8} {"identical":>10}')
+
+        baseline_seconds = 0
+        baseline_tree = None
+        for workers in args.workers:
+            target_dir = os.path.join(temp_dir, f'extracted_{workers}')
+            start = time.perf_counter()
+            ArchiveExtractor.extract_zip(archive_path, target_dir, workers=workers)
+            elapsed = time.perf_counter() - start
+
+            extracted = tree(target_dir)
+            if baseline_tree is None:
+                baseline_seconds, baseline_tree = elapsed, extracted
+            print(f'{workers:>8} {elapsed:>10.2f} {baseline_seconds / elapsed:>8.2f} '
+                  f'{str(extracted == baseline_tree):>10}')
+
+
+if __name__ == "__main__":
+    main()
@@ -21,8 +21,25 @@ python get_dataset.py -d data -wd isic2018 -i -s https://isic-challenge-data.s3.
 python get_dataset.py -d data -wd isic2018 -i -s https://isic-challenge-data.s3.amazonaws.com/2018/ISIC2018_Task3_Validation_GroundTruth.zip
 python get_dataset.py -d data -wd isic2018 -i -s https://isic-challenge-data.s3.amazonaws.com/2018/ISIC2018_Task3_Test_Input.zip
 python get_dataset.py -d data -s http://bergerlab-downloads.csail.mit.edu/spatial-vae/mnist_rotated.tar.gz
+python get_dataset.py -d data -re pil -s http://bergerlab-downloads.csail.mit.edu/spatial-vae/mnist_rotated.tar.gz
+python get_dataset.py -d data -c data/cache -s https://isic-challenge-data.s3.amazonaws.com/2018/ISIC2018_Task3_Training_LesionGroupings.csv
+python get_dataset.py -d data -p -s http://bergerlab-downloads.csail.mit.edu/spatial-vae/mnist_rotated.tar.gz
 python get_dataset.py -d data -rd -i -s https://isic-challenge-data.s3.amazonaws.com/2018/ISIC2018_Task3_Training_LesionGroupings.csv
 
+Several files in one run, downloading concurrently and extracting each as soon as it arrives:
+python get_dataset.py -d data --manifest isic2018_manifest.json
+
+where isic2018_manifest.json lists the files, each with its src_url and optional overrides of the other command line
+flags:
+[
+    {"src_url": "https://isic-challenge-data.s3.amazonaws.com/2018/ISIC2018_Task3_Training_Input.zip",
+     "is_isic": true, "working_dir": "isic2018"},
+    {"src_url": "https://isic-challenge-data.s3.amazonaws.com/2018/ISIC2018_Task3_Training_GroundTruth.zip",
+     "is_isic": true, "working_dir": "isic2018"},
+    {"src_url": "https://isic-challenge-data.s3.amazonaws.com/2018/ISIC2018_Task3_Test_Input.zip",
+     "is_isic": true, "working_dir": "isic2018", "as_unclassed": true}
+]
+
 Unclassified structure:
 python get_dataset.py -d data -wd isic2018 -i -u -s https://isic-challenge-data.s3.amazonaws.com/2018/ISIC2018_Task3_Training_Input.zip
 python get_dataset.py -d data -wd isic2018 -i -u -s https://isic-challenge-data.s3.amazonaws.com/2018/ISIC2018_Task3_Validation_Input.zip
@@ -32,7 +49,10 @@ python get_dataset.py -d data -wd isic2018 -i -u -s https://isic-challenge-data.
 """
 
 import argparse
+import json
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from src.download_helper import DownloadHelper
 from src.file_tools import FileTools
@@ -40,7 +60,7 @@ from src.file_tools import FileTools
 DOWNLOAD_URL = 'https://isic-challenge-data.s3.amazonaws.com/2018/ISIC2018_Task3_Training_LesionGroupings.csv'
 
 
-def parse_args():
+def parse_args(argv: list = None):
     parser = argparse.ArgumentParser(description='Download the target training dataset')
     parser.add_argument('-d', '--data_dir', type=str, help="Path to the root target data directory")
     parser.add_argument('-rd', '--replace_download', action='store_true',
@@ -55,27 +75,137 @@ def parse_args():
                         help='Target directory for extraction etc (optional)')
     parser.add_argument('-u', '--as_unclassed', action='store_true',
                         help="Folder structure for unclassed data")
-
-    args = parser.parse_args()
+    parser.add_argument('-re', '--resize_engine', type=str, default='skimage', choices=FileTools.RESIZE_ENGINES,
+                        help="Engine for resizing images into the numpy archive; 'pil' is faster for large JPEGs")
+    parser.add_argument('-m', '--manifest', type=str, default='',
+                        help="JSON file listing items to fetch, each with src_url and optional overrides of other flags")
+    parser.add_argument('-w', '--workers', type=int, default=4,
+                        help="Maximum concurrent downloads when using a manifest")
+    parser.add_argument('-p', '--pipelined', action='store_true',
+                        help="Extract tar archives while they download")
+    parser.add_argument('-nk', '--no_keep_download', action='store_true',
+                        help="With --pipelined, do not keep a copy of the archive under downloads")
+    parser.add_argument('-c', '--cache_dir', type=str, default='',
+                        help="Directory of a download cache; unchanged remote files are not downloaded again")
+    parser.add_argument('-sha', '--sha256', type=str, default='',
+                        help="Expected SHA-256 of the download, verified when using --cache_dir")
+    parser.add_argument('-xw', '--extract_workers', type=int, default=1,
+                        help="Number of processes for extracting zip archives")
+
+    args = parser.parse_args(argv)
 
     return args
 
 
-def download_and_extract_file(args):
-    can_extract_to_extraction_dir, working_dir, final_extraction_dir, download_file_path = DownloadHelper.download_file(
+def download(args, progress_callback=None):
+    return DownloadHelper.download_file(
         data_dir=args.data_dir,
         replace_download=args.replace_download, replace_unzip_content=args.replace_unzip_content,
-        src_url=args.src_url, is_isic=args.is_isic, working_dir=args.working_dir)
+        src_url=args.src_url, is_isic=args.is_isic, working_dir=args.working_dir,
+        pipelined=args.pipelined, keep_download=not args.no_keep_download,
+        cache_dir=args.cache_dir, sha256=args.sha256, progress_callback=progress_callback)
+
+
+def extract_and_process(args, download_result):
+    can_extract_to_extraction_dir, working_dir, final_extraction_dir, download_file_path = download_result
 
     if can_extract_to_extraction_dir:
         # Have an archive, and it's ok to unzip it
         DownloadHelper.unzip_archive(archive_file_path=download_file_path,
-                                     data_dir=args.data_dir, final_extraction_dir=final_extraction_dir)
+                                     data_dir=args.data_dir, final_extraction_dir=final_extraction_dir,
+                                     streaming=True, workers=args.extract_workers)
     else:
         DownloadHelper.move_non_archive_file_to_working_dir(download_file_path=download_file_path,
                                                             working_dir=working_dir)
 
-    return final_extraction_dir, working_dir
+    if args.as_unclassed:
+        FileTools.copy_dir_as_unclassed(final_extraction_dir, f'{working_dir}_unclassed')
+    elif not args.is_isic:
+        result = FileTools.create_numpy_archive_from_images_dir(
+            src_dir=final_extraction_dir, target_path=final_extraction_dir, new_shape=(64, 64), suffix='.jpg',
+            resize_engine=args.resize_engine)
+
+        print(result)
+
+
+def download_and_extract_file(args):
+    download_result = download(args)
+    extract_and_process(args, download_result)
+
+    return download_result[2], download_result[1]
+
+
+def manifest_items(args) -> list:
+    """Arguments for each item of the manifest, defaulting to the command line arguments other than src_url
+
+    Raises ValueError for an item without src_url, with unknown keys, or with the same download path as another.
+    """
+    with open(args.manifest, 'r', encoding='utf-8') as infile:
+        items = json.load(infile)
+
+    item_args = []
+    download_paths = {}
+    for index, item in enumerate(items):
+        if not item.get('src_url'):
+            raise ValueError(f'Manifest item {index} has no src_url')
+        unknown = set(item) - set(vars(args))
+        if unknown:
+            raise ValueError(f'Unknown manifest keys {sorted(unknown)} for {item["src_url"]}')
+        item_args.append(argparse.Namespace(**{**vars(args), **item}))
+
+        # Items are downloaded concurrently, so two writing the same file would corrupt it
+        download_path = os.path.abspath(os.path.join(item_args[-1].data_dir, 'downloads',
+                                                     Path(item['src_url']).name))
+        if download_path in download_paths:
+            raise ValueError(f'Manifest items {download_paths[download_path]} and {index} both download to '
+                             f'{download_path}; give one a different data_dir')
+        download_paths[download_path] = index
+
+    return item_args
+
+
+def download_and_extract_manifest(args) -> list:
+    """Download manifest items concurrently, extracting each as soon as its download finishes.
+
+    Extraction runs on a single thread, so extraction does not compete with itself for disk and CPU.
+
+    :return: per manifest item, in manifest order, dict of download and extract seconds, and download rate
+    """
+    items = manifest_items(args)
+    timings = [{} for _ in items]
+    start = time.perf_counter()
+
+    def timed(index, stage, function, *function_args):
+        stage_start = time.perf_counter()
+        result = function(*function_args)
+        timings[index][stage] = time.perf_counter() - stage_start
+        return result
+
+    def record_rate(index):
+        def progress_callback(stats):
+            timings[index]['rate'] = stats['bytes_per_second']
+        return progress_callback
+
+    with ThreadPoolExecutor(max_workers=args.workers) as download_executor, \
+            ThreadPoolExecutor(max_workers=1) as extract_executor:
+        downloads = {download_executor.submit(timed, index, 'download', download, item, record_rate(index)): index
+                     for index, item in enumerate(items)}
+        extractions = []
+        for future in as_completed(downloads):
+            index = downloads[future]
+            extractions.append(extract_executor.submit(timed, index, 'extract', extract_and_process, items[index],
+                                                       future.result()))
+        for future in extractions:
+            future.result()
+
+    print(f'\n{"download (s)":>12} {"MB/s":>8} {"extract (s)":>12}  file')
+    for item, timing in zip(items, timings):
+        print(f'{timing.get("download", 0):>12.1f} {timing.get("rate", 0) / 1e6:>8.1f} '
+              f'{timing.get("extract", 0):>12.1f}  {item.src_url.split("/")[-1]}')
+    print(f'{len(items)} items in {time.perf_counter() - start:.1f}s; '
+          f'{sum(t.get("download", 0) + t.get("extract", 0) for t in timings):.1f}s if run one by one')
+
+    return timings
 
 
 def main():
@@ -84,15 +214,10 @@ def main():
                                         save_path=os.path.join(Path(args.data_dir).parent,'Command args.txt'),
                                         to_print=True)
 
-    extraction_dir, working_dir = download_and_extract_file(args)
-
-    if args.as_unclassed:
-        FileTools.copy_dir_as_unclassed(extraction_dir, f'{working_dir}_unclassed')
-    elif not args.is_isic:
-        result = FileTools.create_numpy_archive_from_images_dir(
-            src_dir=extraction_dir, target_path=extraction_dir, new_shape=(64, 64), suffix='.jpg')
-
-        print(result)
+    if args.manifest:
+        download_and_extract_manifest(args)
+    else:
+        download_and_extract_file(args)
 
 
 if __name__ == "__main__":
@@ -1,16 +1,22 @@
-
 import pprint
 from src.file_tools import FileTools as ft
+from src.text_search import TextSearch
 
 folder_path = r"C:\Users\cframe\OneDrive - Sopra Steria\Documents\Training\Python Basics"
 
-for file in ['Python_Basic_Advanced_Sessions_Feb23.ipynb', 'Python_Advanced_2.ipynb', 'Python_GUI_Updated.ipynb']:
-    print(f'FILE: *********** {file} ***************')
-    file_path = f'{folder_path}\\{file}'
-    imports = ft.list_lines_with_term(file_path=file_path, term='import', exceptions='#')
 
-    imports = list(set(imports))
-    imports.sort()
+def main():
+    # All notebooks under the folder, searched in parallel; every notebook is listed, even with no imports
+    path = f'{folder_path}\\**\\*.ipynb'
+    imports = {file_path: set() for file_path in TextSearch.files_to_search(path)}
+    for file_path, line_no, line in ft.lines_with_term_in_files(path=path, term='import', exceptions='#', workers=4):
+        imports[file_path].add(line)
+
+    for file_path, lines in imports.items():
+        print(f'FILE: *********** {file_path} ***************')
+        for line in sorted(lines):
+            print(line)
+
 
-    for line in imports:
-        print(line)
+if __name__ == "__main__":
+    main()
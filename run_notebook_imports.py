@@ -0,0 +1,14 @@
+from src.notebook_index import NotebookImportIndex
+
+folder_path = r"C:\Users\cframe\OneDrive - Sopra Steria\Documents\Training\Python Basics"
+
+# Imports from code cells only; notebooks unchanged since the last run are not read again
+index = NotebookImportIndex(index_path=f'{folder_path}\\notebook_imports.json')
+for file_path, imports in index.update(path=folder_path).items():
+    print(f'FILE: *********** {file_path} ***************')
+    for statement in imports:
+        print(statement)
+
+print('ALL: ***************')
+for statement in index.all_imports():
+    print(statement)
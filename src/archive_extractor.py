@@ -0,0 +1,386 @@
+# archive_extractor.py
+
+import bz2
+import gzip
+import lzma
+import os
+import shutil
+import tarfile
+import uuid
+import zipfile
+
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path, PurePosixPath
+
+try:
+    import zstandard
+except ImportError:
+    # Optional, only needed for .zst archives
+    zstandard = None
+
+
+class ArchiveExtractor:
+    """Extract archives whose content sits inside a single top-level folder straight into place.
+
+    Member paths are rewritten on the fly to drop that folder, and files are written into a staging directory next
+    to the final one, which is then swapped into place. Compared with extracting to a temp directory, removing the
+    old target and moving the new one across, peak disk use is about one copy of the data, and the final directory
+    is never left half-written.
+
+    Archive types are sniffed from magic bytes rather than file suffixes, see archive_type.
+    """
+
+    COPY_BUFFER_SIZE = 1024 * 1024
+
+    ARCHIVE_TYPES = ('zip', 'tar', 'tar.gz', 'tar.bz2', 'tar.xz', 'tar.zst', 'gz', 'bz2', 'xz', 'zst')
+
+    # Leading bytes of each single-stream compression format
+    COMPRESSION_MAGIC = {
+        'gz': b'\x1f\x8b',
+        'bz2': b'BZh',
+        'xz': b'\xfd7zXZ\x00',
+        'zst': b'\x28\xb5\x2f\xfd',
+    }
+
+    ZIP_MAGIC = (b'PK\x03\x04', b'PK\x05\x06')
+
+    @staticmethod
+    def compression_of(header: bytes) -> str:
+        """Compression format of a stream from its leading bytes, or '' if not compressed"""
+        for compression, magic in ArchiveExtractor.COMPRESSION_MAGIC.items():
+            if header.startswith(magic):
+                return compression
+
+        return ''
+
+    @staticmethod
+    def is_tar_header(header: bytes) -> bool:
+        """Whether the leading bytes of an uncompressed stream are a POSIX or GNU tar header"""
+        return len(header) >= 262 and header[257:262] == b'ustar'
+
+    @staticmethod
+    def open_decompressed(archive, compression: str):
+        """Readable binary stream of decompressed content
+
+        :param archive: path to file, or a readable binary file object
+        :param compression: one of COMPRESSION_MAGIC keys, or '' for no compression
+        :return: file object, closing which also closes any file opened here
+        """
+        if compression == 'gz':
+            return gzip.open(archive, 'rb')
+        elif compression == 'bz2':
+            return bz2.open(archive, 'rb')
+        elif compression == 'xz':
+            return lzma.open(archive, 'rb')
+        elif compression == 'zst':
+            if zstandard is None:
+                raise ImportError('The zstandard package is required for .zst archives: pip install zstandard')
+            src = open(archive, 'rb') if isinstance(archive, (str, os.PathLike)) else archive
+            return zstandard.ZstdDecompressor().stream_reader(src, read_size=ArchiveExtractor.COPY_BUFFER_SIZE,
+                                                              read_across_frames=True, closefd=True)
+        elif compression == '':
+            return open(archive, 'rb') if isinstance(archive, (str, os.PathLike)) else archive
+
+        raise ValueError(f'Unknown compression "{compression}"')
+
+    @staticmethod
+    def archive_type(archive_file_path: str) -> str:
+        """Archive type of a file from its magic bytes, whatever its suffix
+
+        Compressed files are peeked into to tell a compressed tar, e.g. 'tar.gz', from a single compressed file,
+        e.g. 'gz'.
+
+        :param archive_file_path: path to file
+        :return: one of ARCHIVE_TYPES, or '' if not a recognised archive
+        """
+        with open(archive_file_path, 'rb') as infile:
+            header = infile.read(512)
+
+        if header.startswith(ArchiveExtractor.ZIP_MAGIC):
+            return 'zip'
+
+        compression = ArchiveExtractor.compression_of(header)
+        if compression:
+            if compression == 'zst' and zstandard is None:
+                # Cannot peek inside, so go by the name
+                return 'tar.zst' if archive_file_path.endswith(('.tar.zst', '.tzst')) else 'zst'
+            with ArchiveExtractor.open_decompressed(archive_file_path, compression) as stream:
+                inner_header = stream.read(512)
+            return f'tar.{compression}' if ArchiveExtractor.is_tar_header(inner_header) else compression
+
+        return 'tar' if ArchiveExtractor.is_tar_header(header) else ''
+
+    @staticmethod
+    def stripped_member_path(member_name: str, top_level_dir: str) -> str:
+        """Relative path of an archive member with the top-level folder removed
+
+        :param member_name: member name within the archive
+        :param top_level_dir: name of the top-level folder to strip, or '' to strip nothing
+        :return: relative path, or '' for the top-level folder itself
+        """
+        member_path = PurePosixPath(member_name.replace('\\', '/'))
+        parts = member_path.parts
+        if member_path.is_absolute() or '..' in parts:
+            raise ValueError(f'Unsafe path {member_name} in archive')
+
+        if top_level_dir and parts and parts[0] == top_level_dir:
+            parts = parts[1:]
+
+        return os.path.join(*parts) if parts else ''
+
+    @staticmethod
+    def top_level_dir(first_member_name: str, first_member_is_dir: bool) -> str:
+        """Top-level folder to strip, assuming everything is inside the folder of the first member"""
+        parts = PurePosixPath(first_member_name.replace('\\', '/')).parts
+        if len(parts) > 1 or (parts and first_member_is_dir):
+            return parts[0]
+
+        return ''
+
+    @staticmethod
+    def extract_zip(archive_file_path: str, target_dir: str, strip_top_level_dir: bool = True, workers: int = 1):
+        """Extract a zip archive member by member
+
+        With workers > 1, directories are created first, then file members are partitioned by size among processes,
+        each of which opens its own ZipFile handle and extracts its share.
+
+        :param archive_file_path: path to zip archive
+        :param target_dir: directory to extract into
+        :param strip_top_level_dir: flag, whether to drop the single top-level folder (default True)
+        :param workers: number of processes to extract with (default 1)
+        """
+        with zipfile.ZipFile(archive_file_path, 'r') as zip_ref:
+            members = zip_ref.infolist()
+            top_level_dir = ArchiveExtractor.top_level_dir(members[0].filename, members[0].is_dir()) \
+                if members and strip_top_level_dir else ''
+
+            if workers <= 1:
+                for member in members:
+                    ArchiveExtractor._extract_zip_member(zip_ref, member, target_dir, top_level_dir)
+                return
+
+            for member in members:
+                if member.is_dir():
+                    ArchiveExtractor._extract_zip_member(zip_ref, member, target_dir, top_level_dir)
+
+        partitions = ArchiveExtractor.partition_zip_members([member for member in members if not member.is_dir()],
+                                                            workers)
+        with ProcessPoolExecutor(max_workers=len(partitions)) as executor:
+            futures = [executor.submit(ArchiveExtractor._extract_zip_members, archive_file_path, member_names,
+                                       target_dir, top_level_dir) for member_names in partitions]
+            for future in futures:
+                future.result()
+
+    @staticmethod
+    def partition_zip_members(members: list, parts: int) -> list:
+        """Split zip members into at most parts lists of member names with similar total uncompressed size
+
+        :param members: list of ZipInfo
+        :param parts: number of partitions
+        :return: list of non-empty lists of member names
+        """
+        partitions = [[] for _ in range(max(1, min(parts, len(members))))]
+        loads = [0] * len(partitions)
+        for member in sorted(members, key=lambda m: m.file_size, reverse=True):
+            index = loads.index(min(loads))
+            partitions[index].append(member.filename)
+            loads[index] += member.file_size + 1
+
+        return [partition for partition in partitions if partition]
+
+    @staticmethod
+    def _extract_zip_members(archive_file_path: str, member_names: list, target_dir: str, top_level_dir: str):
+        with zipfile.ZipFile(archive_file_path, 'r') as zip_ref:
+            for member_name in member_names:
+                ArchiveExtractor._extract_zip_member(zip_ref, zip_ref.getinfo(member_name), target_dir,
+                                                     top_level_dir)
+
+    @staticmethod
+    def _extract_zip_member(zip_ref: zipfile.ZipFile, member: zipfile.ZipInfo, target_dir: str,
+                            top_level_dir: str):
+        relative_path = ArchiveExtractor.stripped_member_path(member.filename, top_level_dir)
+        if relative_path == '':
+            return
+
+        target_path = os.path.join(target_dir, relative_path)
+        if member.is_dir():
+            Path(target_path).mkdir(parents=True, exist_ok=True)
+            return
+
+        Path(target_path).parent.mkdir(parents=True, exist_ok=True)
+        with zip_ref.open(member) as src, open(target_path, 'wb') as target:
+            shutil.copyfileobj(src, target, ArchiveExtractor.COPY_BUFFER_SIZE)
+
+    @staticmethod
+    def _is_within(path: str, directory: str) -> bool:
+        """Flag, whether path, with any symlinks already on disk resolved, is inside directory"""
+        directory = os.path.realpath(directory)
+        return os.path.commonpath([os.path.realpath(path), directory]) == directory
+
+    @staticmethod
+    def extract_tar(archive, target_dir: str, strip_top_level_dir: bool = True, mode: str = 'r|*'):
+        """Extract a tar archive in a single streaming pass
+
+        Regular files keep their permission bits and modification time. Symlinks and hardlinks are recreated only
+        where they resolve inside target_dir, and nothing is written through a link that leads outside it; unsafe
+        links and special files such as devices are skipped with a message.
+
+        :param archive: path to tar archive, or a readable binary file object
+        :param target_dir: directory to extract into
+        :param strip_top_level_dir: flag, whether to drop the single top-level folder (default True)
+        :param mode: tarfile stream mode (default 'r|*', i.e. any compression)
+        """
+        if isinstance(archive, (str, os.PathLike)):
+            tar_ref = tarfile.open(archive, mode)
+        else:
+            tar_ref = tarfile.open(fileobj=archive, mode=mode)
+
+        with tar_ref:
+            top_level_dir = None
+            for member in tar_ref:
+                if top_level_dir is None:
+                    top_level_dir = ArchiveExtractor.top_level_dir(member.name, member.isdir()) \
+                        if strip_top_level_dir else ''
+
+                relative_path = ArchiveExtractor.stripped_member_path(member.name, top_level_dir)
+                if relative_path == '':
+                    continue
+
+                target_path = os.path.join(target_dir, relative_path)
+                if not ArchiveExtractor._is_within(target_path, target_dir):
+                    print(f'Skipping {member.name}: it would be written through a link outside {target_dir}')
+                    continue
+
+                if member.isdir():
+                    Path(target_path).mkdir(parents=True, exist_ok=True)
+                    continue
+
+                Path(target_path).parent.mkdir(parents=True, exist_ok=True)
+                if member.isfile():
+                    with tar_ref.extractfile(member) as src, open(target_path, 'wb') as target:
+                        shutil.copyfileobj(src, target, ArchiveExtractor.COPY_BUFFER_SIZE)
+                    os.chmod(target_path, member.mode & 0o777)
+                    os.utime(target_path, (member.mtime, member.mtime))
+                elif member.issym():
+                    link_target = os.path.join(os.path.dirname(target_path), member.linkname)
+                    if os.path.isabs(member.linkname) or not ArchiveExtractor._is_within(link_target, target_dir):
+                        print(f'Skipping symlink {member.name} -> {member.linkname}: it leads outside {target_dir}')
+                        continue
+                    if os.path.lexists(target_path):
+                        os.remove(target_path)
+                    os.symlink(member.linkname, target_path)
+                elif member.islnk():
+                    try:
+                        source_path = os.path.join(
+                            target_dir, ArchiveExtractor.stripped_member_path(member.linkname, top_level_dir))
+                    except ValueError:
+                        source_path = ''
+                    if not source_path or not os.path.isfile(source_path) \
+                            or not ArchiveExtractor._is_within(source_path, target_dir):
+                        print(f'Skipping hardlink {member.name} -> {member.linkname}: '
+                              f'no file extracted there inside {target_dir}')
+                        continue
+                    if os.path.lexists(target_path):
+                        os.remove(target_path)
+                    try:
+                        os.link(source_path, target_path)
+                    except OSError:
+                        shutil.copy2(source_path, target_path)
+                else:
+                    print(f'Skipping {member.name}: not a regular file, directory or link')
+
+    @staticmethod
+    def staging_dir_path(final_dir: str) -> str:
+        return f'{os.path.normpath(final_dir)}.staging'
+
+    @staticmethod
+    def swap_into_place(staging_dir: str, final_dir: str):
+        """Replace final_dir with staging_dir using renames, then delete the old final_dir
+
+        :param staging_dir: directory with new content, on the same filesystem as final_dir
+        :param final_dir: directory to replace
+        """
+        old_dir = ''
+        if Path(final_dir).exists():
+            old_dir = f'{os.path.normpath(final_dir)}.old-{uuid.uuid4().hex}'
+            os.rename(final_dir, old_dir)
+
+        os.rename(staging_dir, final_dir)
+
+        if old_dir:
+            shutil.rmtree(old_dir)
+
+    @staticmethod
+    def extract_compressed_file(archive_file_path: str, target_dir: str, compression: str):
+        """Decompress a single compressed file, e.g. data.csv.gz, into target_dir
+
+        :param archive_file_path: path to compressed file
+        :param target_dir: directory to write the decompressed file into, named without the compression suffix
+        :param compression: one of COMPRESSION_MAGIC keys
+        """
+        file_name = Path(archive_file_path).name
+        if file_name.lower().endswith(f'.{compression}'):
+            file_name = file_name[:-len(compression) - 1]
+
+        Path(target_dir).mkdir(parents=True, exist_ok=True)
+        with ArchiveExtractor.open_decompressed(archive_file_path, compression) as src, \
+                open(os.path.join(target_dir, file_name), 'wb') as target:
+            shutil.copyfileobj(src, target, ArchiveExtractor.COPY_BUFFER_SIZE)
+
+    @staticmethod
+    def extract(archive, target_dir: str, archive_type: str = '', strip_top_level_dir: bool = True,
+                workers: int = 1):
+        """Extract any of ARCHIVE_TYPES into target_dir
+
+        :param archive: path to archive, or for tar types a readable binary stream, e.g. an HTTP response
+        :param target_dir: directory to extract into
+        :param archive_type: one of ARCHIVE_TYPES, with or without a leading '.'; sniffed from a path if not given
+        :param strip_top_level_dir: flag, whether to drop the single top-level folder of zip and tar archives
+        :param workers: number of processes for zip extraction (default 1)
+        """
+        archive_type = archive_type.lstrip('.')
+        if archive_type == '' and isinstance(archive, (str, os.PathLike)):
+            archive_type = ArchiveExtractor.archive_type(str(archive))
+
+        if archive_type == 'zip':
+            ArchiveExtractor.extract_zip(archive, target_dir, strip_top_level_dir, workers=workers)
+        elif archive_type == 'tar.zst':
+            # tarfile has no zstd support, so decompress ahead of it
+            with ArchiveExtractor.open_decompressed(archive, 'zst') as stream:
+                ArchiveExtractor.extract_tar(stream, target_dir, strip_top_level_dir, mode='r|')
+        elif archive_type in ('tar', 'tar.gz', 'tar.bz2', 'tar.xz'):
+            ArchiveExtractor.extract_tar(archive, target_dir, strip_top_level_dir)
+        elif archive_type in ArchiveExtractor.COMPRESSION_MAGIC:
+            ArchiveExtractor.extract_compressed_file(archive, target_dir, archive_type)
+        else:
+            name = Path(archive).name if isinstance(archive, (str, os.PathLike)) else archive_type
+            raise ValueError(f'{name} is not a handled archive type.')
+
+    @staticmethod
+    def extract_into_place(archive_file_path, final_dir: str, file_type: str = '', workers: int = 1,
+                           before_swap=None):
+        """Extract an archive into a staging directory next to final_dir, then swap it into place
+
+        :param archive_file_path: path to archive, or for tar types a readable binary stream, e.g. an HTTP response
+        :param final_dir: path to final directory of extracted content
+        :param file_type: one of ARCHIVE_TYPES, e.g. '.zip' or 'tar.gz'; sniffed from a path if not given
+        :param workers: number of processes for zip extraction (default 1)
+        :param before_swap: (optional) function called once extracted, before the swap; raise from it to discard the
+            staging directory and leave final_dir untouched, e.g. when a streamed archive turns out to be incomplete
+        """
+        staging_dir = ArchiveExtractor.staging_dir_path(final_dir)
+        if Path(staging_dir).exists():
+            shutil.rmtree(staging_dir)
+        Path(staging_dir).mkdir(parents=True)
+
+        try:
+            print(f'Extracting {getattr(archive_file_path, "name", archive_file_path)} to {staging_dir}')
+            ArchiveExtractor.extract(archive_file_path, staging_dir, file_type, workers=workers)
+            if before_swap is not None:
+                before_swap()
+        except BaseException:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            raise
+
+        print(f'Moving dir "{staging_dir}" to "{final_dir}"')
+        ArchiveExtractor.swap_into_place(staging_dir, final_dir)
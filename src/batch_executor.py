@@ -0,0 +1,148 @@
+# batch_executor.py
+
+import collections.abc
+import itertools
+import math
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+
+class BatchExecutor:
+    """Apply a function to batches of items across a thread or process pool, streaming results back in order
+
+    Items are split with BatchExecutor.chunks, so they may be any iterable and are only read as batches are
+    submitted. At most max_in_flight batches are submitted but not yet yielded, which bounds memory however large
+    the input, and however slow the consumer. Results are always yielded in input order; a slow batch holds back
+    later ones rather than letting them pile up.
+
+    Threads suit I/O-bound work such as copying files; processes suit CPU-bound work such as decoding images, and
+    need a function that can be pickled, e.g. a module-level function or a static method.
+
+    Example usage:
+
+    for arrays in BatchExecutor.map_batches(FileTools._load_image_arrays, image_files, batch_size=64, workers=8,
+                                            backend='process', args=(new_shape, 'pil')):
+        ...
+
+    for mode_used in BatchExecutor.map(copy_pair, file_pairs, batch_size=16, workers=8):
+        ...
+    """
+
+    BACKENDS = ('thread', 'process')
+
+    @staticmethod
+    def batch_size_for(num_items: int, workers: int, batches_per_worker: int = 4) -> int:
+        """Batch size giving several batches per worker, which keeps the pool busy when items vary in cost"""
+        return max(1, math.ceil(num_items / (max(1, workers) * batches_per_worker)))
+
+    @staticmethod
+    def chunks(items, chunk_size: int, step: int = None):
+        """Yield chunks of items by given size, optionally as overlapping windows
+
+        Sequences that support len() and slicing are sliced, so NumPy arrays and memoryviews yield zero-copy views,
+        and lists yield lists. Any other iterable, e.g. a generator, file or database cursor, is consumed lazily with
+        itertools.islice and yields lists. Either way, the last chunk is the first to reach the end of the data, and
+        may be short.
+
+        :param items: the sequence or iterable from which chunks are to be yielded
+        :param chunk_size: number of items in each chunk
+        :param step: (optional) items between the starts of consecutive chunks; less than chunk_size for overlapping
+        windows, and chunk_size by default
+        :return: chunk of up to chunk_size items
+        """
+        step = chunk_size if step is None else step
+        if chunk_size < 1 or step < 1:
+            raise ValueError(f'chunk_size and step must be at least 1, not {chunk_size} and {step}')
+
+        if hasattr(items, '__len__') and hasattr(items, '__getitem__') \
+                and not isinstance(items, collections.abc.Mapping):
+            length = len(items)
+            for start in range(0, length, step):
+                yield items[start: start + chunk_size]
+                if start + chunk_size >= length:
+                    return
+            return
+
+        iterator = iter(items)
+        window = deque(itertools.islice(iterator, chunk_size))
+        while window:
+            yield list(window)
+            if step >= chunk_size:
+                # Skip any gap between chunks
+                deque(itertools.islice(iterator, step - chunk_size), maxlen=0)
+                window = deque(itertools.islice(iterator, chunk_size))
+            else:
+                new_items = list(itertools.islice(iterator, step))
+                if not new_items or len(window) < chunk_size:
+                    return
+                for _ in range(step):
+                    window.popleft()
+                window.extend(new_items)
+
+    @staticmethod
+    def _apply(batch, func, args: tuple, kwargs: dict) -> list:
+        return [func(item, *args, **kwargs) for item in batch]
+
+    @staticmethod
+    def map_batches(func, items, batch_size: int, workers: int = 1, backend: str = 'thread',
+                    max_in_flight: int = 0, args: tuple = (), kwargs: dict = None):
+        """Yield func(batch, *args, **kwargs) for each batch of items, in order
+
+        :param func: function taking a batch (a list, or a slice of a sequence) as its first argument
+        :param items: sequence or iterable of items
+        :param batch_size: items per batch
+        :param workers: number of threads or processes (default 1, i.e. no pool, run in the calling thread)
+        :param backend: 'thread' (default) or 'process'
+        :param max_in_flight: most batches submitted but not yet yielded; 0 for two per worker
+        :param args: (optional) further positional arguments for func
+        :param kwargs: (optional) keyword arguments for func
+        :return: result of func for a batch
+        """
+        if backend not in BatchExecutor.BACKENDS:
+            raise ValueError(f'Unknown backend "{backend}", expected one of {BatchExecutor.BACKENDS}')
+
+        kwargs = kwargs or {}
+        batches = BatchExecutor.chunks(items, batch_size)
+
+        if workers <= 1:
+            for batch in batches:
+                yield func(batch, *args, **kwargs)
+            return
+
+        max_in_flight = max_in_flight if max_in_flight > 0 else workers * 2
+        executor_class = ThreadPoolExecutor if backend == 'thread' else ProcessPoolExecutor
+        with executor_class(max_workers=workers) as executor:
+            in_flight = deque()
+            try:
+                for batch in batches:
+                    in_flight.append(executor.submit(func, batch, *args, **kwargs))
+                    if len(in_flight) >= max_in_flight:
+                        yield in_flight.popleft().result()
+                while in_flight:
+                    yield in_flight.popleft().result()
+            finally:
+                # On an error, or the consumer stopping early, do not start batches nobody will collect
+                for future in in_flight:
+                    future.cancel()
+
+    @staticmethod
+    def map(func, items, batch_size: int = 1, workers: int = 1, backend: str = 'thread', max_in_flight: int = 0,
+            args: tuple = (), kwargs: dict = None):
+        """Yield func(item, *args, **kwargs) for each item, in order, with items sent to workers in batches
+
+        Batching amortises the cost of handing work to the pool, which dominates when each item is cheap.
+
+        :param func: function taking an item as its first argument
+        :param items: sequence or iterable of items
+        :param batch_size: items per batch (default 1)
+        :param workers: number of threads or processes (default 1, i.e. no pool, run in the calling thread)
+        :param backend: 'thread' (default) or 'process'
+        :param max_in_flight: most batches submitted but not yet yielded; 0 for two per worker
+        :param args: (optional) further positional arguments for func
+        :param kwargs: (optional) keyword arguments for func
+        :return: result of func for an item
+        """
+        for results in BatchExecutor.map_batches(BatchExecutor._apply, items, batch_size, workers, backend,
+                                                 max_in_flight, args=(func, args, kwargs or {})):
+            yield from results
@@ -0,0 +1,154 @@
+# download_cache.py
+
+import hashlib
+import json
+import os
+import threading
+import urllib.error
+import urllib.request
+import uuid
+
+from pathlib import Path
+from src.copy_engine import CopyEngine
+from src.download_progress_bar import DownloadProgress
+
+
+class DownloadCache:
+    """Local content-addressed store of downloaded files
+
+    Files are stored once under objects/<sha256[:2]>/<sha256>, with index.json recording, per URL, the SHA-256 of
+    the last download and the server's ETag and Last-Modified validators. Fetching a URL that is in the index sends
+    a conditional GET (If-None-Match/If-Modified-Since), so an unchanged remote file costs one request and no body.
+    Fetching with a known SHA-256 that is already stored makes no request at all. The hash is computed as bytes
+    stream in, so verification needs no extra read of the file.
+
+    Example usage:
+
+    cache = DownloadCache('data/cache')
+    cache.fetch(url, 'data/downloads/file.zip')
+    """
+
+    INDEX_FILE_NAME = 'index.json'
+
+    def __init__(self, cache_dir: str, link_mode: str = 'copy'):
+        """
+        :param cache_dir: directory holding the cache
+        :param link_mode: how fetched files are placed at their target, one of CopyEngine.LINK_MODES (default 'copy')
+        """
+        if link_mode not in CopyEngine.LINK_MODES:
+            raise ValueError(f'Unknown link mode "{link_mode}", expected one of {CopyEngine.LINK_MODES}')
+
+        self.cache_dir = cache_dir
+        self.link_mode = link_mode
+        self.lock = threading.Lock()
+
+    def object_path(self, sha256: str) -> str:
+        return os.path.join(self.cache_dir, 'objects', sha256[:2], sha256)
+
+    def read_index(self) -> dict:
+        index_path = os.path.join(self.cache_dir, DownloadCache.INDEX_FILE_NAME)
+        if not Path(index_path).is_file():
+            return {}
+
+        with open(index_path, 'r', encoding='utf-8') as infile:
+            return json.load(infile)
+
+    def _update_index(self, url: str, entry: dict):
+        with self.lock:
+            index = self.read_index()
+            index[url] = entry
+            index_path = os.path.join(self.cache_dir, DownloadCache.INDEX_FILE_NAME)
+            temp_path = f'{index_path}.{uuid.uuid4().hex}.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as outfile:
+                json.dump(index, outfile, indent=2)
+            os.replace(temp_path, index_path)
+
+    def fetch(self, url: str, target_path: str, sha256: str = '', chunk_size: int = 1024 * 1024,
+              timeout: float = 60, progress_callback=None) -> bool:
+        """Place the content of url at target_path, downloading only if the cache has no current copy
+
+        :param url: source URL
+        :param target_path: target file path
+        :param sha256: (optional) expected SHA-256 hex digest of the content; a mismatch raises ValueError
+        :param chunk_size: bytes read per block (default 1 MiB)
+        :param timeout: socket timeout in seconds (default 60)
+        :param progress_callback: (optional) function taking DownloadProgress stats, called every half second
+        :return: True if the content was downloaded, False if served from the cache
+        """
+        sha256 = sha256.lower()
+        if sha256 and Path(self.object_path(sha256)).is_file():
+            print(f'Using cached copy of {url}')
+            self._place(sha256, target_path)
+            return False
+
+        entry = self.read_index().get(url)
+        request = urllib.request.Request(url)
+        if entry and Path(self.object_path(entry['sha256'])).is_file() and (not sha256 or entry['sha256'] == sha256):
+            if entry.get('etag'):
+                request.add_header('If-None-Match', entry['etag'])
+            if entry.get('last_modified'):
+                request.add_header('If-Modified-Since', entry['last_modified'])
+
+        try:
+            response = urllib.request.urlopen(request, timeout=timeout)
+        except urllib.error.HTTPError as err:
+            if err.code != 304:
+                raise
+            print(f'Cached copy of {url} is current')
+            self._place(entry['sha256'], target_path)
+            return False
+
+        with response:
+            downloaded_sha256 = self._save_response(url, response, chunk_size, sha256, progress_callback)
+
+            self._update_index(url, {'sha256': downloaded_sha256,
+                                     'etag': response.headers.get('ETag', ''),
+                                     'last_modified': response.headers.get('Last-Modified', ''),
+                                     'size': os.path.getsize(self.object_path(downloaded_sha256))})
+
+        self._place(downloaded_sha256, target_path)
+        return True
+
+    def _save_response(self, url: str, response, chunk_size: int, expected_sha256: str = '',
+                       progress_callback=None) -> str:
+        """Stream a response body into the object store, hashing as it goes
+
+        :return: SHA-256 hex digest of the body
+        """
+        temp_dir = os.path.join(self.cache_dir, 'tmp')
+        Path(temp_dir).mkdir(parents=True, exist_ok=True)
+        temp_path = os.path.join(temp_dir, uuid.uuid4().hex)
+
+        content_length = response.headers.get('Content-Length')
+        total = int(content_length) if content_length is not None else None
+        hasher = hashlib.sha256()
+        size = 0
+        try:
+            with open(temp_path, 'wb') as outfile, \
+                    DownloadProgress(url.split('/')[-1], total=total, callback=progress_callback) as t:
+                for block in iter(lambda: response.read(chunk_size), b''):
+                    outfile.write(block)
+                    hasher.update(block)
+                    size += len(block)
+                    t.update(len(block))
+
+            if total is not None and size != total:
+                raise ConnectionError(f'Download of {url} incomplete: {size} of {total} bytes')
+
+            digest = hasher.hexdigest()
+            if expected_sha256 and digest != expected_sha256:
+                raise ValueError(f'SHA-256 of {url} is {digest}, expected {expected_sha256}')
+
+            object_path = self.object_path(digest)
+            Path(object_path).parent.mkdir(parents=True, exist_ok=True)
+            os.replace(temp_path, object_path)
+        except BaseException:
+            if Path(temp_path).exists():
+                os.remove(temp_path)
+            raise
+
+        return digest
+
+    def _place(self, sha256: str, target_path: str):
+        Path(target_path).parent.absolute().mkdir(parents=True, exist_ok=True)
+        CopyEngine.copy_file(self.object_path(sha256), target_path, link_mode=self.link_mode)
@@ -1,15 +1,53 @@
+import http.client
+import json
 import os
 import shutil
-import tarfile
+import socket
+import threading
+import time
+import urllib.error
 import urllib.request
-import zipfile
 
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from src.download_progress_bar import DownloadProgressBar
+from src.archive_extractor import ArchiveExtractor
+from src.download_cache import DownloadCache
+from src.download_progress_bar import DownloadProgress
+
+
+class _TeeReader:
+    """Readable stream that copies everything read from src to an optional file and a progress callback"""
+
+    def __init__(self, src, copy_file=None, on_read=None):
+        self.src = src
+        self.copy_file = copy_file
+        self.on_read = on_read
+        self.bytes_read = 0
+
+    def read(self, size: int = -1) -> bytes:
+        block = self.src.read(size)
+        if block:
+            if self.copy_file is not None:
+                self.copy_file.write(block)
+            self.bytes_read += len(block)
+            if self.on_read is not None:
+                self.on_read(self.bytes_read)
+        return block
 
 
 class DownloadHelper:
 
+    # Seconds before the first retry of an interrupted download; doubles on each consecutive failure
+    RETRY_DELAY = 1.0
+
+    # Files too small to give each segment this many bytes are downloaded over a single connection
+    MIN_SEGMENT_SIZE = 1024 * 1024
+
+    # Compound suffixes first, as matched in order
+    TAR_SUFFIXES = ('.tar.gz', '.tgz', '.tar.bz2', '.tbz2', '.tar.xz', '.txz', '.tar.zst', '.tzst', '.tar')
+    COMPRESSED_FILE_SUFFIXES = ('.gz', '.bz2', '.xz', '.zst')
+    ARCHIVE_SUFFIXES = TAR_SUFFIXES + ('.zip',) + COMPRESSED_FILE_SUFFIXES
+
     @staticmethod
     def can_download(target_download_path,
                      replace_download=None) -> bool:
@@ -91,14 +129,329 @@ class DownloadHelper:
         return to_download
 
     @staticmethod
-    def download_url(url, target_path):
+    def _total_size(response, offset: int):
+        """Full size of the remote file from a (possibly partial) response, or None if not known."""
+        content_range = response.headers.get('Content-Range')
+        if content_range and '/' in content_range and not content_range.endswith('/*'):
+            return int(content_range.split('/')[-1])
+
+        content_length = response.headers.get('Content-Length')
+        if content_length is None:
+            return None
+
+        return int(content_length) + offset
+
+    @staticmethod
+    def download_url(url, target_path, resume: bool = True, retries: int = 5, chunk_size: int = 1024 * 1024,
+                     timeout: float = 60, segments: int = 1, progress_callback=None):
+        """Download URL to target path, resuming after dropped connections
+
+        Bytes are written to target_path + '.part', which is renamed to target_path only once its size matches the
+        server's Content-Length. If the connection drops, the download resumes from the end of the .part file using
+        an HTTP Range request, or restarts if the server does not support ranges. A .part file left by an earlier
+        run is resumed too, or just renamed if the server reports it is already complete. The ETag or Last-Modified
+        of the response a .part file was begun from is kept at target_path + '.part.validator.json' and sent as
+        If-Range, so if the remote file has changed since, the server sends it whole and the download restarts.
+
+        With segments > 1, and a server that supports ranges, the file is instead split into that many byte ranges,
+        fetched concurrently over separate connections and written in place into a preallocated .part file. This
+        helps where a single connection is throttled well below the available bandwidth, as on S3-style hosts.
+        Progress of each range is saved at target_path + '.part.segments.json', so a later run with the same number
+        of segments resumes each range where it stopped. If the server rejects the HEAD request used to check for
+        range support, the file is downloaded over a single connection.
+
+        Keyword arguments:
+
+        :param url: source URL
+        :param target_path: target file path
+        :param resume: flag, whether to resume from an existing .part file (default True)
+        :param retries: number of consecutive failed attempts allowed before giving up (default 5)
+        :param chunk_size: bytes read per block (default 1 MiB)
+        :param timeout: socket timeout in seconds (default 60)
+        :param segments: number of concurrent connections (default 1)
+        :param progress_callback: (optional) function taking DownloadProgress stats, called every half second
+        """
         target_directory = Path(target_path).parent.absolute()
         if not target_directory.exists():
             Path(target_directory).mkdir(parents=True, exist_ok=True)
 
-        with DownloadProgressBar(unit='B', unit_scale=True,
-                                 miniters=1, desc=url.split('/')[-1]) as t:
-            urllib.request.urlretrieve(url, filename=target_path, reporthook=t.update_to)
+        part_path = target_path + '.part'
+        segments_path = part_path + '.segments.json'
+        validator_path = part_path + '.validator.json'
+        if not resume and Path(part_path).exists():
+            os.remove(part_path)
+
+        size = DownloadHelper._segmentable_size(url, timeout) if segments > 1 else None
+        if size is not None and size >= segments * DownloadHelper.MIN_SEGMENT_SIZE:
+            DownloadHelper._download_segmented(url, part_path, size, segments, retries, chunk_size, timeout,
+                                               progress_callback, resume)
+            os.replace(part_path, target_path)
+            return
+
+        if Path(segments_path).exists():
+            # A preallocated segmented .part file is not a prefix of the remote file, so cannot be resumed here
+            os.remove(segments_path)
+            if Path(part_path).exists():
+                os.remove(part_path)
+
+        failures = 0
+        with DownloadProgress(url.split('/')[-1], callback=progress_callback) as t:
+            while True:
+                offset = os.path.getsize(part_path) if Path(part_path).is_file() else 0
+                request = urllib.request.Request(url)
+                if offset > 0:
+                    request.add_header('Range', f'bytes={offset}-')
+                    if_range = DownloadHelper._if_range(validator_path)
+                    if if_range:
+                        request.add_header('If-Range', if_range)
+
+                try:
+                    with urllib.request.urlopen(request, timeout=timeout) as response:
+                        if offset > 0 and response.status != 206:
+                            # Range not supported, or remote file changed since the .part was begun: start again
+                            offset = 0
+                        if offset == 0:
+                            DownloadHelper._save_validator(validator_path, response)
+                        total = DownloadHelper._total_size(response, offset)
+                        t.update_to(offset, 1, total)
+
+                        with open(part_path, 'ab' if offset > 0 else 'wb') as outfile:
+                            for block in iter(lambda: response.read(chunk_size), b''):
+                                outfile.write(block)
+                                offset += len(block)
+                                failures = 0
+                                t.update_to(offset, 1, total)
+
+                    if total is not None and offset != total:
+                        raise ConnectionError(f'Received {offset} of {total} bytes')
+                    break
+
+                except urllib.error.HTTPError as err:
+                    if err.code != 416:
+                        raise
+                    # Range not satisfiable: either the .part file is already complete, e.g. after a crash before
+                    # its rename, or it is not a prefix of the remote file, so start again
+                    content_range = err.headers.get('Content-Range', '') if err.headers is not None else ''
+                    if content_range.startswith('bytes */') and content_range[len('bytes */'):].isdigit() \
+                            and int(content_range[len('bytes */'):]) == offset:
+                        t.update_to(offset, 1, offset)
+                        break
+                    os.remove(part_path)
+                    if Path(validator_path).exists():
+                        os.remove(validator_path)
+                    failures += 1
+                    if failures > retries:
+                        raise
+
+                except (urllib.error.URLError, http.client.HTTPException, ConnectionError, socket.timeout) as err:
+                    failures += 1
+                    if failures > retries:
+                        raise
+                    print(f'Download interrupted ({err}), resuming from byte '
+                          f'{os.path.getsize(part_path) if Path(part_path).is_file() else 0}')
+                    time.sleep(min(2 ** (failures - 1) * DownloadHelper.RETRY_DELAY, 30))
+
+        os.replace(part_path, target_path)
+        if Path(validator_path).exists():
+            os.remove(validator_path)
+
+    @staticmethod
+    def _save_validator(validator_path: str, response):
+        """Save the ETag and Last-Modified of the response a .part file is begun from, for If-Range on resuming."""
+        validator = {'etag': response.headers.get('ETag', ''),
+                     'last_modified': response.headers.get('Last-Modified', '')}
+        with open(validator_path, 'w', encoding='utf-8') as outfile:
+            json.dump(validator, outfile)
+
+    @staticmethod
+    def _if_range(validator_path: str) -> str:
+        """If-Range value for resuming a .part file: its strong ETag, else its Last-Modified, else '' if unknown."""
+        if not Path(validator_path).is_file():
+            return ''
+
+        with open(validator_path, 'r', encoding='utf-8') as infile:
+            validator = json.load(infile)
+        etag = validator.get('etag', '')
+
+        # If-Range only accepts strong ETags
+        return etag if etag and not etag.startswith('W/') else validator.get('last_modified', '')
+
+    @staticmethod
+    def download_and_extract_url(url: str, final_extraction_dir: str, keep_path: str = '',
+                                 chunk_size: int = 1024 * 1024, timeout: float = 60, progress_callback=None):
+        """Extract a tar archive (any compression) while it downloads, optionally keeping a copy of the archive
+
+        The HTTP response is read through tarfile's stream mode, so wall time is roughly the longer of download and
+        extraction rather than their sum. Content goes through ArchiveExtractor, into a staging directory that is
+        swapped into final_extraction_dir only once the whole response has been received, whether or not a copy is
+        kept. A dropped connection is not resumed: the staging directory and partial copy are removed and the error
+        raised.
+
+        Keyword arguments:
+
+        :param url: source URL of a tar, tar.gz, tar.bz2 or tar.xz archive
+        :param final_extraction_dir: path to final directory of extracted content
+        :param keep_path: (optional) path to save a copy of the downloaded archive to
+        :param chunk_size: bytes read per block when draining the stream after the end of the archive (default 1 MiB)
+        :param timeout: socket timeout in seconds (default 60)
+        :param progress_callback: (optional) function taking DownloadProgress stats, called every half second
+        """
+        part_path = keep_path + '.part' if keep_path else ''
+        if keep_path:
+            Path(keep_path).parent.mkdir(parents=True, exist_ok=True)
+
+        with urllib.request.urlopen(url, timeout=timeout) as response, \
+                DownloadProgress(url.split('/')[-1], callback=progress_callback) as t:
+            total = DownloadHelper._total_size(response, 0)
+            copy_file = open(part_path, 'wb') if part_path else None
+            reader = _TeeReader(response, copy_file, lambda bytes_read: t.update_to(bytes_read, 1, total))
+
+            def check_complete():
+                # Read past the end-of-archive marker, so the kept copy is complete, then check nothing is missing;
+                # http.client does not raise on a short body, and a tar cut at a member boundary extracts cleanly
+                while reader.read(chunk_size):
+                    pass
+                if total is not None and reader.bytes_read != total:
+                    raise ConnectionError(f'Download of {url} incomplete: {reader.bytes_read} of {total} bytes')
+
+            try:
+                ArchiveExtractor.extract_into_place(reader, final_extraction_dir, '.tar', before_swap=check_complete)
+            except BaseException:
+                if copy_file is not None:
+                    copy_file.close()
+                    os.remove(part_path)
+                raise
+
+        if copy_file is not None:
+            copy_file.close()
+            os.replace(part_path, keep_path)
+
+    @staticmethod
+    def _segmentable_size(url: str, timeout: float = 60):
+        """Size of the remote file if the server supports byte ranges, else None.
+
+        None too if the HEAD request fails, as some hosts, e.g. S3 presigned URLs, reject HEAD.
+        """
+        request = urllib.request.Request(url, method='HEAD')
+        try:
+            with urllib.request.urlopen(request, timeout=timeout) as response:
+                if response.headers.get('Accept-Ranges', '').lower() != 'bytes':
+                    return None
+                content_length = response.headers.get('Content-Length')
+        except (urllib.error.URLError, http.client.HTTPException, socket.timeout) as err:
+            print(f'Not segmenting download, as HEAD request failed ({err})')
+            return None
+
+        return None if content_length is None else int(content_length)
+
+    @staticmethod
+    def _download_segmented(url: str, part_path: str, size: int, segments: int, retries: int, chunk_size: int,
+                            timeout: float, progress_callback=None, resume: bool = True):
+        """Fetch byte ranges of URL concurrently, each written at its own offset in a preallocated part file.
+
+        The position reached in each range is saved at part_path + '.segments.json' every second or so, and when
+        the download stops, so that a later call for the same size and number of segments resumes each range.
+        """
+        segments_path = part_path + '.segments.json'
+        bounds = [size * i // segments for i in range(segments + 1)]
+        positions = bounds[:-1]
+
+        if resume and Path(part_path).is_file() and Path(segments_path).is_file():
+            with open(segments_path, 'r', encoding='utf-8') as infile:
+                state = json.load(infile)
+            if state.get('size') == size and state.get('bounds') == bounds \
+                    and os.path.getsize(part_path) == size:
+                positions = state['positions']
+                print(f'Resuming segmented download from {sum(p - b for p, b in zip(positions, bounds))} bytes')
+
+        if positions == bounds[:-1]:
+            with open(part_path, 'wb') as outfile:
+                outfile.truncate(size)
+
+        lock = threading.Lock()
+        last_saved = [time.monotonic()]
+
+        def save_positions():
+            temp_path = segments_path + '.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as outfile:
+                json.dump({'size': size, 'bounds': bounds, 'positions': positions}, outfile)
+            os.replace(temp_path, segments_path)
+
+        with DownloadProgress(url.split('/')[-1], total=size, callback=progress_callback) as t:
+            t.update(sum(position - start for position, start in zip(positions, bounds)))
+
+            def fetch_segment(i: int):
+                def write_block(block: bytes, position: int):
+                    DownloadHelper._write_at(fd, block, position)
+                    t.update(len(block))
+                    with lock:
+                        positions[i] = position + len(block)
+                        if time.monotonic() - last_saved[0] >= 1:
+                            save_positions()
+                            last_saved[0] = time.monotonic()
+
+                fd = os.open(part_path, os.O_WRONLY | getattr(os, 'O_BINARY', 0))
+                try:
+                    if positions[i] < bounds[i + 1]:
+                        DownloadHelper._fetch_range(url, positions[i], bounds[i + 1] - 1, write_block, retries,
+                                                    chunk_size, timeout)
+                finally:
+                    os.close(fd)
+
+            try:
+                with ThreadPoolExecutor(max_workers=segments) as executor:
+                    futures = [executor.submit(fetch_segment, i) for i in range(segments)]
+                    for future in futures:
+                        future.result()
+            finally:
+                with lock:
+                    save_positions()
+
+        received = sum(position - start for position, start in zip(positions, bounds))
+        if received != size:
+            raise ConnectionError(f'Received {received} of {size} bytes')
+        os.remove(segments_path)
+
+    @staticmethod
+    def _write_at(fd: int, data: bytes, offset: int):
+        """Write data at offset of an open file descriptor, without moving a shared file position where possible."""
+        if hasattr(os, 'pwrite'):
+            while data:
+                written = os.pwrite(fd, data, offset)
+                data, offset = data[written:], offset + written
+        else:
+            # Windows: each segment has its own descriptor, so seeking does not affect other threads
+            os.lseek(fd, offset, os.SEEK_SET)
+            while data:
+                data = data[os.write(fd, data):]
+
+    @staticmethod
+    def _fetch_range(url: str, start: int, end: int, write_block, retries: int, chunk_size: int, timeout: float):
+        """Fetch bytes start to end (inclusive) of URL, resuming the range after dropped connections.
+
+        :param write_block: function taking a block of bytes and its position in the file
+        """
+        position = start
+        failures = 0
+        while position <= end:
+            request = urllib.request.Request(url, headers={'Range': f'bytes={position}-{end}'})
+            try:
+                with urllib.request.urlopen(request, timeout=timeout) as response:
+                    if response.status != 206:
+                        raise ValueError(f'Server ignored range request for {url}')
+                    for block in iter(lambda: response.read(min(chunk_size, end + 1 - position)), b''):
+                        write_block(block, position)
+                        position += len(block)
+                        failures = 0
+                        if position > end:
+                            break
+                if position <= end:
+                    raise ConnectionError(f'Received bytes {start}-{position - 1} of range {start}-{end}')
+            except (urllib.error.URLError, http.client.HTTPException, ConnectionError, socket.timeout):
+                failures += 1
+                if failures > retries:
+                    raise
+                time.sleep(min(2 ** (failures - 1) * DownloadHelper.RETRY_DELAY, 30))
 
     @staticmethod
     def get_extraction_dir_path(data_dir: str, filename: str) -> str:
@@ -108,30 +461,16 @@ class DownloadHelper:
         :param filename: Source filename
         :return: extraction_dir_path
         """
-        filename = filename.lower()
-        extraction_dir_path = 'extracted'
-        suffices = ('.zip', '.tar', '.tar.gz')
-
-        p = Path(filename)
-        file_stem = p.stem
-        suffix_found = False
-
-        for suffix in suffices:
-            if p.name.endswith('.tar.gz'):
-                # Numpy archive
-                file_stem = Path(file_stem).stem
-                suffix_found = True
-                break
-            elif suffix == p.suffix:
-                suffix_found = True
-                break
+        name = Path(filename.lower()).name
+        for suffix in DownloadHelper.ARCHIVE_SUFFIXES:
+            if name.endswith(suffix):
+                file_stem = name[:-len(suffix)]
+                if suffix in DownloadHelper.COMPRESSED_FILE_SUFFIXES:
+                    # Single compressed file, e.g. data.csv.gz
+                    file_stem = Path(file_stem).stem
+                return os.path.join(data_dir, file_stem)
 
-        extraction_dir_path = os.path.join(data_dir, file_stem)
-
-        if not suffix_found:
-            raise ValueError(f'{p.name} is not a handled archive type.')
-
-        return extraction_dir_path
+        raise ValueError(f'{name} is not a handled archive type.')
 
     @staticmethod
     def get_extraction_isic_dir_path(data_dir: str, filename: str) -> str:
@@ -156,19 +495,39 @@ class DownloadHelper:
 
         return extraction_dir_path
 
+    @staticmethod
+    def is_archive_file_name(filename: str) -> bool:
+        return filename.lower().endswith(DownloadHelper.ARCHIVE_SUFFIXES)
+
+    @staticmethod
+    def is_tar_file_name(filename: str) -> bool:
+        return filename.lower().endswith(DownloadHelper.TAR_SUFFIXES)
+
     @staticmethod
     def download_file(data_dir: str, replace_download: bool, src_url: str, is_isic: bool, replace_unzip_content: bool,
-                      working_dir: str = ''):
+                      working_dir: str = '', pipelined: bool = False, keep_download: bool = True,
+                      cache_dir: str = '', sha256: str = '', progress_callback=None):
         """Download file from give URL to given directory with chosen name. Check if download is required.
 
+        With pipelined, tar archives are extracted while downloading (see download_and_extract_url), and
+        can_extract_to_extraction_dir is returned as False since there is then nothing left to extract.
+
+        With cache_dir, the file is fetched through a DownloadCache, so an unchanged remote file is not downloaded
+        again, and a changed one always is; replace_download and pipelined are then ignored.
+
         Keyword arguments:
 
         :param data_dir: Target root data directory
-        :param replace_download: flag, whether to replace an existing download of same name
+        :param replace_download: flag, whether to replace an existing download of same name; ignored with cache_dir
         :param src_url: Source URL
         :param is_isic: flag, whether to be processed as an ISIC file that follows ISIC conventions
         :param replace_unzip_content: flag, whether to replace existing extraction content
         :param working_dir: (optional) working directory for extraction of download
+        :param pipelined: flag, whether to extract tar archives while downloading (default False)
+        :param keep_download: flag, whether to keep the archive on disk when pipelined (default True)
+        :param cache_dir: (optional) directory of a DownloadCache to fetch through
+        :param sha256: (optional) expected SHA-256 hex digest of the download, verified when using cache_dir
+        :param progress_callback: (optional) function taking DownloadProgress stats, called every half second
         :return: can_extract_to_extraction_dir, working_dir, final_extraction_dir, download_file_path
         """
         print('Parameters (download_file): \ndata_dir: {}'
@@ -195,11 +554,16 @@ class DownloadHelper:
             unzip_dir=final_extraction_dir, replace_content=replace_unzip_content
         )
 
-        to_download = DownloadHelper.to_download(
-            target_download_path=download_file_path, replace_download=replace_download,
-            can_extract_to_extraction_dir=can_extract_to_extraction_dir,
-            extraction_dir=final_extraction_dir
-        )
+        if cache_dir:
+            # The cache decides whether anything needs downloading, by hash or conditional GET, so an existing
+            # download file is not checked, nor replace_download asked for
+            to_download = final_extraction_dir == '' or can_extract_to_extraction_dir
+        else:
+            to_download = DownloadHelper.to_download(
+                target_download_path=download_file_path, replace_download=replace_download,
+                can_extract_to_extraction_dir=can_extract_to_extraction_dir,
+                extraction_dir=final_extraction_dir
+            )
 
         if to_download:
             # Clear target unzip dir, if required
@@ -207,28 +571,51 @@ class DownloadHelper:
                     and Path(final_extraction_dir).exists() and Path(final_extraction_dir).is_dir():
                 print('Removing dir {}.'.format(final_extraction_dir))
                 shutil.rmtree(final_extraction_dir)
-            DownloadHelper.download_url(src_url, download_file_path)
+            if cache_dir:
+                DownloadCache(cache_dir).fetch(src_url, download_file_path, sha256=sha256,
+                                               progress_callback=progress_callback)
+            elif pipelined and can_extract_to_extraction_dir and final_extraction_dir != '' \
+                    and DownloadHelper.is_tar_file_name(target_filename) \
+                    and not target_filename.lower().endswith(('.tar.zst', '.tzst')):
+                # tarfile's stream mode handles gz, bz2 and xz itself; zstd is extracted once downloaded
+                DownloadHelper.download_and_extract_url(src_url, final_extraction_dir,
+                                                        keep_path=download_file_path if keep_download else '',
+                                                        progress_callback=progress_callback)
+                can_extract_to_extraction_dir = False
+            else:
+                DownloadHelper.download_url(src_url, download_file_path, progress_callback=progress_callback)
 
         return can_extract_to_extraction_dir, working_dir, final_extraction_dir, download_file_path
 
     @staticmethod
-    def unzip_archive(archive_file_path: str, data_dir: str, final_extraction_dir: str):
+    def unzip_archive(archive_file_path: str, data_dir: str, final_extraction_dir: str, streaming: bool = False,
+                      workers: int = 1):
         """Extract archive content
 
+        By default, content is extracted to data_dir/temp, then its single top-level folder is moved to
+        final_extraction_dir. With streaming, the top-level folder is stripped from member paths as they are
+        extracted into a staging directory next to final_extraction_dir, which is then swapped into place; see
+        ArchiveExtractor.
+
         Keyword arguments:
 
-        :param archive_file_path: Path to archive
+        :param archive_file_path: Path to archive, of any type in ArchiveExtractor.ARCHIVE_TYPES, sniffed from its content
         :param data_dir: Target root data directory
         :param final_extraction_dir: path to final directory of unzipped content
+        :param streaming: flag, whether to extract straight into place (default False)
+        :param workers: number of processes for zip extraction (default 1)
         # :param unsupervised: (optional) if set, then use a different folder structure
         """
         print('Parameters (unzip_archive): \narchive_file_path: {}\ndata_dir: {}\nfinal_extraction_dir: {}'.
               format(archive_file_path, data_dir, final_extraction_dir))
 
-        target_filename = Path(archive_file_path).name
-        file_type = Path(archive_file_path).suffix
-        if target_filename.endswith('.tar.gz'):
-            file_type = '.tar.gz'
+        archive_type = ArchiveExtractor.archive_type(archive_file_path)
+        if archive_type == '':
+            raise ValueError(f'{Path(archive_file_path).name} is not a handled archive type.')
+
+        if streaming:
+            ArchiveExtractor.extract_into_place(archive_file_path, final_extraction_dir, archive_type, workers=workers)
+            return
 
         # Remove temp dir if exists, will recreate later if needed
         temp_extraction_dir = os.path.join(data_dir, 'temp')
@@ -236,26 +623,15 @@ class DownloadHelper:
             print('Removing dir tree {}'.format(temp_extraction_dir))
             shutil.rmtree(temp_extraction_dir)
 
-        initial_extraction_dir_name = ''
-
         Path(temp_extraction_dir).mkdir(parents=True, exist_ok=True)
-        if file_type == '.tar.gz':
-            tar_ref = tarfile.open(archive_file_path, 'r|gz')
-            print(f'Extracting {archive_file_path} to {temp_extraction_dir}')
-            tar_ref.extractall(path=temp_extraction_dir)
-            # Assume that everything is inside a single top level folder.
-            initial_extraction_dir_name = Path(tar_ref.members[0].name).parts[0]
-            tar_ref.close()
-        elif file_type == '.gz':
-            # Not handled yet
-            print(f'*** Not handling {file_type} archives yet ***')
-            exit()
-        elif file_type == '.tar' or file_type == '.zip':
-            with zipfile.ZipFile(archive_file_path, 'r') as zip_ref:
-                print(f'Extracting {zip_ref.filename} to {temp_extraction_dir}')
-                zip_ref.extractall(path=temp_extraction_dir)
-                # Assume that everything is inside a single top level folder.
-                initial_extraction_dir_name = Path(zip_ref.filelist[0].filename).parts[0]
+        print(f'Extracting {archive_file_path} to {temp_extraction_dir}')
+        ArchiveExtractor.extract(archive_file_path, temp_extraction_dir, archive_type, strip_top_level_dir=False,
+                                 workers=workers)
+
+        # Assume that everything is inside a single top level folder, otherwise move everything extracted
+        extracted_names = os.listdir(temp_extraction_dir)
+        initial_extraction_dir_name = extracted_names[0] \
+            if len(extracted_names) == 1 and Path(temp_extraction_dir, extracted_names[0]).is_dir() else ''
 
         # Remove target dir then rename/move unzipped dir
         if Path(final_extraction_dir).exists():
@@ -271,11 +647,7 @@ class DownloadHelper:
 
     @staticmethod
     def move_non_archive_file_to_working_dir(download_file_path: str, working_dir: str):
-        file_type = Path(download_file_path).suffix
-        if download_file_path.endswith('.tar.gz'):
-            file_type = '.tar.gz'
-        archive_file_types = ['.tar.gz', '.tar', '.gz', '.zip']
-        if file_type in archive_file_types:
+        if DownloadHelper.is_archive_file_name(download_file_path):
             print('Archive file, not moving to target folder.')
         else:
             os.rename(download_file_path, os.path.join(working_dir, Path(download_file_path).name))
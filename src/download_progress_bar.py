@@ -1,3 +1,6 @@
+import threading
+import time
+
 from tqdm import tqdm
 
 
@@ -6,3 +9,133 @@ class DownloadProgressBar(tqdm):
         if tsize is not None:
             self.total = tsize
         self.update(b * bsize - self.n)
+
+
+class DownloadProgress:
+    """Download progress, counted by the reading thread(s) and reported at a fixed interval from a background thread
+
+    Counting a block costs a lock and a clock read, so the read loop is not slowed by bar refreshes. Every interval,
+    and once more on close, the current stats are passed to callback and shown on a tqdm bar (unless bar is False):
+
+    {'description': str, 'bytes': int, 'total': int or None, 'elapsed': seconds, 'bytes_per_second': float,
+     'eta_seconds': float or None, 'stalled': bool, 'done': bool}
+
+    bytes_per_second is smoothed over recent intervals, or the average over the whole download once done. A download
+    is stalled when no bytes have arrived for stall_timeout seconds; as reports come from a separate thread, this is
+    seen even while a read is blocked.
+
+    Example usage:
+
+    with DownloadProgress('data.zip', callback=metrics.append, bar=False) as progress:
+        for block in iter(lambda: response.read(chunk_size), b''):
+            outfile.write(block)
+            progress.update(len(block))
+    """
+
+    # Weight of the latest interval in the smoothed rate
+    SMOOTHING = 0.3
+
+    def __init__(self, description: str = '', total: int = None, interval: float = 0.5, stall_timeout: float = 30.0,
+                 callback=None, bar: bool = True):
+        """
+        :param description: label for the bar and stats, e.g. the file name
+        :param total: expected number of bytes, if known
+        :param interval: seconds between reports (default 0.5)
+        :param stall_timeout: seconds without bytes before reporting a stall (default 30)
+        :param callback: (optional) function taking the stats dict
+        :param bar: flag, whether to show a tqdm bar (default True)
+        """
+        self.description = description
+        self.total = total
+        self.interval = interval
+        self.stall_timeout = stall_timeout
+        self.callback = callback
+        self.n = 0
+        self.stats = {}
+        self._bar = DownloadProgressBar(unit='B', unit_scale=True, desc=description, total=total, disable=not bar)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._start_time = self._last_progress_time = self._last_report_time = time.monotonic()
+        self._last_report_n = 0
+        self._rate = None
+
+    def start(self):
+        self._start_time = self._last_progress_time = self._last_report_time = time.monotonic()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def update(self, num_bytes: int):
+        """Count num_bytes more received"""
+        with self._lock:
+            self.n += num_bytes
+            self._last_progress_time = time.monotonic()
+
+    def update_to(self, b=1, bsize=1, tsize=None):
+        """Set bytes received to b * bsize, and the total to tsize if given, as for a urlretrieve reporthook"""
+        with self._lock:
+            if tsize is not None:
+                self.total = tsize
+            if b * bsize != self.n:
+                self.n = b * bsize
+                self._last_progress_time = time.monotonic()
+
+    def close(self) -> dict:
+        """Stop reporting, and report the final stats
+
+        :return: final stats
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        stats = self._report(done=True)
+        self._bar.close()
+
+        return stats
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._report()
+
+    def _report(self, done: bool = False) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            n, total, last_progress_time = self.n, self.total, self._last_progress_time
+
+        elapsed = now - self._start_time
+        span = now - self._last_report_time
+        if span > 0:
+            rate = max(n - self._last_report_n, 0) / span
+            self._rate = rate if self._rate is None else \
+                DownloadProgress.SMOOTHING * rate + (1 - DownloadProgress.SMOOTHING) * self._rate
+        self._last_report_time, self._last_report_n = now, n
+
+        bytes_per_second = n / elapsed if done and elapsed > 0 else (self._rate or 0.0)
+        if done:
+            eta_seconds = 0.0
+        elif total is not None and bytes_per_second > 0:
+            eta_seconds = max(total - n, 0) / bytes_per_second
+        else:
+            eta_seconds = None
+        stalled = not done and now - last_progress_time >= self.stall_timeout
+
+        self.stats = {'description': self.description, 'bytes': n, 'total': total, 'elapsed': elapsed,
+                      'bytes_per_second': bytes_per_second, 'eta_seconds': eta_seconds, 'stalled': stalled,
+                      'done': done}
+
+        if total is not None and self._bar.total != total:
+            self._bar.total = total
+        self._bar.set_postfix_str('stalled' if stalled else '', refresh=False)
+        self._bar.update(n - self._bar.n)
+
+        if self.callback is not None:
+            self.callback(self.stats)
+
+        return self.stats
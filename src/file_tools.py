@@ -1,38 +1,49 @@
 # file_tools.py
 
 import datetime
-import string
+import hashlib
+import json
+import locale
+import mmap
+import threading
+import uuid
 
 import numpy as np
 import pandas as pd
 from pathlib import Path
 from PIL import Image
 import os
-import random
 import re
 import shutil
 from skimage.transform import resize
+from src.batch_executor import BatchExecutor
+from src.copy_engine import CopyEngine
+from src.sharded_archive import ShardedArchive
+from src.text_search import TextSearch
 import sys
 
 
 class FileTools:
     """Utilities for managing data from and to files"""
 
+    RESIZE_ENGINES = ('skimage', 'pil')
+
+    # Threads deleting directories renamed aside by ensure_empty_directory
+    _background_deletions = []
+
     @staticmethod
-    def chunks_generator(input_list: list, chunk_size: int) -> list:
-        """Yield chunks of supplied data by given size
+    def chunks_generator(input_list, chunk_size: int, step: int = None):
+        """Yield chunks of supplied data by given size, optionally as overlapping windows
+
+        See BatchExecutor.chunks, which does the work: sequences are sliced, other iterables consumed lazily.
 
-        :param input_list: the list from which chunks are to be yielded
+        :param input_list: the sequence or iterable from which chunks are to be yielded
         :param chunk_size: number of items in each chunk
-        :return: list of length chunk_size
+        :param step: (optional) items between the starts of consecutive chunks; less than chunk_size for overlapping
+        windows, and chunk_size by default
+        :return: chunk of up to chunk_size items
         """
-        remainder = len(input_list) - (int(len(input_list)/chunk_size) * chunk_size)
-
-        for i in range(0, int(len(input_list) / chunk_size)):
-            yield input_list[i * chunk_size: (i + 1) * chunk_size]
-        if remainder > 0:
-            i = int(len(input_list)/chunk_size)
-            yield input_list[i * chunk_size: i * chunk_size + remainder]
+        return BatchExecutor.chunks(input_list, chunk_size, step)
 
     @staticmethod
     def create_dirs_from_file_header(file_path: str, separator: str, target_root: str) -> list():
@@ -58,7 +69,7 @@ class FileTools:
 
     @staticmethod
     def copy_files_to_class_dirs(info_file_path: str, separator: str, src_root: str, target_root: str,
-                                 extension: str = ''):
+                                 extension: str = '', workers: int = 1, link_mode: str = 'copy', progress='log'):
         """Copy files from source dir to class dirs
 
         Keyword arguments:
@@ -69,6 +80,9 @@ class FileTools:
         :param src_root: root for source files
         :param target_root: root for class dirs
         :param extension: if extension given, then suffix to file names
+        :param workers: number of copy threads (default 1)
+        :param link_mode: 'copy' (default), 'hardlink', 'symlink' or 'reflink'; see CopyEngine
+        :param progress: 'log' (default), 'tqdm', 'silent' or a ProgressReporter; see ProgressReporter
         :return (dataframe) list of folder names
         """
 
@@ -76,16 +90,15 @@ class FileTools:
 
         FileTools.create_dirs_from_file_header(info_file_path, separator, target_root)
 
+        file_pairs = []
         for col in df.columns:
             target_dir = os.path.join(target_root, col)
-            count = 0
             for filename in df[df[col] == 1].index:
                 src_file = os.path.join(src_root, '.'.join([filename, extension]))
                 target_file = os.path.join(target_dir, '.'.join([filename, extension]))
+                file_pairs.append((src_file, target_file))
 
-                shutil.copyfile(src_file, target_file)
-                count += 1
-            print(f'{count} files copied to {target_dir}')
+        CopyEngine.copy_files(file_pairs, link_mode=link_mode, workers=workers, progress=progress)
 
         return df
 
@@ -139,15 +152,156 @@ class FileTools:
     #
     #     return df
 
+    @staticmethod
+    def plan_file_splits_to_class_dirs(info_file_path: str, src_root: str, split_roots: list, splits: list,
+                                       extension: str = '', seed: int = None, stratify: bool = True,
+                                       groups_file_path: str = '', group_column: str = 'lesion_id') -> pd.DataFrame:
+        """Plan the copy of files from source dir to class dirs across splits, without copying anything
+
+        When stratified, each class is shuffled and divided across the splits independently, so every split gets
+        its share of every class; otherwise all files are divided together. Splits other than the last get
+        int(size * split / sum of splits) files; the last split gets the remainder.
+
+        With a groups file, e.g. the ISIC LesionGroupings CSV, files of the same group (e.g. lesion) always go to
+        the same split, so related images cannot leak between splits. Groups are shuffled as a whole and each goes
+        to the split in which its first file falls, so split sizes are then approximate.
+
+        The whole assignment is computed in one vectorised pass over the one-hot class matrix.
+
+        Keyword arguments:
+        :param info_file_path: full path to file with class data of source files; assume this structure:
+            line 1: headers
+            column 1: file names
+        :param src_root: root for source files
+        :param split_roots: list of root directories for classes, starting with main root split
+        :param splits: list of relative sizes of splits as ints
+        :param extension: if extension given, then suffix to file names
+        :param seed: seed for shuffling; the same seed and info file give the same plan (default None, i.e. random)
+        :param stratify: flag, whether to divide each class across the splits separately (default True)
+        :param groups_file_path: optional, path to CSV with file names (without extension) in column 1
+        :param group_column: name of the group column in the groups file (default 'lesion_id')
+        :return: plan with one row per file copy, columns FileName, Class, Split (index), SplitRoot, Source, Target
+        """
+        df = pd.read_csv(info_file_path, index_col=0)
+        one_hot = df.to_numpy() == 1
+        splits = np.asarray(splits)
+        rng = np.random.default_rng(seed)
+
+        if groups_file_path:
+            groups = pd.read_csv(groups_file_path, index_col=0)[group_column].reindex(df.index)
+            # Files missing from the groups file are groups of one
+            groups = groups.astype(object).where(groups.notna(), pd.Series('file:' + df.index.astype(str),
+                                                                           index=df.index))
+            group_codes = pd.factorize(groups)[0]
+        else:
+            group_codes = np.arange(len(df))
+
+        # (file, class) pairs, ordered by stratum, then by random group key, keeping groups contiguous
+        file_rows, class_cols = np.nonzero(one_hot)
+        strata = class_cols if stratify else np.zeros(len(file_rows), dtype=int)
+        pair_groups = group_codes[file_rows]
+        group_keys = rng.random(group_codes.max() + 1 if len(group_codes) > 0 else 0)
+        order = np.lexsort((pair_groups, group_keys[pair_groups], strata))
+        file_rows, class_cols, strata, pair_groups = \
+            file_rows[order], class_cols[order], strata[order], pair_groups[order]
+
+        # Rank of the first pair of each group within its stratum, compared against cumulative split counts
+        stratum_sizes = np.bincount(strata, minlength=one_hot.shape[1] if stratify else 1)
+        stratum_starts = np.concatenate(([0], np.cumsum(stratum_sizes)[:-1]))
+        ranks = np.arange(len(file_rows)) - stratum_starts[strata]
+        is_group_start = np.concatenate(([True], (strata[1:] != strata[:-1]) | (pair_groups[1:] != pair_groups[:-1])))
+        group_start = np.maximum.accumulate(np.where(is_group_start, np.arange(len(file_rows)), 0))
+        split_counts = (stratum_sizes[:, np.newaxis] * splits[np.newaxis, :-1] / np.sum(splits)).astype(int)
+        split_bounds = np.cumsum(split_counts, axis=1)
+        split_index = (ranks[group_start, np.newaxis] >= split_bounds[strata]).sum(axis=1)
+
+        # A group, or a file, in several classes goes wherever its first pair went
+        unique_groups, first_pairs = np.unique(pair_groups, return_index=True)
+        group_splits = np.zeros(len(group_keys), dtype=int)
+        group_splits[unique_groups] = split_index[first_pairs]
+        split_index = group_splits[pair_groups]
+
+        target_dirs = np.array([[os.path.join(split_root, col, '') for col in df.columns]
+                                for split_root in split_roots], dtype=object)
+        file_names = pd.Series(df.index.to_numpy()[file_rows], dtype=str) + '.' + extension
+
+        plan = pd.DataFrame({
+            'FileName': file_names,
+            'Class': df.columns.to_numpy()[class_cols],
+            'Split': split_index,
+            'SplitRoot': np.asarray(split_roots, dtype=object)[split_index],
+            'Source': os.path.join(src_root, '') + file_names,
+            'Target': target_dirs[split_index, class_cols] + file_names,
+        })
+
+        return plan
+
+    @staticmethod
+    def execute_copy_plan(plan: pd.DataFrame, workers: int = 1, link_mode: str = 'copy',
+                          dry_run: bool = False, skip_existing: bool = False, progress='log') -> pd.Series:
+        """Copy files as planned, e.g. by plan_file_splits_to_class_dirs
+
+        :param plan: DataFrame with at least Source and Target columns
+        :param workers: number of copy threads (default 1)
+        :param link_mode: 'copy' (default), 'hardlink', 'symlink' or 'reflink'; see CopyEngine
+        :param dry_run: flag, whether to only report what would be copied (default False)
+        :param skip_existing: flag, whether to skip targets that already exist with the source's size, so that
+            re-running a plan only syncs what is missing (default False)
+        :param progress: 'log' (default), 'tqdm', 'silent' or a ProgressReporter; see ProgressReporter
+        :return: number of files copied (or to be copied) per target directory
+        """
+        if skip_existing:
+            plan = plan[[not FileTools._is_copy_of(src_file, target_file)
+                         for src_file, target_file in zip(plan['Source'], plan['Target'])]]
+            print(f'{len(plan)} files not yet at their target')
+
+        target_dirs = plan['Target'].map(os.path.dirname)
+        counts = target_dirs.value_counts(sort=False)
+
+        if dry_run:
+            for target_dir, count in counts.items():
+                print(f'{count} files to be copied to {target_dir}')
+        else:
+            for target_dir in counts.index:
+                Path(target_dir).mkdir(parents=True, exist_ok=True)
+            CopyEngine.copy_files(list(zip(plan['Source'], plan['Target'])), link_mode=link_mode, workers=workers,
+                                  progress=progress)
+
+        return counts
+
+    @staticmethod
+    def _is_copy_of(src_file: str, target_file: str) -> bool:
+        try:
+            return os.stat(target_file).st_size == os.stat(src_file).st_size
+        except FileNotFoundError:
+            return False
+
     @staticmethod
     def copy_file_splits_to_class_dirs(info_file_path: str, separator: str, src_root: str,
                                        split_roots: list,
                                        # target_major_split_root: str, target_minor_split_root: str,
                                        splits: list,
                                        # main_split: float,
-                                       extension: str = ''):
+                                       extension: str = '',
+                                       seed: int = None,
+                                       workers: int = 1,
+                                       link_mode: str = 'copy',
+                                       dry_run: bool = False,
+                                       stratify: bool = True,
+                                       groups_file_path: str = '',
+                                       group_column: str = 'lesion_id',
+                                       manifest_path: str = '',
+                                       skip_existing: bool = False,
+                                       progress='log'):
         """Copy files from source dir to class dirs, with main_split % going to the major split directory
 
+        See plan_file_splits_to_class_dirs for how files are assigned to splits.
+
+        With a manifest path, the plan is saved there as CSV, or, if the manifest already exists, read from there
+        instead of being planned again. Together with skip_existing, re-running against the same manifest then only
+        copies files not already at their target. The planning arguments are saved alongside, at manifest_path +
+        '.options.json'; if they have changed since, ValueError is raised rather than copying per a stale plan.
+
         Keyword arguments:
         :param info_file_path: full path to file with class data of source files; assume this structure:
             line 1: headers
@@ -157,59 +311,69 @@ class FileTools:
         :param split_roots: list of root directories for classes, starting with main root split
         :param splits: list of relative sizes of splits as ints
         :param extension: if extension given, then suffix to file names
+        :param seed: seed for shuffling (default None, i.e. random)
+        :param workers: number of copy threads (default 1)
+        :param link_mode: 'copy' (default), 'hardlink', 'symlink' or 'reflink'; see CopyEngine
+        :param dry_run: flag, whether to only report what would be copied (default False)
+        :param stratify: flag, whether to divide each class across the splits separately (default True)
+        :param groups_file_path: optional, path to CSV of file groups that must not be divided across splits
+        :param group_column: name of the group column in the groups file (default 'lesion_id')
+        :param manifest_path: optional, path to CSV plan to save, or to reuse if it exists with the same options
+        :param skip_existing: flag, whether to skip files already at their target (default False)
+        :param progress: 'log' (default), 'tqdm', 'silent' or a ProgressReporter; see ProgressReporter
         :return (dataframe) list of folder names
         """
 
         df = pd.read_csv(info_file_path, index_col=0)
 
-        splits_total = np.sum(splits)
-
-        for split_root in split_roots:
-            FileTools.create_dirs_from_file_header(info_file_path, separator, split_root)
-
-        # Handle by class, for all splits
-        for col in df.columns:
-            # Get file paths
-            paths = []
-            for filename in df[df[col] == 1].index:
-                paths.append(os.path.join(src_root, '.'.join([filename, extension])))
-
-            random.shuffle(paths)
-
-            # Calculate the number of files per split; last one is special case
-            split_counts = []
-            for split in splits[:len(splits) - 1]:
-                split_count = int(len(paths) * split / splits_total)
-                split_counts.append(split_count)
-
-            split_count = len(paths) - np.sum(split_counts)
-            split_counts.append(split_count)
-
-            # Handle the directory splits.
-            temp_split_roots = split_roots.copy()
-            while len(temp_split_roots) > 0:
-                target_dir = os.path.join(temp_split_roots[0], col)
-                count = 0
-                for src_file in paths[:split_counts[0]]:
-                    target_file = src_file.replace(src_root, target_dir)
-                    shutil.copyfile(src_file, target_file)
-                    count += 1
-                    print(f'{count} files copied to {target_dir}')
-
-                # Remove items just done
-                if split_counts[0] > 0:
-                    paths = (paths[split_counts[0]:])
-                temp_split_roots.remove(temp_split_roots[0])
-                split_counts.remove(split_counts[0])
+        if not dry_run:
+            for split_root in split_roots:
+                FileTools.create_dirs_from_file_header(info_file_path, separator, split_root)
+
+        options = {'info_file_path': str(info_file_path), 'src_root': str(src_root),
+                   'split_roots': [str(split_root) for split_root in split_roots],
+                   'splits': np.asarray(splits).tolist(), 'extension': extension, 'seed': seed,
+                   'stratify': stratify, 'groups_file_path': str(groups_file_path), 'group_column': group_column}
+        options_path = manifest_path + '.options.json'
+
+        if manifest_path and Path(manifest_path).is_file():
+            if Path(options_path).is_file():
+                with open(options_path, 'r', encoding='utf-8') as infile:
+                    previous_options = json.load(infile)
+                changed = sorted(key for key in options if previous_options.get(key) != options[key])
+                if changed:
+                    raise ValueError(f'Split plan at {manifest_path} was made with different {", ".join(changed)}; '
+                                     f'remove it, or give another manifest path, to plan again')
+            print(f'Using split plan from {manifest_path}')
+            plan = pd.read_csv(manifest_path)
+        else:
+            plan = FileTools.plan_file_splits_to_class_dirs(info_file_path, src_root, split_roots, splits,
+                                                            extension=extension, seed=seed, stratify=stratify,
+                                                            groups_file_path=groups_file_path,
+                                                            group_column=group_column)
+            if manifest_path:
+                Path(manifest_path).parent.mkdir(parents=True, exist_ok=True)
+                plan.to_csv(manifest_path, index=False)
+                with open(options_path, 'w', encoding='utf-8') as outfile:
+                    json.dump(options, outfile, indent=2)
+                print(f'Split plan saved at {manifest_path}')
+
+        FileTools.execute_copy_plan(plan, workers=workers, link_mode=link_mode, dry_run=dry_run,
+                                    skip_existing=skip_existing, progress=progress)
 
         return df
 
     @staticmethod
-    def ensure_empty_directory(dir_path: str) -> str:
+    def ensure_empty_directory(dir_path: str, in_background: bool = False) -> str:
         """If path does not exist, create it. If it does exist, empty it.
 
+        Content is removed in a single os.scandir pass over the top-level entries. With in_background, the
+        directory is instead renamed aside and a new empty one created at once, while the old one is deleted in
+        a background thread; see wait_for_background_deletions.
+
         Keyword arguments:
         :param dir_path: root directory path
+        :param in_background: flag, whether to delete existing content in a background thread (default False)
         :return: descriptor of result
         """
         result = 'Invalid'
@@ -221,15 +385,13 @@ class FileTools:
             if Path(dir_path).exists():
                 if len(os.listdir(dir_path)) > 0:
                     result = 'Directory exists, not empty, deleting content'
-                    # Clear sub-dirs first then tackle files
-                    for root, dirs, files in os.walk(dir_path, topdown=False):
-                        for directory in dirs:
-                            to_remove = os.path.join(root, directory)
-                            shutil.rmtree(to_remove)
-                    for root, dirs, files in os.walk(dir_path, topdown=False):
-                        for file in files:
-                            to_remove = os.path.join(dir_path, file)
-                            os.remove(to_remove)
+                    if not (in_background and FileTools._delete_directory_in_background(dir_path)):
+                        with os.scandir(dir_path) as entries:
+                            for entry in entries:
+                                if entry.is_dir(follow_symlinks=False):
+                                    shutil.rmtree(entry.path)
+                                else:
+                                    os.remove(entry.path)
                 else:
                     result = 'Directory exists'
             else:
@@ -247,6 +409,31 @@ class FileTools:
         print('{}: {}'.format(result, dir_path))
         return result
 
+    @staticmethod
+    def _delete_directory_in_background(dir_path: str) -> bool:
+        """Rename directory aside, within the same parent, and delete it in a background thread.
+
+        :param dir_path: directory path
+        :return: True if renamed aside, False if it could not be, e.g. because a file within it is open on Windows
+        """
+        aside_path = f'{os.path.normpath(dir_path)}.deleting-{uuid.uuid4().hex}'
+        try:
+            os.rename(dir_path, aside_path)
+        except OSError:
+            return False
+
+        thread = threading.Thread(target=shutil.rmtree, args=(aside_path,), kwargs={'ignore_errors': True})
+        thread.start()
+        FileTools._background_deletions.append(thread)
+
+        return True
+
+    @staticmethod
+    def wait_for_background_deletions():
+        """Wait for deletions started by ensure_empty_directory(in_background=True) to finish."""
+        while FileTools._background_deletions:
+            FileTools._background_deletions.pop().join()
+
     @staticmethod
     def lines_list_from_file(file_path: str) -> list:
         """Retrieve lines of text from file, return list
@@ -256,13 +443,44 @@ class FileTools:
         :return: list of text lines
         """
 
-        with open(file_path, 'r') as infile:
-            line_list = infile.readlines()
+        return list(FileTools.lines_generator(file_path))
 
-        # Strip newline chars
-        line_list = [line.strip() for line in line_list]
+    @staticmethod
+    def lines_generator(file_path: str, chunk_size: int = None, use_mmap: bool = False, encoding: str = None):
+        """Yield stripped lines of text from file, one at a time or in lists of chunk_size
 
-        return line_list
+        Only one line, or one chunk, is held at a time, so memory use does not grow with file size.
+
+        Keyword arguments:
+        :param file_path: full path to file
+        :param chunk_size: (optional) number of lines in each yielded list; if not given, lines are yielded singly
+        :param use_mmap: flag, whether to memory-map the file and split it on newlines, for bulk reading of large
+        files (default False)
+        :param encoding: (optional) text encoding, defaulting to the platform default as for open()
+        :return: stripped line, or list of stripped lines
+        """
+        lines = FileTools._mmap_lines(file_path, encoding) if use_mmap else FileTools._text_lines(file_path, encoding)
+
+        if chunk_size is None:
+            yield from lines
+        else:
+            yield from FileTools.chunks_generator(lines, chunk_size)
+
+    @staticmethod
+    def _text_lines(file_path: str, encoding: str = None):
+        with open(file_path, 'r', encoding=encoding) as infile:
+            for line in infile:
+                yield line.strip()
+
+    @staticmethod
+    def _mmap_lines(file_path: str, encoding: str = None):
+        encoding = encoding or locale.getpreferredencoding(False)
+        with open(file_path, 'rb') as infile:
+            if os.fstat(infile.fileno()).st_size == 0:
+                return
+            with mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                for line in iter(buffer.readline, b''):
+                    yield line.decode(encoding).strip()
 
     @staticmethod
     def make_datetime_named_archive(src_path_to_archive: str, base_target_path: str,
@@ -346,64 +564,373 @@ class FileTools:
         if to_print:
             print(content)
 
+    @staticmethod
+    def _load_image_array(image_path: str, new_shape: tuple = 0, resize_engine: str = 'skimage') -> np.ndarray:
+        """Decode a single image and, if new_shape is given, resize it.
+
+        Resize engines:
+        - 'skimage': full decode, then skimage float resize (reference output)
+        - 'pil': JPEG DCT-domain downscaling via Image.draft, then Image.resize on uint8 data. Much faster when
+          new_shape is far smaller than the source, but output differs slightly from 'skimage'
+
+        :param image_path: path to image file
+        :param new_shape: optional, end shape of resized image array
+        :param resize_engine: 'skimage' or 'pil' (default 'skimage')
+        :return: image as int array
+        """
+        if new_shape != 0 and resize_engine == 'pil':
+            with Image.open(image_path) as img:
+                # PIL sizes are (width, height)
+                size = (new_shape[1], new_shape[0])
+                # draft only applies to JPEGs, and only ever scales to a size at least as large as requested
+                img.draft(img.mode, size)
+                return np.asarray(img.resize(size, Image.BILINEAR), dtype='int')
+
+        img = np.array(Image.open(image_path))
+
+        return np.asarray(
+            np.asarray(img, dtype='int') if new_shape == 0 else
+            resize(img, new_shape, preserve_range=True, anti_aliasing=False),
+            dtype='int'
+        )
+
+    @staticmethod
+    def _load_image_arrays(image_paths: list, new_shape: tuple = 0, resize_engine: str = 'skimage') -> list:
+        """Decode a batch of images; run in worker processes by create_numpy_archive_from_images_dir.
+
+        :param image_paths: paths to image files
+        :param new_shape: optional, end shape of resized image arrays
+        :param resize_engine: 'skimage' or 'pil' (default 'skimage')
+        :return: list of image arrays, in the order of image_paths
+        """
+        return [FileTools._load_image_array(image_path, new_shape, resize_engine) for image_path in image_paths]
+
+    @staticmethod
+    def _image_files_in_dir(src_dir: str, suffix: str) -> list:
+        """Paths of files in src_dir with the given suffix, in file name order."""
+        return [os.path.join(src_dir, f) for f in sorted(os.listdir(src_dir))
+                if os.path.isfile(os.path.join(src_dir, f))
+                and Path(os.path.join(src_dir, f)).suffix == suffix]
+
+    @staticmethod
+    def _image_batches_generator(image_files: list, new_shape: tuple = 0, workers: int = 1,
+                                 batch_size: int = 0, resize_engine: str = 'skimage') -> list:
+        """Yield batches of decoded image arrays, in the order of image_files.
+
+        With workers > 1, batches are decoded in a BatchExecutor process pool with at most two batches per worker in
+        flight, so only a bounded number of batches is ever held in memory.
+
+        :param image_files: paths to image files
+        :param new_shape: optional, end shape of resized image arrays
+        :param workers: number of processes used to decode images
+        :param batch_size: images per batch; 0 for a size based on the number of workers
+        :param resize_engine: 'skimage' or 'pil' (default 'skimage')
+        :return: list of image arrays
+        """
+        if batch_size < 1:
+            # Several batches per worker keeps the pool busy when image sizes vary
+            batch_size = BatchExecutor.batch_size_for(len(image_files), workers)
+
+        yield from BatchExecutor.map_batches(FileTools._load_image_arrays, image_files, batch_size, workers=workers,
+                                             backend='process', args=(new_shape, resize_engine))
+
+    @staticmethod
+    def _file_sha256(file_path: str, block_size: int = 1024 * 1024) -> str:
+        sha256 = hashlib.sha256()
+        with open(file_path, 'rb') as infile:
+            for block in iter(lambda: infile.read(block_size), b''):
+                sha256.update(block)
+
+        return sha256.hexdigest()
+
+    @staticmethod
+    def _incremental_archive_rows(image_files: list, final_path: str, manifest_path: str, options: dict,
+                                  use_hash: bool) -> tuple:
+        """Compare source files with the manifest of a previous incremental run.
+
+        :param image_files: paths of current source images, in archive order
+        :param final_path: path of the previous archive
+        :param manifest_path: path of the previous manifest
+        :param options: archive options of this run; rows are only reused if unchanged since the previous run, and
+            if the archive is the one the manifest was saved with
+        :param use_hash: flag, whether to compare content hashes when size or mtime has changed
+        :return: manifest file entries for image_files, dict of new row to previous row for reusable images
+        """
+        previous_entries = {}
+        if Path(manifest_path).is_file() and Path(final_path).is_file():
+            with open(manifest_path, 'r', encoding='utf-8') as infile:
+                previous_manifest = json.load(infile)
+            # The archive may have been rewritten since, e.g. by a run that was not incremental
+            if previous_manifest['options'] == options \
+                    and previous_manifest.get('archive') == FileTools._archive_stat(final_path):
+                previous_entries = {entry['file_name']: (row, entry)
+                                    for row, entry in enumerate(previous_manifest['files'])}
+
+        entries = []
+        cached_rows = {}
+        for row, image_file in enumerate(image_files):
+            stat = os.stat(image_file)
+            entry = {'file_name': Path(image_file).name, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+                     'sha256': ''}
+            previous_row, previous_entry = previous_entries.get(entry['file_name'], (-1, None))
+
+            if previous_entry is not None and previous_entry['size'] == entry['size'] \
+                    and previous_entry['mtime_ns'] == entry['mtime_ns']:
+                entry['sha256'] = previous_entry['sha256']
+                cached_rows[row] = previous_row
+            elif use_hash:
+                entry['sha256'] = FileTools._file_sha256(image_file)
+                if previous_entry is not None and previous_entry['sha256'] == entry['sha256']:
+                    cached_rows[row] = previous_row
+            entries.append(entry)
+
+        return entries, cached_rows
+
+    @staticmethod
+    def _archive_stat(archive_path: str) -> dict:
+        """Size and mtime of an archive, recorded in its incremental manifest to tie the two together."""
+        stat = os.stat(archive_path)
+        return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+    @staticmethod
+    def _archive_rows_generator(image_files: list, cached_rows: dict, previous_archive: np.ndarray,
+                                new_shape: tuple, workers: int, batch_size: int, resize_engine: str) -> np.ndarray:
+        """Yield archive rows in order, from the previous archive where cached, else freshly decoded."""
+        to_decode = [image_file for row, image_file in enumerate(image_files) if row not in cached_rows]
+        decoded = (img for images in FileTools._image_batches_generator(to_decode, new_shape, workers, batch_size,
+                                                                        resize_engine)
+                   for img in images)
+
+        for row in range(len(image_files)):
+            yield np.array(previous_archive[cached_rows[row]]) if row in cached_rows else next(decoded)
+
     @staticmethod
     def create_numpy_archive_from_images_dir(src_dir: str, target_path: str,
                                              new_shape: tuple = 0,
-                                             suffix: str = '.jpg'):
+                                             suffix: str = '.jpg',
+                                             workers: int = 1,
+                                             streaming: bool = False,
+                                             dtype: str = 'uint8',
+                                             batch_size: int = 0,
+                                             resize_engine: str = 'skimage',
+                                             incremental: bool = False,
+                                             use_hash: bool = False):
         """Create a numpy array archive of images sourced from a single directory.
 
         If new_shape is not provided, and images are of different dimensions, then this will generate
         an exception.
 
+        Images are archived in file name order. With workers > 1, images are decoded and resized in chunks
+        across a process pool; the saved file is identical to that of the serial path.
+
+        By default all images are held in memory as int arrays before saving. With streaming, the .npy file is
+        preallocated as a memory map of the given dtype and filled one batch at a time, so peak memory does not
+        grow with the number of images; an image with values outside the range of dtype raises ValueError. Either
+        way the archive is written to target_path + '.tmp.npy' and only replaces any previous archive once complete.
+
+        With incremental, a manifest of each source file's name, size and mtime (and optionally hash) is kept
+        alongside the archive. On later incremental runs with the same options, only new or changed images are
+        decoded; other rows are copied from the previous archive, and rows of deleted images are dropped.
+
         Keyword arguments:
 
         :param src_dir: path to source directory
         :param target_path: path to final final, excluding extension
         :param new_shape: optional, end shape of resized image arrays
         :param suffix: suffix of images to be processed, including preceding full-stop (default '.jpg')
+        :param workers: number of processes used to decode images (default 1, i.e. no pool)
+        :param streaming: flag, whether to write images straight to a memory-mapped file (default False)
+        :param dtype: dtype of streamed archive (default 'uint8'); ignored unless streaming
+        :param batch_size: images decoded per batch (default 0, i.e. based on number of workers)
+        :param resize_engine: 'skimage' (default) or 'pil' for fast JPEG downscaling; see _load_image_array
+        :param incremental: flag, whether to decode only images added or changed since the last incremental run,
+            per the sidecar manifest saved at target_path + '.manifest.json' (default False)
+        :param use_hash: flag, whether to compare SHA-256 of content when size or mtime has changed (default False)
         """
         # Catch items where None passed in
         if new_shape is None:
             new_shape = 0
         if suffix is None:
             suffix = '.jpg'
+        if workers is None or workers < 1:
+            workers = os.cpu_count() or 1
+        if batch_size is None:
+            batch_size = 0
+        if streaming and batch_size < 1:
+            batch_size = 64
+        if resize_engine is None:
+            resize_engine = 'skimage'
+        if resize_engine not in FileTools.RESIZE_ENGINES:
+            raise ValueError(f'Unknown resize engine "{resize_engine}", expected one of {FileTools.RESIZE_ENGINES}')
 
         if src_dir == '':
             result = f'No source directory supplied for images, so no npy file created.'
         elif not Path(src_dir).is_dir():
             result = f'"{src_dir}" is not a directory, so no npy file created.'
         else:
-            image_files = [os.path.join(src_dir, f) for f in os.listdir(src_dir)
-                           if os.path.isfile(os.path.join(src_dir, f))
-                           and Path(os.path.join(src_dir, f)).suffix == suffix]
+            image_files = FileTools._image_files_in_dir(src_dir, suffix)
 
             if len(image_files) == 0:
                 result = f'No {suffix} files at {src_dir} so no npy file created.'
             else:
+                final_path = target_path + '.npy'
+                manifest_path = target_path + '.manifest.json'
+                options = {'new_shape': 0 if new_shape == 0 else list(new_shape), 'suffix': suffix,
+                           'resize_engine': resize_engine, 'dtype': np.dtype(dtype if streaming else 'int').name}
+                manifest = {'options': options, 'files': []}
+                cached_rows = {}
+                previous_archive = None
+
+                if incremental:
+                    manifest['files'], cached_rows = FileTools._incremental_archive_rows(
+                        image_files, final_path, manifest_path, options, use_hash)
+                    if len(cached_rows) == len(image_files) \
+                            and all(row == previous_row for row, previous_row in cached_rows.items()) \
+                            and np.load(final_path, mmap_mode='r').shape[0] == len(image_files):
+                        # Content unchanged, but mtimes may not be
+                        manifest['archive'] = FileTools._archive_stat(final_path)
+                        with open(manifest_path, 'w', encoding='utf-8') as outfile:
+                            json.dump(manifest, outfile)
+                        return f'Npy file at {final_path} is up to date'
+                    if len(cached_rows) > 0:
+                        previous_archive = np.load(final_path, mmap_mode='r')
+
+                # Write alongside then replace, so a failed run leaves any previous archive intact; cached rows are
+                # also read from the previous archive while writing
+                write_path = target_path + '.tmp.npy'
                 processed_images = []
+                archive = None
 
                 try:
-                    for img in [np.array(Image.open(image_path)) for image_path in image_files]:
-                        processed_images.append(
-                            np.asarray(
-                                np.asarray(img, dtype='int') if new_shape == 0 else
-                                resize(img, new_shape, preserve_range=True, anti_aliasing=False),
-                                dtype='int'
-                            )
-                        )
+                    rows = FileTools._archive_rows_generator(image_files, cached_rows, previous_archive,
+                                                             new_shape, workers, batch_size, resize_engine)
+                    for row, img in enumerate(rows):
+                        if not streaming:
+                            processed_images.append(img)
+                            continue
+
+                        if archive is None:
+                            archive = np.lib.format.open_memmap(write_path, mode='w+', dtype=dtype,
+                                                                shape=(len(image_files),) + img.shape)
+                        if img.shape != archive.shape[1:]:
+                            raise ValueError(f'{image_files[row]} has shape {img.shape}, '
+                                             f'expected {archive.shape[1:]}; supply new_shape')
+                        if np.issubdtype(archive.dtype, np.integer) and img.size > 0:
+                            # Assignment would silently wrap values the archive dtype cannot hold
+                            limits = np.iinfo(archive.dtype)
+                            if img.min() < limits.min or img.max() > limits.max:
+                                raise ValueError(f'{image_files[row]} has values from {img.min()} to {img.max()}, '
+                                                 f'outside the range of {archive.dtype}; supply a wider dtype')
+                        archive[row] = img
                 except Exception as err:
+                    if archive is not None:
+                        del archive
+                        archive = None
+                    if Path(write_path).exists():
+                        os.remove(write_path)
                     error_message = \
                         "Unexpected error in FileTools.create_numpy_archive_from_images_dir\n"\
                         + str(err.args)
                     raise Exception(error_message)
+                finally:
+                    if archive is not None:
+                        archive.flush()
+                        del archive
 
-                final_path = target_path + '.npy'
-                np.save(final_path, processed_images)
+                if not streaming:
+                    np.save(write_path, processed_images)
+
+                if previous_archive is not None:
+                    del previous_archive
+                os.replace(write_path, final_path)
+
+                if incremental:
+                    manifest['archive'] = FileTools._archive_stat(final_path)
+                    with open(manifest_path, 'w', encoding='utf-8') as outfile:
+                        json.dump(manifest, outfile)
 
                 result = f'Npy file saved at {final_path}'
+                if incremental:
+                    result += f' ({len(image_files) - len(cached_rows)} of {len(image_files)} images decoded)'
 
         return result
 
+    @staticmethod
+    def create_sharded_numpy_archive_from_images_dir(src_dir: str, target_dir: str,
+                                                     shard_size: int = 1000,
+                                                     new_shape: tuple = 0,
+                                                     suffix: str = '.jpg',
+                                                     workers: int = 1,
+                                                     dtype: str = 'uint8',
+                                                     resize_engine: str = 'skimage',
+                                                     append: bool = False):
+        """Create a sharded numpy archive of images sourced from a single directory, for reading with
+        ShardedArchive.
+
+        Images are split, in file name order, into .npy shards of shard_size images, with an index of file name,
+        shape, shard number and offset. Images need not share a shape. At most one shard is held in memory.
+
+        Keyword arguments:
+
+        :param src_dir: path to source directory
+        :param target_dir: path to archive directory
+        :param shard_size: number of images per shard (default 1000)
+        :param new_shape: optional, end shape of resized image arrays
+        :param suffix: suffix of images to be processed, including preceding full-stop (default '.jpg')
+        :param workers: number of processes used to decode images (default 1, i.e. no pool)
+        :param dtype: dtype of archived images (default 'uint8')
+        :param resize_engine: 'skimage' (default) or 'pil'; see _load_image_array
+        :param append: flag, whether to add images not already in an existing archive as new shards (default False)
+        """
+        if new_shape is None:
+            new_shape = 0
+        if suffix is None:
+            suffix = '.jpg'
+        if workers is None or workers < 1:
+            workers = os.cpu_count() or 1
+
+        if src_dir == '':
+            return f'No source directory supplied for images, so no archive created.'
+        elif not Path(src_dir).is_dir():
+            return f'"{src_dir}" is not a directory, so no archive created.'
+
+        if append and ShardedArchive.is_archive(target_dir):
+            index = ShardedArchive.read_index(target_dir)
+            if np.dtype(index['dtype']) != np.dtype(dtype):
+                raise ValueError(f'Archive {target_dir} has dtype {index["dtype"]}, cannot append {dtype}')
+        else:
+            FileTools.ensure_empty_directory(target_dir)
+            index = {'dtype': np.dtype(dtype).name, 'shards': [], 'items': []}
+
+        archived = set(item['file_name'] for item in index['items'])
+        image_files = [f for f in FileTools._image_files_in_dir(src_dir, suffix) if Path(f).name not in archived]
+
+        if len(image_files) == 0:
+            return f'No new {suffix} files at {src_dir} so no shards created.'
+
+        try:
+            shard_images = []
+            shard_files = FileTools.chunks_generator(image_files, shard_size)
+            files = next(shard_files)
+            for images in FileTools._image_batches_generator(image_files, new_shape, workers,
+                                                             min(shard_size, 64), resize_engine):
+                shard_images.extend(images)
+                while len(shard_images) >= len(files) > 0:
+                    ShardedArchive.write_shard(target_dir, index, [Path(f).name for f in files],
+                                               shard_images[:len(files)])
+                    shard_images = shard_images[len(files):]
+                    files = next(shard_files, [])
+        except Exception as err:
+            error_message = \
+                "Unexpected error in FileTools.create_sharded_numpy_archive_from_images_dir\n"\
+                + str(err.args)
+            raise Exception(error_message)
+        finally:
+            # Shards written so far remain usable
+            ShardedArchive.write_index(target_dir, index)
+
+        return f'{len(image_files)} images saved in {len(index["shards"])} shards at {target_dir}'
+
     @staticmethod
     def path_of_first_file_of_type(directory: str, extension: str = '.jpg'):
         found_path = ''
@@ -432,7 +959,8 @@ class FileTools:
         return dataset_type
 
     @staticmethod
-    def copy_dir_as_unclassed(source_dir: str, target_dir: str, replace_content: bool = False) -> str:
+    def copy_dir_as_unclassed(source_dir: str, target_dir: str, replace_content: bool = False,
+                              progress='log') -> str:
         dataset_type = FileTools.dataset_type_from_name(Path(source_dir).name)
         can_copy_files = replace_content
 
@@ -455,15 +983,17 @@ class FileTools:
             can_copy_files = True
 
         if can_copy_files:
+            file_pairs = []
             for root, dirs, files in os.walk(source_dir, topdown=False):
                 for file in files:
-                    shutil.copy(os.path.join(source_dir, file), leaf_target_dir)
+                    file_pairs.append((os.path.join(source_dir, file), os.path.join(leaf_target_dir, file)))
+            CopyEngine.copy_files(file_pairs, progress=progress)
 
         return leaf_target_dir
 
     @staticmethod
-    def collate_files_by_low_level_dir_name(source_dir: str, low_level_dir_name: str, path_parts_re: list)\
-            -> np.ndarray:
+    def collate_files_by_low_level_dir_name(source_dir: str, low_level_dir_name: str, path_parts_re: list,
+                                            progress='log') -> np.ndarray:
         """
         Collate files within a regular structure but deep structure into an alternative one.
         Assume source files of interest are in commonly named sub-directories.
@@ -475,6 +1005,7 @@ class FileTools:
         :param source_dir: top level source directory
         :param low_level_dir_name: lowest level commonly named directory, or common suffix
         :param path_parts_re: list of common parts of file paths to rename or remove, defined as regular expressions
+        :param progress: 'log' (default), 'tqdm', 'silent' or a ProgressReporter; see ProgressReporter
         :return: data list of lists [file path, file name, copy path]
         """
         path = Path(source_dir)
@@ -501,28 +1032,54 @@ class FileTools:
         data['FileName'] = file_names
         data['CopyPath'] = copy_paths
 
-        for item in data:
-            Path(Path(item['CopyPath']).parent).mkdir(parents=True, exist_ok=True)
-            shutil.copy(item['FilePath'], item['CopyPath'])
-            print(f'Copy {item["FileName"]} from {Path(item["FilePath"]).parent} to {Path(item["CopyPath"]).parent}')
+        for copy_dir in set(Path(copy_path).parent for copy_path in data['CopyPath']):
+            copy_dir.mkdir(parents=True, exist_ok=True)
+        CopyEngine.copy_files(list(zip(data['FilePath'], data['CopyPath'])), progress=progress)
 
         return data
 
     @staticmethod
-    def df_from_excel_workbook(src_path: str, sheet_exceptions: list) -> pd.DataFrame:
+    def _read_excel_sheets(sheet_names: list, src_path: str, usecols=None, dtype=None) -> dict:
+        with pd.ExcelFile(src_path) as wb:
+            return pd.read_excel(wb, sheet_name=list(sheet_names), usecols=usecols, dtype=dtype)
+
+    @staticmethod
+    def _excel_sheets(src_path: str, sheet_exceptions: list, workers: int = 1, usecols=None, dtype=None) -> dict:
+        """Read the worksheets of an Excel workbook other than sheet_exceptions, which are never parsed
+
+        With workers > 1, sheets are parsed in a process pool, a few sheets to each task, as each process opens
+        the workbook afresh.
+
+        :return: dict of sheet name to DataFrame, in workbook order
+        """
+        with pd.ExcelFile(src_path) as wb:
+            sheet_names = [sheet for sheet in wb.sheet_names if sheet not in sheet_exceptions]
+            if workers <= 1 or len(sheet_names) < 2:
+                return pd.read_excel(wb, sheet_name=sheet_names, usecols=usecols, dtype=dtype)
+
+        df_sheets = {}
+        batch_size = BatchExecutor.batch_size_for(len(sheet_names), workers, batches_per_worker=2)
+        for sheets in BatchExecutor.map_batches(FileTools._read_excel_sheets, sheet_names, batch_size,
+                                                workers=workers, backend='process', args=(src_path, usecols, dtype)):
+            df_sheets.update(sheets)
+
+        return df_sheets
+
+    @staticmethod
+    def df_from_excel_workbook(src_path: str, sheet_exceptions: list, workers: int = 1, usecols=None,
+                               dtype=None) -> pd.DataFrame:
         """
         Extract worksheet data from an Excel workbook into a single pandas DataFrame
 
+        Excluded worksheets are skipped before parsing, so cost nothing.
+
         :param src_path: path to source Excel workbook
         :param sheet_exceptions: worksheets to exclude from output
+        :param workers: number of processes parsing worksheets (default 1, i.e. no pool)
+        :param usecols: (optional) columns to parse from each worksheet, as for pandas.read_excel
+        :param dtype: (optional) dtype, or dict of column to dtype, as for pandas.read_excel
                                   """
-        # read file
-        wb = pd.ExcelFile(src_path)
-
-        # remove unwanted sheets
-        df_sheets = pd.read_excel(wb, sheet_name=None)
-        for sheet in sheet_exceptions:
-            df_sheets.pop(sheet, None)
+        df_sheets = FileTools._excel_sheets(src_path, sheet_exceptions, workers, usecols, dtype)
 
         # add new Source column to each sheet, with name of source worksheet
         for k, v in df_sheets.items():
@@ -534,25 +1091,23 @@ class FileTools:
         return df
 
     @staticmethod
-    def df_list_from_excel_workbook(src_path: str, sheet_exceptions: list) -> list:
+    def df_list_from_excel_workbook(src_path: str, sheet_exceptions: list, workers: int = 1, usecols=None,
+                                    dtype=None) -> list:
         """
         Extract list of pandas DataFrames from an Excel workbook
 
+        Excluded worksheets are skipped before parsing, so cost nothing.
+
         :param src_path: path to source Excel workbook
         :param sheet_exceptions: worksheets to exclude from output
+        :param workers: number of processes parsing worksheets (default 1, i.e. no pool)
+        :param usecols: (optional) columns to parse from each worksheet, as for pandas.read_excel
+        :param dtype: (optional) dtype, or dict of column to dtype, as for pandas.read_excel
         """
-        # read file
-        wb = pd.ExcelFile(src_path)
-
-        # remove unwanted sheets
-        df_sheets = pd.read_excel(wb, sheet_name=None)
-        for sheet in sheet_exceptions:
-            df_sheets.pop(sheet, None)
-
-        return df_sheets
+        return FileTools._excel_sheets(src_path, sheet_exceptions, workers, usecols, dtype)
 
     @staticmethod
-    def list_lines_with_term(file_path: str, term: str, exceptions: str = '') -> list:
+    def list_lines_with_term(file_path: str, term, exceptions: str = '') -> list:
         """
         Extract list of lines containing a given term instance from a file
 
@@ -561,27 +1116,31 @@ class FileTools:
         lines are delineated with some newline character such as carriage return or linefeed
         - words are space-separated
 
+        The file is read in large blocks and searched for all terms at once, see TextSearch.
+
         Args:
             file_path: path to file
-            term: term to search for
+            term: term, or list of terms, to search for
             exceptions: characters to retain
 
         Returns: list of found instances
         """
-        punctuation = [c for c in string.punctuation if c not in exceptions]
-
-        found_list = []
-        infile = open(file_path, 'r')
-        line = infile.readline()
-        while line:
-            position = line.find(term)
-
-            if position > -1:
-                line = line.replace('\n', '').replace('\\n', '')
-                for c in punctuation:
-                    line = line.replace(c, ' ').strip()
-                found_list.append(line)
-            line = infile.readline()
-        infile.close()
-
-        return found_list
+        return [line for _, line in TextSearch(term, exceptions).search_file(file_path, line_numbers=False)]
+
+    @staticmethod
+    def lines_with_term_in_files(path: str, term, exceptions: str = '', workers: int = 1):
+        """
+        Generate lines containing a given term instance across many files
+
+        Each file is memory-mapped and searched as raw bytes, decoding only matching lines, which are normalised as
+        by list_lines_with_term. Files are spread across a process pool when workers > 1.
+
+        Args:
+            path: directory to search recursively, or glob pattern such as 'notebooks/**/*.ipynb'
+            term: term, or list of terms, to search for
+            exceptions: characters to retain
+            workers: number of processes
+
+        Returns: generator of (file_path, line_no, line), in file order
+        """
+        return TextSearch.search_files(path, term, exceptions, workers=workers)
@@ -0,0 +1,147 @@
+# notebook_index.py
+
+import ast
+import json
+import os
+import re
+import uuid
+
+from pathlib import Path
+from src.text_search import TextSearch
+
+try:
+    import ijson
+except ImportError:
+    # Listed in requirements.txt; without it each notebook is loaded whole with json
+    ijson = None
+
+
+class NotebookImportIndex:
+    """Persisted index of the import statements in the code cells of Jupyter notebooks
+
+    Only code cells are used: markdown, outputs and metadata are skipped. With ijson installed (see
+    requirements.txt), notebooks are parsed as a stream of events, so memory is bounded by the largest single
+    string, not the whole notebook. Each output string, e.g. a base64 image, is still built in full by the parser
+    before being discarded; ijson has no way to skip a value unread. Without ijson, each notebook is loaded whole
+    with json. Imports are taken from the syntax tree of each cell, after IPython magics and shell lines are blanked
+    out, falling back to a line-by-line regex for cells that do not parse.
+
+    The index is saved as JSON, keyed by notebook path, with the mtime and size each notebook had when scanned, so
+    unchanged notebooks are skipped on the next update.
+
+    Example usage:
+
+    index = NotebookImportIndex('notebook_imports.json')
+    index.update('notebooks/**/*.ipynb')
+    print(index.all_imports())
+    """
+
+    IMPORT_LINE = re.compile(r'^\s*((?:from\s+[.\w]+\s+)?import\s+[^#;]+)')
+    MAGIC_LINE = re.compile(r'^\s*[%!]')
+
+    def __init__(self, index_path: str):
+        """
+        :param index_path: path of the JSON index file, created on the first save
+        """
+        self.index_path = index_path
+        self.entries = {}
+        if Path(index_path).is_file():
+            with open(index_path, 'r', encoding='utf-8') as infile:
+                self.entries = json.load(infile)
+
+    def save(self):
+        Path(self.index_path).parent.absolute().mkdir(parents=True, exist_ok=True)
+        temp_path = f'{self.index_path}.{uuid.uuid4().hex}.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as outfile:
+            json.dump(self.entries, outfile, indent=2)
+        os.replace(temp_path, self.index_path)
+
+    def update(self, path: str, save: bool = True) -> dict:
+        """Scan notebooks that are new or changed since the last update
+
+        Entries for notebooks that no longer exist are dropped.
+
+        :param path: directory to search recursively for .ipynb files, or glob pattern; checkpoints are skipped
+        :param save: flag, whether to save the index afterwards (default True)
+        :return: dict of notebook path to list of import statements, for the notebooks under path
+        """
+        notebook_paths = [notebook_path for notebook_path in TextSearch.files_to_search(path)
+                          if notebook_path.endswith('.ipynb')
+                          and '.ipynb_checkpoints' not in Path(notebook_path).parts]
+
+        self.entries = {notebook_path: entry for notebook_path, entry in self.entries.items()
+                        if Path(notebook_path).is_file()}
+        scanned = 0
+        for notebook_path in notebook_paths:
+            stat = os.stat(notebook_path)
+            entry = self.entries.get(notebook_path)
+            if entry and entry['mtime_ns'] == stat.st_mtime_ns and entry['size'] == stat.st_size:
+                continue
+
+            imports = []
+            for source in NotebookImportIndex.code_cell_sources(notebook_path):
+                imports.extend(NotebookImportIndex.imports_in_source(source))
+            self.entries[notebook_path] = {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size, 'imports': imports}
+            scanned += 1
+
+        print(f'Scanned {scanned} of {len(notebook_paths)} notebooks')
+        if save:
+            self.save()
+
+        return {notebook_path: self.entries[notebook_path]['imports'] for notebook_path in notebook_paths}
+
+    def all_imports(self) -> list:
+        """Sorted, distinct import statements across all notebooks in the index"""
+        return sorted({statement for entry in self.entries.values() for statement in entry['imports']})
+
+    @staticmethod
+    def code_cell_sources(notebook_path: str):
+        """Yield the source of each code cell of a notebook, as a single string"""
+        if ijson is None:
+            with open(notebook_path, 'r', encoding='utf-8') as infile:
+                notebook = json.load(infile)
+            for cell in notebook.get('cells', []):
+                if cell.get('cell_type') == 'code':
+                    source = cell.get('source', '')
+                    yield ''.join(source) if isinstance(source, list) else source
+            return
+
+        with open(notebook_path, 'rb') as infile:
+            cell_type, source = None, []
+            for prefix, event, value in ijson.parse(infile):
+                if prefix == 'cells.item' and event == 'start_map':
+                    cell_type, source = None, []
+                elif prefix == 'cells.item.cell_type':
+                    cell_type = value
+                elif event == 'string' and prefix in ('cells.item.source', 'cells.item.source.item'):
+                    source.append(value)
+                elif prefix == 'cells.item' and event == 'end_map' and cell_type == 'code':
+                    yield ''.join(source)
+
+    @staticmethod
+    def imports_in_source(source: str) -> list:
+        """Import statements in a code cell, in a canonical form such as 'from os import path as p'
+
+        :param source: code cell source
+        :return: list of import statements, in order
+        """
+        # Blank out magics and shell commands, keeping line numbers
+        lines = ['' if NotebookImportIndex.MAGIC_LINE.match(line) else line for line in source.splitlines()]
+        try:
+            tree = ast.parse('\n'.join(lines))
+        except SyntaxError:
+            return [' '.join(match.group(1).split()) for match in map(NotebookImportIndex.IMPORT_LINE.match, lines)
+                    if match]
+
+        nodes = sorted((node for node in ast.walk(tree) if isinstance(node, (ast.Import, ast.ImportFrom))),
+                       key=lambda node: (node.lineno, node.col_offset))
+        statements = []
+        for node in nodes:
+            names = ', '.join(alias.name if alias.asname is None else f'{alias.name} as {alias.asname}'
+                              for alias in node.names)
+            if isinstance(node, ast.Import):
+                statements.append(f'import {names}')
+            else:
+                statements.append(f'from {"." * node.level}{node.module or ""} import {names}')
+
+        return statements
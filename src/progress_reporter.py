@@ -0,0 +1,195 @@
+# progress_reporter.py
+
+import math
+import time
+
+from tqdm import tqdm
+
+
+class ProgressReporter:
+    """Silent progress reporter: counts files and bytes per group (e.g. target directory) and times the run.
+
+    Subclasses also report progress while running and a throughput summary at the end. Counters are available
+    programmatically from summary() whichever reporter is used.
+
+    Example usage:
+
+    progress = ProgressReporter.create('log')
+    progress.start(total=len(file_pairs))
+    for src_file, target_file in file_pairs:
+        ...
+        progress.update(os.path.dirname(target_file), num_bytes=os.path.getsize(src_file))
+    summary = progress.finish()
+    """
+
+    KINDS = ('silent', 'log', 'tqdm')
+
+    def __init__(self, description: str = '', action: str = 'copied'):
+        """
+        :param description: label for progress output
+        :param action: past tense of the action being counted, for progress output (default 'copied')
+        """
+        self.description = description
+        self.action = action
+        self.total = None
+        self.counters = {}
+        self.start_time = None
+        self.end_time = None
+
+    @staticmethod
+    def create(progress=None, description: str = '', action: str = 'copied'):
+        """Return a reporter for the given kind, or the reporter itself if one is given
+
+        :param progress: ProgressReporter, or one of KINDS (default None, i.e. 'silent')
+        :param description: label for progress output
+        :param action: past tense of the action being counted (default 'copied')
+        :return: ProgressReporter
+        """
+        if isinstance(progress, ProgressReporter):
+            return progress
+
+        kinds = {None: ProgressReporter, 'silent': ProgressReporter,
+                 'log': LoggingProgressReporter, 'tqdm': TqdmProgressReporter}
+        if progress not in kinds:
+            raise ValueError(f'Unknown progress reporter "{progress}", expected one of {ProgressReporter.KINDS}')
+
+        return kinds[progress](description=description, action=action)
+
+    def start(self, total: int = None):
+        """Reset counters and start timing
+
+        :param total: expected number of files, if known
+        """
+        self.total = total
+        self.counters = {}
+        self.start_time = time.perf_counter()
+        self.end_time = None
+
+    def update(self, group: str, files: int = 1, num_bytes: int = 0):
+        """Count files done
+
+        :param group: group the files belong to, e.g. target directory
+        :param files: number of files (default 1)
+        :param num_bytes: total size of the files
+        """
+        now = time.perf_counter()
+        if self.start_time is None:
+            self.start(self.total)
+
+        counter = self.counters.setdefault(group, {'files': 0, 'bytes': 0, 'first': now, 'last': now})
+        counter['files'] += files
+        counter['bytes'] += num_bytes
+        counter['last'] = now
+
+    def finish(self) -> dict:
+        """Stop timing
+
+        :return: summary, as for summary()
+        """
+        if self.start_time is None:
+            self.start(self.total)
+        self.end_time = time.perf_counter()
+
+        return self.summary()
+
+    @property
+    def files(self) -> int:
+        return sum(counter['files'] for counter in self.counters.values())
+
+    @property
+    def bytes(self) -> int:
+        return sum(counter['bytes'] for counter in self.counters.values())
+
+    @property
+    def elapsed(self) -> float:
+        if self.start_time is None:
+            return 0.0
+
+        return (self.end_time or time.perf_counter()) - self.start_time
+
+    def summary(self) -> dict:
+        """Counters so far
+
+        :return: dict of files, bytes, seconds, files_per_second, mb_per_second and groups, where groups maps each
+            group to its files, bytes and seconds from its first to its last update
+        """
+        seconds = self.elapsed
+
+        return {
+            'files': self.files,
+            'bytes': self.bytes,
+            'seconds': seconds,
+            'files_per_second': self.files / seconds if seconds > 0 else math.inf,
+            'mb_per_second': self.bytes / 1e6 / seconds if seconds > 0 else math.inf,
+            'groups': {group: {'files': counter['files'], 'bytes': counter['bytes'],
+                               'seconds': counter['last'] - counter['first']}
+                       for group, counter in self.counters.items()},
+        }
+
+
+class LoggingProgressReporter(ProgressReporter):
+    """Writes progress at most once per interval, then a line per group and a throughput summary."""
+
+    def __init__(self, description: str = '', action: str = 'copied', interval: float = 5.0, write=print):
+        """
+        :param description: label for progress output
+        :param action: past tense of the action being counted (default 'copied')
+        :param interval: minimum seconds between progress lines (default 5.0)
+        :param write: function taking a line of text, e.g. a logger's info method (default print)
+        """
+        super().__init__(description=description, action=action)
+        self.interval = interval
+        self.write = write
+        self._last_report = 0.0
+
+    def start(self, total: int = None):
+        super().start(total)
+        self._last_report = self.start_time
+
+    def update(self, group: str, files: int = 1, num_bytes: int = 0):
+        super().update(group, files, num_bytes)
+
+        now = time.perf_counter()
+        if now - self._last_report >= self.interval:
+            self._last_report = now
+            of_total = '' if self.total is None else f' of {self.total}'
+            self.write(f'{self.description}{" " if self.description else ""}{self.files}{of_total} files '
+                       f'{self.action} ({self.bytes / 1e6:.1f} MB)')
+
+    def finish(self) -> dict:
+        summary = super().finish()
+
+        for group, counter in summary['groups'].items():
+            self.write(f'{counter["files"]} files {self.action} to {group}')
+        self.write(f'{summary["files"]} files ({summary["bytes"] / 1e6:.1f} MB) {self.action} in '
+                   f'{summary["seconds"]:.2f}s: {summary["files_per_second"]:.1f} files/s, '
+                   f'{summary["mb_per_second"]:.1f} MB/s')
+
+        return summary
+
+
+class TqdmProgressReporter(LoggingProgressReporter):
+    """Shows a tqdm bar of files done, then writes the same summary as LoggingProgressReporter."""
+
+    def __init__(self, description: str = '', action: str = 'copied', write=print):
+        super().__init__(description=description, action=action, interval=math.inf, write=write)
+        self._bar = None
+
+    def start(self, total: int = None):
+        super().start(total)
+        if self._bar is not None:
+            self._bar.close()
+        self._bar = tqdm(total=total, unit='file', desc=self.description or None)
+
+    def update(self, group: str, files: int = 1, num_bytes: int = 0):
+        if self._bar is None:
+            self.start(self.total)
+        super().update(group, files, num_bytes)
+        self._bar.update(files)
+
+    def finish(self) -> dict:
+        if self._bar is not None:
+            self._bar.close()
+            self._bar = None
+
+        return super().finish()
@@ -0,0 +1,118 @@
+# sharded_archive.py
+
+import json
+import numpy as np
+import os
+
+from pathlib import Path
+
+
+class ShardedArchive:
+    """Random access to a sharded numpy image archive, as written by
+    FileTools.create_sharded_numpy_archive_from_images_dir.
+
+    An archive is a directory of flat .npy shards plus an index file. Each index item records the image's file
+    name, shape, shard number and element offset within that shard, so images of differing shapes can share a
+    shard. Shards are memory-mapped on first access, so the archive can be larger than available memory.
+
+    Example usage:
+
+    archive = ShardedArchive('data/isic2018/training_input_shards')
+    first_image = archive[0]
+    named_image = archive['ISIC_0024306.jpg']
+    """
+
+    INDEX_FILE_NAME = 'index.json'
+
+    def __init__(self, archive_dir: str):
+        """
+        :param archive_dir: path to archive directory
+        """
+        self.archive_dir = archive_dir
+        self.index = ShardedArchive.read_index(archive_dir)
+        self._positions = {item['file_name']: i for i, item in enumerate(self.index['items'])}
+        self._shards = {}
+
+    def __len__(self) -> int:
+        return len(self.index['items'])
+
+    def __getitem__(self, key) -> np.ndarray:
+        """Return a read-only image array by position or by file name.
+
+        :param key: int position, or file name of source image
+        :return: image array, a view on the memory-mapped shard
+        """
+        if isinstance(key, str):
+            if key not in self._positions:
+                raise KeyError(f'{key} not in archive {self.archive_dir}')
+            key = self._positions[key]
+
+        item = self.index['items'][key]
+        shard = self._shard(item['shard'])
+        size = int(np.prod(item['shape']))
+
+        return shard[item['offset']: item['offset'] + size].reshape(item['shape'])
+
+    @property
+    def file_names(self) -> list:
+        return [item['file_name'] for item in self.index['items']]
+
+    def _shard(self, shard_number: int) -> np.ndarray:
+        if shard_number not in self._shards:
+            shard_path = os.path.join(self.archive_dir, self.index['shards'][shard_number])
+            self._shards[shard_number] = np.load(shard_path, mmap_mode='r')
+
+        return self._shards[shard_number]
+
+    @staticmethod
+    def shard_file_name(shard_number: int) -> str:
+        return f'shard_{shard_number:05d}.npy'
+
+    @staticmethod
+    def read_index(archive_dir: str) -> dict:
+        """Read an archive index
+
+        :param archive_dir: path to archive directory
+        :return: index, with keys dtype, shards (list of shard file names) and items
+        """
+        with open(os.path.join(archive_dir, ShardedArchive.INDEX_FILE_NAME), 'r', encoding='utf-8') as infile:
+            return json.load(infile)
+
+    @staticmethod
+    def write_index(archive_dir: str, index: dict):
+        """Write an archive index, replacing any existing one in a single step
+
+        :param archive_dir: path to archive directory
+        :param index: index, as returned by read_index
+        """
+        index_path = os.path.join(archive_dir, ShardedArchive.INDEX_FILE_NAME)
+        temp_path = index_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as outfile:
+            json.dump(index, outfile)
+        os.replace(temp_path, index_path)
+
+    @staticmethod
+    def write_shard(archive_dir: str, index: dict, file_names: list, images: list):
+        """Save images as a new flat shard and add their items to the index (index file is not written).
+
+        :param archive_dir: path to archive directory
+        :param index: index to update
+        :param file_names: file names of images
+        :param images: image arrays
+        """
+        shard_number = len(index['shards'])
+        shard_file_name = ShardedArchive.shard_file_name(shard_number)
+
+        offset = 0
+        for file_name, img in zip(file_names, images):
+            index['items'].append({'file_name': file_name, 'shape': list(img.shape),
+                                   'shard': shard_number, 'offset': offset})
+            offset += img.size
+
+        shard = np.concatenate([np.asarray(img, dtype=index['dtype']).ravel() for img in images])
+        np.save(os.path.join(archive_dir, shard_file_name), shard)
+        index['shards'].append(shard_file_name)
+
+    @staticmethod
+    def is_archive(archive_dir: str) -> bool:
+        return Path(os.path.join(archive_dir, ShardedArchive.INDEX_FILE_NAME)).is_file()
@@ -0,0 +1,215 @@
+# text_search.py
+
+import glob
+import mmap
+import os
+import re
+import string
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+
+class TextSearch:
+    """Find lines containing any of several terms, in one pass over each file
+
+    Terms are searched for in raw file content, read in large blocks or memory-mapped, so only matching lines are
+    ever split out and decoded. A single term, or many terms, are compiled into one bytes regex; a few terms are
+    each found with bytes.find, as Python's regex engine has no fast scan for alternations.
+
+    Matching lines are normalised as FileTools.list_lines_with_term always has: newlines and literal '\\n' removed,
+    punctuation other than exceptions replaced with spaces in a single str.translate, and the result stripped.
+
+    Example usage:
+
+    search = TextSearch(['import', 'from'], exceptions='#')
+    for line_no, line in search.search_file('notebook.ipynb'):
+        print(line_no, line)
+
+    for file_path, line_no, line in TextSearch.search_files('notebooks/**/*.ipynb', ['import'], workers=8):
+        print(file_path, line_no, line)
+    """
+
+    BLOCK_SIZE = 16 * 1024 * 1024
+
+    # Up to this many terms, bytes.find per term beats a regex alternation
+    MAX_FIND_TERMS = 8
+
+    def __init__(self, terms, exceptions: str = '', encoding: str = 'utf-8'):
+        """
+        :param terms: term, or list of terms, to search for
+        :param exceptions: punctuation characters to retain in matching lines
+        :param encoding: encoding of the files searched (default 'utf-8')
+        """
+        self.terms = [terms] if isinstance(terms, str) else list(terms)
+        if not self.terms or '' in self.terms:
+            raise ValueError('Terms must be non-empty strings')
+
+        self.exceptions = exceptions
+        self.encoding = encoding
+        self.byte_terms = [term.encode(encoding) for term in self.terms]
+        self.pattern = None
+        if len(self.byte_terms) == 1 or len(self.byte_terms) > TextSearch.MAX_FIND_TERMS:
+            # Longest first, so a term is not shadowed by its own prefix
+            self.pattern = re.compile(b'|'.join(re.escape(term)
+                                                for term in sorted(self.byte_terms, key=len, reverse=True)))
+        punctuation = [c for c in string.punctuation if c not in exceptions]
+        self.translation = str.maketrans({c: ' ' for c in punctuation})
+        self.strip = len(punctuation) > 0
+
+    def normalise(self, line: str) -> str:
+        """Normalise a matching line as list_lines_with_term does"""
+        line = line.replace('\n', '').replace('\\n', '')
+        if self.strip:
+            line = line.translate(self.translation).strip()
+
+        return line
+
+    def _find(self, buffer, position: int, end: int, next_starts: list):
+        """Start and end of the first match in buffer[position:end], or None
+
+        :param next_starts: per term, position of its next match found so far, -1 if none left, or None if unknown
+        """
+        if self.pattern is not None:
+            match = self.pattern.search(buffer, position, end)
+            return None if match is None else (match.start(), match.end())
+
+        first = None
+        for i, term in enumerate(self.byte_terms):
+            if next_starts[i] is None or -1 < next_starts[i] < position:
+                next_starts[i] = buffer.find(term, position, end)
+            if next_starts[i] > -1 and (first is None or next_starts[i] < next_starts[first]):
+                first = i
+
+        return None if first is None else (next_starts[first], next_starts[first] + len(self.byte_terms[first]))
+
+    @staticmethod
+    def _count_newlines(buffer, start: int, end: int) -> int:
+        if isinstance(buffer, bytes):
+            return buffer.count(b'\n', start, end)
+
+        # mmap has no count
+        return buffer[start:end].count(b'\n')
+
+    def _matching_lines(self, buffer, first_line_no: int = 1, start: int = 0, end: int = None,
+                        line_numbers: bool = True):
+        """Yield (line_no, line) for each line of buffer[start:end] with a match, decoding only those lines
+
+        Newlines are counted once, in the gaps between matching lines, and only if line_numbers is set.
+
+        :param buffer: bytes, or an mmap, where buffer[start:end] holds complete lines
+        :param first_line_no: line number of the line at start
+        :param start: start position in buffer (default 0)
+        :param end: end position in buffer (default None, i.e. end of buffer)
+        :param line_numbers: flag, whether to count lines; if not, None is yielded as line_no (default True)
+        :return: line number of the line following buffer[start:end], via StopIteration, as for yield from
+        """
+        end = len(buffer) if end is None else end
+        line_no = first_line_no if line_numbers else None
+        counted_to = position = start
+        next_starts = [None] * len(self.byte_terms)
+        while True:
+            match = self._find(buffer, position, end, next_starts)
+            if match is None:
+                break
+
+            match_start, match_end = match
+            line_start = max(buffer.rfind(b'\n', start, match_start) + 1, start)
+            line_end = buffer.find(b'\n', match_end, end)
+            line_end = end if line_end == -1 else line_end + 1
+            if line_numbers:
+                line_no += TextSearch._count_newlines(buffer, counted_to, line_start)
+                counted_to = line_start
+
+            raw_line = buffer[line_start:line_end]
+            if raw_line.endswith(b'\r\n'):
+                # As read in text mode
+                raw_line = raw_line[:-2] + b'\n'
+            yield line_no, self.normalise(raw_line.decode(self.encoding, errors='replace'))
+
+            position = line_end
+
+        if line_numbers:
+            line_no += TextSearch._count_newlines(buffer, counted_to, end)
+
+        return line_no
+
+    def search_file(self, file_path: str, use_mmap: bool = False, block_size: int = 0, line_numbers: bool = True):
+        """Yield (line_no, line) for each line of a file containing any of the terms
+
+        :param file_path: path to file
+        :param use_mmap: flag, whether to memory-map the file rather than read it in blocks (default False)
+        :param block_size: bytes read per block; 0 for BLOCK_SIZE
+        :param line_numbers: flag, whether to count lines; if not, None is yielded as line_no (default True)
+        """
+        with open(file_path, 'rb') as infile:
+            if use_mmap:
+                if os.fstat(infile.fileno()).st_size == 0:
+                    return
+                with mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                    yield from self._matching_lines(buffer, line_numbers=line_numbers)
+                return
+
+            line_no = 1
+            remainder = b''
+            for block in iter(lambda: infile.read(block_size or TextSearch.BLOCK_SIZE), b''):
+                first_newline = block.find(b'\n')
+                if first_newline == -1:
+                    remainder += block
+                    continue
+
+                # Line running on from the previous block, then the complete lines of this block, without copying it
+                last_newline = block.rfind(b'\n')
+                line_no = yield from self._matching_lines(remainder + block[:first_newline + 1], line_no,
+                                                          line_numbers=line_numbers)
+                line_no = yield from self._matching_lines(block, line_no, first_newline + 1, last_newline + 1,
+                                                          line_numbers=line_numbers)
+                remainder = block[last_newline + 1:]
+
+            if remainder:
+                yield from self._matching_lines(remainder, line_no, line_numbers=line_numbers)
+
+    @staticmethod
+    def files_to_search(path: str) -> list:
+        """Files under a directory (recursively), or matching a glob pattern such as 'notebooks/**/*.ipynb'"""
+        if Path(path).is_dir():
+            return sorted(str(p) for p in Path(path).rglob('*') if p.is_file())
+
+        return sorted(p for p in glob.glob(path, recursive=True) if Path(p).is_file())
+
+    @staticmethod
+    def _search_file_lines(file_path: str, terms: list, exceptions: str, encoding: str) -> list:
+        search = TextSearch(terms, exceptions, encoding)
+        return [(file_path, line_no, line) for line_no, line in search.search_file(file_path, use_mmap=True)]
+
+    @staticmethod
+    def search_files(path: str, terms, exceptions: str = '', workers: int = 1, encoding: str = 'utf-8'):
+        """Yield (file_path, line_no, line) for each line containing any of the terms, across many files
+
+        Each file is memory-mapped and searched as raw bytes. With workers > 1, files are searched in a process
+        pool, with at most four files per worker in flight; results stream back in file order either way.
+
+        :param path: directory to search recursively, or glob pattern
+        :param terms: term, or list of terms, to search for
+        :param exceptions: punctuation characters to retain in matching lines
+        :param workers: number of processes (default 1)
+        :param encoding: encoding of the files searched (default 'utf-8')
+        """
+        terms = [terms] if isinstance(terms, str) else list(terms)
+        file_paths = TextSearch.files_to_search(path)
+
+        if workers <= 1:
+            for file_path in file_paths:
+                yield from TextSearch._search_file_lines(file_path, terms, exceptions, encoding)
+            return
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            in_flight = deque()
+            for file_path in file_paths:
+                in_flight.append(executor.submit(TextSearch._search_file_lines, file_path, terms, exceptions,
+                                                 encoding))
+                if len(in_flight) >= workers * 4:
+                    yield from in_flight.popleft().result()
+            while in_flight:
+                yield from in_flight.popleft().result()
@@ -0,0 +1,146 @@
+# http_test_server.py
+"""Local HTTP server standing in for remote dataset hosts in tests."""
+
+import hashlib
+import threading
+import time
+
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class LocalFileRequestHandler(BaseHTTPRequestHandler):
+    """Serves the server's files dict, with Range and If-Range support, ETag/Last-Modified validators and optional
+    injected disconnects."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_HEAD(self):
+        if self.server.reject_head:
+            self.server.requests.append((self.command, self.path, dict(self.headers)))
+            self.send_error(405)
+            return
+        self._send(include_body=False)
+
+    def do_GET(self):
+        self._send(include_body=True)
+
+    def _send(self, include_body: bool):
+        server = self.server
+        server.requests.append((self.command, self.path, dict(self.headers)))
+        content = server.files.get(self.path)
+        if content is None:
+            self.send_error(404)
+            return
+
+        etag = f'"{hashlib.md5(content).hexdigest()}"'
+        if_none_match = self.headers.get('If-None-Match')
+        if (if_none_match and if_none_match == etag) or \
+                (not if_none_match and self.headers.get('If-Modified-Since') == server.last_modified):
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+
+        start, end, status = 0, len(content) - 1, 200
+        range_header = self.headers.get('Range')
+        if_range = self.headers.get('If-Range')
+        if if_range and if_range not in (etag, server.last_modified):
+            # Representation changed since the client's partial copy: send it whole
+            range_header = None
+        if range_header and server.accept_ranges:
+            first, last = range_header.replace('bytes=', '').split('-')
+            start = int(first)
+            end = int(last) if last else len(content) - 1
+            if start >= len(content):
+                self.send_response(416)
+                self.send_header('Content-Range', f'bytes */{len(content)}')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            status = 206
+
+        body = content[start: end + 1]
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.send_header('Last-Modified', server.last_modified)
+        if server.accept_ranges:
+            self.send_header('Accept-Ranges', 'bytes')
+        if status == 206:
+            self.send_header('Content-Range', f'bytes {start}-{end}/{len(content)}')
+        self.end_headers()
+
+        if not include_body:
+            return
+
+        with server.lock:
+            disconnect = server.disconnects > 0
+            server.disconnects -= 1 if disconnect else 0
+
+        if disconnect:
+            # Send part of the body then drop the connection
+            self._write(body[:server.disconnect_after])
+            self.wfile.flush()
+            self.close_connection = True
+        else:
+            self._write(body)
+
+    def _write(self, body: bytes):
+        if not self.server.rate:
+            self.wfile.write(body)
+            return
+
+        # Throttle each connection to roughly rate bytes per second
+        block_size = 16384
+        for i in range(0, len(body), block_size):
+            self.wfile.write(body[i: i + block_size])
+            time.sleep(block_size / self.server.rate)
+
+
+class LocalFileServer(ThreadingHTTPServer):
+    """Threaded local HTTP server on a free port.
+
+    Example usage:
+
+    with LocalFileServer({'/file.bin': content}, disconnects=2) as server:
+        DownloadHelper.download_url(server.url('/file.bin'), target_path)
+    """
+
+    daemon_threads = True
+
+    def __init__(self, files: dict, accept_ranges: bool = True, disconnects: int = 0, disconnect_after: int = 1000,
+                 rate: int = 0, reject_head: bool = False):
+        """
+        :param files: dict of URL path to bytes content
+        :param accept_ranges: flag, whether to honour Range requests
+        :param disconnects: number of GET responses to cut short
+        :param disconnect_after: bytes of body sent before cutting a response short
+        :param rate: maximum bytes per second per connection (default 0, i.e. unthrottled)
+        :param reject_head: flag, whether to answer HEAD requests with 405, as some object stores do
+        """
+        super().__init__(('127.0.0.1', 0), LocalFileRequestHandler)
+        self.files = files
+        self.accept_ranges = accept_ranges
+        self.disconnects = disconnects
+        self.disconnect_after = disconnect_after
+        self.rate = rate
+        self.reject_head = reject_head
+        self.last_modified = formatdate(usegmt=True)
+        self.requests = []
+        self.lock = threading.Lock()
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    def url(self, path: str) -> str:
+        return f'http://127.0.0.1:{self.server_address[1]}{path}'
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,210 @@
+# test_archive_extractor.py
+
+import bz2
+import contextlib
+import gzip
+import io
+import lzma
+import os
+import tarfile
+import unittest
+import zipfile
+
+from pathlib import Path
+from src.archive_extractor import ArchiveExtractor
+from src.download_helper import DownloadHelper
+from src.file_tools import FileTools
+
+
+class ArchiveExtractorTestCase(unittest.TestCase):
+    """Test names are generally self-explanatory and so docstrings not provided on an individual basis other
+    than by exception.
+
+    Keyword arguments:
+    TestCase -- standard class required for tests based on unittest.case
+    """
+
+    def setUp(self):
+        """Fixtures used by tests."""
+        self.Root = Path(__file__).parent
+        self.WorkDir = os.path.join(self.Root, 'test_for_extraction')
+        self.FinalDir = os.path.join(self.WorkDir, 'final')
+        self.Content = {'a.txt': b'alpha', 'sub/b.txt': b'bravo', 'sub/deeper/c.txt': b'charlie'}
+        FileTools.ensure_empty_directory(self.WorkDir)
+
+    def tearDown(self) -> None:
+        FileTools.ensure_empty_directory(self.WorkDir)
+
+    def make_zip(self, members: dict) -> str:
+        archive_path = os.path.join(self.WorkDir, 'data.zip')
+        with zipfile.ZipFile(archive_path, 'w') as zip_ref:
+            zip_ref.writestr('top/', b'')
+            for name, data in members.items():
+                zip_ref.writestr(name, data)
+        return archive_path
+
+    def make_tar_gz(self, members: dict, compression: str = 'gz', file_name: str = '') -> str:
+        src_dir = os.path.join(self.WorkDir, 'src', 'top')
+        for name, data in members.items():
+            Path(src_dir, name).parent.mkdir(parents=True, exist_ok=True)
+            Path(src_dir, name).write_bytes(data)
+        archive_path = os.path.join(self.WorkDir, file_name or f'data.tar.{compression}'.rstrip('.'))
+        with tarfile.open(archive_path, f'w:{compression}') as tar_ref:
+            tar_ref.add(src_dir, arcname='top')
+        return archive_path
+
+    def assert_final_content(self):
+        actual = {Path(root, name).relative_to(self.FinalDir).as_posix(): Path(root, name).read_bytes()
+                  for root, _, names in os.walk(self.FinalDir) for name in names}
+        self.assertEqual(actual, self.Content)
+
+    def test_extract_into_place__strips_top_level_dir(self):
+        with self.subTest(self, testing_for='zip'):
+            archive_path = self.make_zip({f'top/{name}': data for name, data in self.Content.items()})
+            ArchiveExtractor.extract_into_place(archive_path, self.FinalDir, '.zip')
+            self.assert_final_content()
+
+        with self.subTest(self, testing_for='tar.gz'):
+            archive_path = self.make_tar_gz(self.Content)
+            ArchiveExtractor.extract_into_place(archive_path, self.FinalDir, '.tar.gz')
+            self.assert_final_content()
+
+        with self.subTest(self, testing_for='no staging or old dirs left'):
+            self.assertEqual(sorted(os.listdir(self.WorkDir)), ['data.tar.gz', 'data.zip', 'final', 'src'])
+
+    def test_extract_into_place__replaces_existing_content(self):
+        Path(self.FinalDir).mkdir()
+        Path(self.FinalDir, 'stale.txt').write_bytes(b'stale')
+        archive_path = self.make_zip({f'top/{name}': data for name, data in self.Content.items()})
+
+        ArchiveExtractor.extract_into_place(archive_path, self.FinalDir, '.zip')
+
+        self.assert_final_content()
+
+    def test_extract_into_place__when_unsafe_member__raises_and_keeps_existing_content(self):
+        Path(self.FinalDir).mkdir()
+        Path(self.FinalDir, 'kept.txt').write_bytes(b'kept')
+        archive_path = self.make_zip({'top/a.txt': b'alpha', 'top/../../escape.txt': b'escape'})
+
+        with self.assertRaises(ValueError):
+            ArchiveExtractor.extract_into_place(archive_path, self.FinalDir, '.zip')
+
+        self.assertEqual(os.listdir(self.FinalDir), ['kept.txt'])
+        self.assertFalse(Path(ArchiveExtractor.staging_dir_path(self.FinalDir)).exists())
+
+    def test_extract_zip__with_workers__matches_serial(self):
+        members = {f'top/class_{i % 3}/image_{i}.bin': os.urandom(i * 37) for i in range(40)}
+        archive_path = self.make_zip(members)
+        serial_dir = os.path.join(self.WorkDir, 'serial')
+        parallel_dir = os.path.join(self.WorkDir, 'parallel')
+
+        ArchiveExtractor.extract_zip(archive_path, serial_dir)
+        ArchiveExtractor.extract_zip(archive_path, parallel_dir, workers=3)
+
+        def tree(root_dir):
+            return {Path(root, name).relative_to(root_dir).as_posix(): Path(root, name).read_bytes()
+                    for root, _, names in os.walk(root_dir) for name in names}
+
+        self.assertEqual(tree(parallel_dir), tree(serial_dir))
+        self.assertEqual(len(tree(parallel_dir)), len(members))
+
+    def test_partition_zip_members__balances_sizes(self):
+        members = [zipfile.ZipInfo(f'file_{size}') for size in (10, 9, 8, 3, 2, 1)]
+        for member, size in zip(members, (10, 9, 8, 3, 2, 1)):
+            member.file_size = size
+
+        partitions = ArchiveExtractor.partition_zip_members(members, 2)
+
+        self.assertEqual(sorted(name for partition in partitions for name in partition),
+                         sorted(member.filename for member in members))
+        self.assertEqual(sorted(sum(int(name.split('_')[1]) for name in partition) for partition in partitions),
+                         [16, 17])
+
+    def test_archive_type__sniffs_magic_bytes_not_suffix(self):
+        text = b'a,b\n1,2\n'
+        expected = {
+            'zip': self.make_zip({'top/a.txt': b'alpha'}),
+            'tar': self.make_tar_gz(self.Content, '', 'tar.bin'),
+            'tar.gz': self.make_tar_gz(self.Content, 'gz', 'tar_gz.bin'),
+            'tar.bz2': self.make_tar_gz(self.Content, 'bz2', 'tar_bz2.bin'),
+            'tar.xz': self.make_tar_gz(self.Content, 'xz', 'tar_xz.bin'),
+            'gz': os.path.join(self.WorkDir, 'gz.bin'),
+            'bz2': os.path.join(self.WorkDir, 'bz2.bin'),
+            'xz': os.path.join(self.WorkDir, 'xz.bin'),
+            '': os.path.join(self.WorkDir, 'plain.zip'),
+        }
+        Path(expected['gz']).write_bytes(gzip.compress(text))
+        Path(expected['bz2']).write_bytes(bz2.compress(text))
+        Path(expected['xz']).write_bytes(lzma.compress(text))
+        Path(expected['']).write_bytes(text)
+
+        for archive_type, archive_path in expected.items():
+            with self.subTest(self, testing_for=archive_type):
+                self.assertEqual(ArchiveExtractor.archive_type(archive_path), archive_type)
+
+    def test_extract_into_place__for_compressed_tars__strips_top_level_dir(self):
+        for compression in ('bz2', 'xz'):
+            with self.subTest(self, testing_for=compression):
+                archive_path = self.make_tar_gz(self.Content, compression)
+                ArchiveExtractor.extract_into_place(archive_path, self.FinalDir)
+                self.assert_final_content()
+
+    def test_extract_tar__keeps_file_modes_and_links_inside_target_dir(self):
+        archive_path = os.path.join(self.WorkDir, 'links.tar')
+        with tarfile.open(archive_path, 'w') as tar_ref:
+            for name, member_type, linkname in (('top', tarfile.DIRTYPE, ''), ('top/run.sh', tarfile.REGTYPE, ''),
+                                                ('top/sub', tarfile.DIRTYPE, ''),
+                                                ('top/sub/run', tarfile.SYMTYPE, '../run.sh'),
+                                                ('top/hard.sh', tarfile.LNKTYPE, 'top/run.sh'),
+                                                ('top/escape', tarfile.SYMTYPE, '../../outside'),
+                                                ('top/absolute', tarfile.SYMTYPE, '/etc/passwd')):
+                info = tarfile.TarInfo(name)
+                info.type, info.linkname, info.mode = member_type, linkname, 0o755
+                data = b'echo hello\n' if member_type == tarfile.REGTYPE else b''
+                info.size = len(data)
+                tar_ref.addfile(info, io.BytesIO(data))
+
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            ArchiveExtractor.extract_tar(archive_path, self.FinalDir)
+
+        with self.subTest(self, testing_for='permission bits of regular files'):
+            self.assertEqual(os.stat(os.path.join(self.FinalDir, 'run.sh')).st_mode & 0o777, 0o755)
+
+        with self.subTest(self, testing_for='links resolving inside target dir'):
+            self.assertEqual(os.readlink(os.path.join(self.FinalDir, 'sub', 'run')), '../run.sh')
+            self.assertEqual(Path(self.FinalDir, 'hard.sh').read_bytes(), b'echo hello\n')
+
+        with self.subTest(self, testing_for='links leading outside skipped with a message'):
+            self.assertFalse(os.path.lexists(os.path.join(self.FinalDir, 'escape')))
+            self.assertFalse(os.path.lexists(os.path.join(self.FinalDir, 'absolute')))
+            self.assertIn('top/escape', output.getvalue())
+            self.assertIn('top/absolute', output.getvalue())
+
+    def test_unzip_archive__for_single_compressed_file__decompresses_into_final_dir(self):
+        archive_path = os.path.join(self.WorkDir, 'data.csv.gz')
+        Path(archive_path).write_bytes(gzip.compress(b'a,b\n1,2\n'))
+
+        for streaming in (False, True):
+            with self.subTest(self, testing_for=f'streaming {streaming}'):
+                DownloadHelper.unzip_archive(archive_path, self.WorkDir, self.FinalDir, streaming=streaming)
+                self.assertEqual(Path(self.FinalDir, 'data.csv').read_bytes(), b'a,b\n1,2\n')
+
+    def test_unzip_archive__for_tar__extracts_with_tarfile(self):
+        archive_path = self.make_tar_gz(self.Content, '')
+
+        DownloadHelper.unzip_archive(archive_path, self.WorkDir, self.FinalDir)
+
+        self.assert_final_content()
+
+    def test_unzip_archive__when_streaming__extracts_into_final_dir(self):
+        archive_path = self.make_zip({f'top/{name}': data for name, data in self.Content.items()})
+
+        DownloadHelper.unzip_archive(archive_path, self.WorkDir, self.FinalDir, streaming=True)
+
+        self.assert_final_content()
+        self.assertFalse(Path(self.WorkDir, 'temp').exists())
+
+
+if __name__ == '__main__':
+    unittest.main()
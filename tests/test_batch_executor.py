@@ -0,0 +1,72 @@
+# test_batch_executor.py
+
+import threading
+import time
+import unittest
+
+from src.batch_executor import BatchExecutor
+
+
+def square(x: int) -> int:
+    return x * x
+
+
+def batch_sum(batch, offset: int = 0) -> int:
+    return sum(batch) + offset
+
+
+class BatchExecutorTestCase(unittest.TestCase):
+    """Test names are generally self-explanatory and so docstrings not provided on an individual basis other
+    than by exception.
+
+    Keyword arguments:
+    TestCase -- standard class required for tests based on unittest.case
+    """
+
+    def test_map__preserves_order_for_each_backend(self):
+        expected = [x * x for x in range(50)]
+
+        for backend, workers in (('thread', 1), ('thread', 4), ('process', 2)):
+            with self.subTest(self, testing_for=f'{backend}, {workers} workers'):
+                actual = list(BatchExecutor.map(square, (x for x in range(50)), batch_size=3, workers=workers,
+                                                backend=backend))
+                self.assertListEqual(actual, expected)
+
+    def test_chunks__slices_sequences_and_consumes_iterables(self):
+        with self.subTest(self, testing_for='sequence'):
+            self.assertListEqual(list(BatchExecutor.chunks(list(range(7)), 3)), [[0, 1, 2], [3, 4, 5], [6]])
+
+        with self.subTest(self, testing_for='generator, overlapping windows'):
+            self.assertListEqual(list(BatchExecutor.chunks((x for x in range(5)), 3, step=2)),
+                                 [[0, 1, 2], [2, 3, 4]])
+
+    def test_map_batches__passes_batches_and_arguments(self):
+        actual = list(BatchExecutor.map_batches(batch_sum, list(range(10)), batch_size=4, workers=2,
+                                                kwargs={'offset': 100}))
+        self.assertListEqual(actual, [106, 122, 117])
+
+    def test_map_batches__bounds_batches_in_flight(self):
+        submitted = []
+        lock = threading.Lock()
+
+        def slow_len(batch) -> int:
+            with lock:
+                submitted.append(len(batch))
+            time.sleep(0.01)
+            return len(batch)
+
+        results = BatchExecutor.map_batches(slow_len, range(100), batch_size=1, workers=2, max_in_flight=3)
+        next(results)
+        time.sleep(0.1)
+        with self.subTest(self, testing_for='no more than max_in_flight batches taken ahead of the consumer'):
+            self.assertLessEqual(len(submitted), 4)
+
+        results.close()
+
+    def test_map_batches__with_unknown_backend__raises_value_error(self):
+        with self.assertRaises(ValueError):
+            next(BatchExecutor.map_batches(batch_sum, [1], batch_size=1, backend='gpu'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+# test_copy_engine.py
+
+import filecmp
+import os
+import unittest
+
+from pathlib import Path
+from src.copy_engine import CopyEngine
+from src.file_tools import FileTools
+
+
+class CopyEngineTestCase(unittest.TestCase):
+    """Test names are generally self-explanatory and so docstrings not provided on an individual basis other
+    than by exception.
+
+    Keyword arguments:
+    TestCase -- standard class required for tests based on unittest.case
+    """
+
+    def setUp(self):
+        """Fixtures used by tests."""
+        self.Root = Path(__file__).parent
+        self.SourceImagesDir = os.path.join(self.Root, 'source_files')
+        self.TestFilePath = os.path.join(self.Root, 'TestFile.txt')
+        self.NewFolderRoot = os.path.join(self.Root, 'test_for_copies')
+        FileTools.ensure_empty_directory(self.NewFolderRoot)
+
+    def tearDown(self) -> None:
+        FileTools.ensure_empty_directory(self.NewFolderRoot)
+
+    def test_copy_file__link_modes(self):
+        for link_mode in CopyEngine.LINK_MODES:
+            target_file = os.path.join(self.NewFolderRoot, f'{link_mode}.txt')
+
+            with self.subTest(self, testing_for=link_mode):
+                mode_used = CopyEngine.copy_file(self.TestFilePath, target_file, link_mode)
+                self.assertIn(mode_used, (link_mode, 'copy'))
+                self.assertTrue(filecmp.cmp(self.TestFilePath, target_file, shallow=False))
+
+            with self.subTest(self, testing_for=f'{link_mode} replaces existing target'):
+                mode_used = CopyEngine.copy_file(self.TestFilePath, target_file, link_mode)
+                self.assertIn(mode_used, (link_mode, 'copy'))
+
+    def test_copy_file__hardlink_shares_file(self):
+        src_file = os.path.join(self.NewFolderRoot, 'source.txt')
+        target_file = os.path.join(self.NewFolderRoot, 'target.txt')
+        CopyEngine.copy_file(self.TestFilePath, src_file)
+
+        CopyEngine.copy_file(src_file, target_file, 'hardlink')
+
+        self.assertTrue(os.path.samefile(src_file, target_file))
+
+    def test_copy_file__unknown_link_mode__raises_value_error(self):
+        with self.assertRaises(ValueError):
+            CopyEngine.copy_file(self.TestFilePath, os.path.join(self.NewFolderRoot, 'fred.txt'), 'fred')
+
+    def test_copy_files__with_workers__copies_all_files(self):
+        file_names = sorted(os.listdir(self.SourceImagesDir))
+        file_pairs = [(os.path.join(self.SourceImagesDir, f), os.path.join(self.NewFolderRoot, f))
+                      for f in file_names]
+
+        counts = CopyEngine.copy_files(file_pairs, workers=4, progress='log')
+
+        with self.subTest(self, testing_for='counts'):
+            self.assertEqual(counts, {'copy': len(file_names)})
+
+        with self.subTest(self, testing_for='files copied'):
+            self.assertEqual(sorted(os.listdir(self.NewFolderRoot)), file_names)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+# test_download_cache.py
+
+import hashlib
+import os
+import unittest
+
+from pathlib import Path
+from src.download_cache import DownloadCache
+from src.file_tools import FileTools
+from tests.http_test_server import LocalFileServer
+
+
+class DownloadCacheTestCase(unittest.TestCase):
+    """Test names are generally self-explanatory and so docstrings not provided on an individual basis other
+    than by exception.
+
+    Keyword arguments:
+    TestCase -- standard class required for tests based on unittest.case
+    """
+
+    def setUp(self):
+        """Fixtures used by tests."""
+        self.Root = Path(__file__).parent
+        self.DownloadsFolder = os.path.join(self.Root, 'test_for_downloads')
+        self.CacheDir = os.path.join(self.DownloadsFolder, 'cache')
+        self.TargetPath = os.path.join(self.DownloadsFolder, 'downloads', 'data.bin')
+        self.Content = os.urandom(50000)
+        self.Sha256 = hashlib.sha256(self.Content).hexdigest()
+        FileTools.ensure_empty_directory(self.DownloadsFolder)
+
+    def tearDown(self) -> None:
+        FileTools.ensure_empty_directory(self.DownloadsFolder)
+
+    def test_fetch__when_unchanged__uses_conditional_get(self):
+        cache = DownloadCache(self.CacheDir)
+
+        with LocalFileServer({'/data.bin': self.Content}) as server:
+            first = cache.fetch(server.url('/data.bin'), self.TargetPath)
+            os.remove(self.TargetPath)
+            second = cache.fetch(server.url('/data.bin'), self.TargetPath)
+
+        with self.subTest(self, testing_for='downloaded once'):
+            self.assertEqual((first, second), (True, False))
+            self.assertEqual(Path(self.TargetPath).read_bytes(), self.Content)
+
+        with self.subTest(self, testing_for='conditional request'):
+            self.assertIsNone(server.requests[0][2].get('If-None-Match'))
+            self.assertIsNotNone(server.requests[1][2].get('If-None-Match'))
+
+        with self.subTest(self, testing_for='content addressed'):
+            self.assertTrue(Path(cache.object_path(self.Sha256)).is_file())
+            self.assertEqual(cache.read_index()[server.url('/data.bin')]['sha256'], self.Sha256)
+
+    def test_fetch__when_changed__downloads_again(self):
+        cache = DownloadCache(self.CacheDir)
+        new_content = os.urandom(1000)
+
+        with LocalFileServer({'/data.bin': self.Content}) as server:
+            cache.fetch(server.url('/data.bin'), self.TargetPath)
+            server.files['/data.bin'] = new_content
+            downloaded = cache.fetch(server.url('/data.bin'), self.TargetPath)
+
+        self.assertTrue(downloaded)
+        self.assertEqual(Path(self.TargetPath).read_bytes(), new_content)
+
+    def test_fetch__with_stored_sha256__makes_no_request(self):
+        cache = DownloadCache(self.CacheDir)
+
+        with LocalFileServer({'/data.bin': self.Content, '/mirror.bin': self.Content}) as server:
+            cache.fetch(server.url('/data.bin'), self.TargetPath, sha256=self.Sha256)
+            downloaded = cache.fetch(server.url('/mirror.bin'), self.TargetPath, sha256=self.Sha256.upper())
+
+        self.assertFalse(downloaded)
+        self.assertEqual(len(server.requests), 1)
+
+    def test_fetch__when_sha256_mismatch__raises(self):
+        cache = DownloadCache(self.CacheDir)
+
+        with LocalFileServer({'/data.bin': self.Content}) as server:
+            with self.assertRaises(ValueError):
+                cache.fetch(server.url('/data.bin'), self.TargetPath, sha256='0' * 64)
+
+        self.assertFalse(Path(self.TargetPath).exists())
+
+
+if __name__ == '__main__':
+    unittest.main()
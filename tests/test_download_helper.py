@@ -1,11 +1,18 @@
 # test_download_helper.py
 
+import http.client
+import io
 import os
 import shutil
+import tarfile
 import unittest
+import urllib.error
 
 from pathlib import Path
+from unittest import mock
 from src.download_helper import DownloadHelper
+from src.file_tools import FileTools
+from tests.http_test_server import LocalFileServer
 
 
 class DownloadHelperTestCase(unittest.TestCase):
@@ -25,6 +32,19 @@ class DownloadHelperTestCase(unittest.TestCase):
         self.TestDestinationFile = os.path.join(self.TestDestinationDir, "TestFile.txt")
         self.EmptyFolder = os.path.join(self.Root, "empty_folder")
         self.NonEmptyFolder = os.path.join(self.Root, "test_for_archive")
+        self.DownloadsFolder = os.path.join(self.Root, "test_for_downloads")
+        self.DownloadContent = os.urandom(100000)
+        FileTools.ensure_empty_directory(self.DownloadsFolder)
+        self.patch_download_helper('RETRY_DELAY', 0)
+
+    def tearDown(self) -> None:
+        FileTools.ensure_empty_directory(self.DownloadsFolder)
+
+    def patch_download_helper(self, name: str, value):
+        """Set a DownloadHelper class attribute for the current test only."""
+        patcher = mock.patch.object(DownloadHelper, name, value)
+        patcher.start()
+        self.addCleanup(patcher.stop)
 
     def test_can_download__when_target_is_not_file__returns_true(self):
         test_file = self.FakePath
@@ -112,6 +132,16 @@ class DownloadHelperTestCase(unittest.TestCase):
             filepath = Path(DownloadHelper.get_extraction_dir_path(test_path, filename))
             self.assertTrue(filepath.name == Path(Path(filename).stem).stem)
 
+        for filename, dir_name in (('dummy.tgz', 'dummy'), ('dummy.tar.bz2', 'dummy'), ('dummy.tar.xz', 'dummy'),
+                                   ('dummy.tar.zst', 'dummy'), ('dummy.csv.gz', 'dummy'), ('Dummy.TAR', 'dummy')):
+            with self.subTest(self, testing_for=filename):
+                filepath = Path(DownloadHelper.get_extraction_dir_path(test_path, filename))
+                self.assertEqual(filepath.name, dir_name)
+
+        with self.subTest(self, testing_for='not an archive'):
+            with self.assertRaises(ValueError):
+                DownloadHelper.get_extraction_dir_path(test_path, 'dummy.csv')
+
     def test_to_download(self):
         with self.subTest(self, testing_for='non-archive file'):
             target_path = self.EmptyFolder
@@ -164,5 +194,232 @@ class DownloadHelperTestCase(unittest.TestCase):
             self.assertFalse(actual)
 
 
+    def test_download_url__when_disconnected__resumes_with_range_requests(self):
+        target_path = os.path.join(self.DownloadsFolder, 'data.bin')
+
+        with LocalFileServer({'/data.bin': self.DownloadContent}, disconnects=3, disconnect_after=30000) as server:
+            DownloadHelper.download_url(server.url('/data.bin'), target_path, chunk_size=8192)
+
+        with self.subTest(self, testing_for='content'):
+            with open(target_path, 'rb') as infile:
+                self.assertEqual(infile.read(), self.DownloadContent)
+
+        with self.subTest(self, testing_for='resumed with ranges'):
+            ranges = [headers.get('Range') for _, _, headers in server.requests]
+            self.assertEqual(ranges, [None, 'bytes=30000-', 'bytes=60000-', 'bytes=90000-'])
+
+        with self.subTest(self, testing_for='resumed only if unchanged'):
+            if_ranges = [headers.get('If-Range') for _, _, headers in server.requests]
+            self.assertEqual(if_ranges[0], None)
+            self.assertTrue(all(if_range and if_range.startswith('"') for if_range in if_ranges[1:]))
+
+        with self.subTest(self, testing_for='part file renamed'):
+            self.assertFalse(Path(target_path + '.part').exists())
+            self.assertFalse(Path(target_path + '.part.validator.json').exists())
+
+    def test_download_url__when_remote_changed_since_part_file__restarts(self):
+        target_path = os.path.join(self.DownloadsFolder, 'data.bin')
+        stale_content = os.urandom(len(self.DownloadContent))
+
+        with LocalFileServer({'/data.bin': stale_content}, disconnects=1, disconnect_after=30000) as server:
+            with self.assertRaises((ConnectionError, http.client.HTTPException, urllib.error.URLError)):
+                DownloadHelper.download_url(server.url('/data.bin'), target_path, retries=0)
+        self.assertEqual(os.path.getsize(target_path + '.part'), 30000)
+
+        with LocalFileServer({'/data.bin': self.DownloadContent}) as server:
+            DownloadHelper.download_url(server.url('/data.bin'), target_path)
+
+        self.assertEqual(Path(target_path).read_bytes(), self.DownloadContent)
+
+    def test_download_url__when_part_file_complete__renames_without_downloading(self):
+        target_path = os.path.join(self.DownloadsFolder, 'data.bin')
+        Path(target_path + '.part').write_bytes(self.DownloadContent)
+
+        with LocalFileServer({'/data.bin': self.DownloadContent}) as server:
+            DownloadHelper.download_url(server.url('/data.bin'), target_path)
+
+        with self.subTest(self, testing_for='content'):
+            self.assertEqual(Path(target_path).read_bytes(), self.DownloadContent)
+
+        with self.subTest(self, testing_for='single range request'):
+            self.assertEqual([headers.get('Range') for _, _, headers in server.requests],
+                             [f'bytes={len(self.DownloadContent)}-'])
+
+    def test_download_url__with_progress_callback__reports_final_stats(self):
+        target_path = os.path.join(self.DownloadsFolder, 'data.bin')
+        reports = []
+
+        with LocalFileServer({'/data.bin': self.DownloadContent}) as server:
+            DownloadHelper.download_url(server.url('/data.bin'), target_path, progress_callback=reports.append)
+
+        self.assertTrue(reports[-1]['done'])
+        self.assertEqual(reports[-1]['bytes'], len(self.DownloadContent))
+        self.assertEqual(reports[-1]['total'], len(self.DownloadContent))
+
+    def test_download_url__when_ranges_not_supported__restarts(self):
+        target_path = os.path.join(self.DownloadsFolder, 'data.bin')
+
+        with LocalFileServer({'/data.bin': self.DownloadContent}, accept_ranges=False, disconnects=1,
+                            disconnect_after=30000) as server:
+            DownloadHelper.download_url(server.url('/data.bin'), target_path)
+
+        with open(target_path, 'rb') as infile:
+            self.assertEqual(infile.read(), self.DownloadContent)
+
+    def test_download_url__when_no_progress_within_retries__raises(self):
+        target_path = os.path.join(self.DownloadsFolder, 'data.bin')
+
+        with LocalFileServer({'/data.bin': self.DownloadContent}, disconnects=3, disconnect_after=0) as server:
+            with self.assertRaises(ConnectionError):
+                DownloadHelper.download_url(server.url('/data.bin'), target_path, retries=1)
+
+        with self.subTest(self, testing_for='attempts'):
+            self.assertEqual(len(server.requests), 2)
+
+        with self.subTest(self, testing_for='no target file'):
+            self.assertFalse(Path(target_path).exists())
+
+    def test_download_url__with_segments__fetches_ranges_concurrently(self):
+        target_path = os.path.join(self.DownloadsFolder, 'data.bin')
+        self.patch_download_helper('MIN_SEGMENT_SIZE', 1000)
+
+        with LocalFileServer({'/data.bin': self.DownloadContent}, disconnects=1, disconnect_after=5000) as server:
+            DownloadHelper.download_url(server.url('/data.bin'), target_path, segments=4)
+
+        with self.subTest(self, testing_for='content'):
+            with open(target_path, 'rb') as infile:
+                self.assertEqual(infile.read(), self.DownloadContent)
+
+        with self.subTest(self, testing_for='range requests'):
+            ranges = [headers.get('Range') for command, _, headers in server.requests if command == 'GET']
+            self.assertEqual(len(ranges), 5)
+            self.assertIn('bytes=0-24999', ranges)
+            self.assertIn('bytes=75000-99999', ranges)
+
+    def test_download_url__with_segments__when_ranges_not_supported__uses_one_connection(self):
+        target_path = os.path.join(self.DownloadsFolder, 'data.bin')
+        self.patch_download_helper('MIN_SEGMENT_SIZE', 1000)
+
+        with LocalFileServer({'/data.bin': self.DownloadContent}, accept_ranges=False) as server:
+            DownloadHelper.download_url(server.url('/data.bin'), target_path, segments=4)
+
+        with self.subTest(self, testing_for='content'):
+            with open(target_path, 'rb') as infile:
+                self.assertEqual(infile.read(), self.DownloadContent)
+
+        with self.subTest(self, testing_for='requests'):
+            self.assertEqual([command for command, _, _ in server.requests], ['HEAD', 'GET'])
+
+    def test_download_url__with_segments__when_interrupted__resumes_each_range(self):
+        target_path = os.path.join(self.DownloadsFolder, 'data.bin')
+        self.patch_download_helper('MIN_SEGMENT_SIZE', 1000)
+
+        with LocalFileServer({'/data.bin': self.DownloadContent}, disconnects=4, disconnect_after=5000) as server:
+            with self.assertRaises((ConnectionError, http.client.HTTPException)):
+                DownloadHelper.download_url(server.url('/data.bin'), target_path, segments=4, retries=0)
+            first_run_requests = len(server.requests)
+            DownloadHelper.download_url(server.url('/data.bin'), target_path, segments=4)
+
+        with self.subTest(self, testing_for='content'):
+            self.assertEqual(Path(target_path).read_bytes(), self.DownloadContent)
+
+        with self.subTest(self, testing_for='ranges resumed'):
+            ranges = [headers.get('Range') for command, _, headers in server.requests[first_run_requests:]
+                      if command == 'GET']
+            self.assertEqual(sorted(ranges), ['bytes=30000-49999', 'bytes=5000-24999', 'bytes=55000-74999',
+                                              'bytes=80000-99999'])
+
+        with self.subTest(self, testing_for='segment state removed'):
+            self.assertFalse(Path(target_path + '.part.segments.json').exists())
+
+    def test_download_url__with_segments__when_head_rejected__uses_one_connection(self):
+        target_path = os.path.join(self.DownloadsFolder, 'data.bin')
+        self.patch_download_helper('MIN_SEGMENT_SIZE', 1000)
+
+        with LocalFileServer({'/data.bin': self.DownloadContent}, reject_head=True) as server:
+            DownloadHelper.download_url(server.url('/data.bin'), target_path, segments=4)
+
+        with self.subTest(self, testing_for='content'):
+            self.assertEqual(Path(target_path).read_bytes(), self.DownloadContent)
+
+        with self.subTest(self, testing_for='requests'):
+            self.assertEqual([command for command, _, _ in server.requests], ['HEAD', 'GET'])
+
+    def test_download_url__when_not_found__raises_http_error(self):
+        target_path = os.path.join(self.DownloadsFolder, 'data.bin')
+
+        with LocalFileServer({}) as server:
+            with self.assertRaises(urllib.error.HTTPError):
+                DownloadHelper.download_url(server.url('/data.bin'), target_path)
+
+    def test_download_file__with_cache_dir__fetches_changed_file_despite_existing_download(self):
+        cache_dir = os.path.join(self.DownloadsFolder, 'cache')
+        kwargs = dict(data_dir=self.DownloadsFolder, is_isic=True, replace_unzip_content=False, cache_dir=cache_dir)
+
+        with LocalFileServer({'/groups.csv': b'v1'}) as server:
+            kwargs['src_url'] = server.url('/groups.csv')
+            _, _, _, download_file_path = DownloadHelper.download_file(replace_download=False, **kwargs)
+            server.files['/groups.csv'] = b'v2,changed'
+            DownloadHelper.download_file(replace_download=False, **kwargs)
+
+            with self.subTest(self, testing_for='changed remote file downloaded'):
+                self.assertEqual(Path(download_file_path).read_bytes(), b'v2,changed')
+
+            with mock.patch('builtins.input', side_effect=AssertionError('prompted')):
+                DownloadHelper.download_file(replace_download=None, **kwargs)
+
+            with self.subTest(self, testing_for='conditional requests, no prompt'):
+                self.assertEqual([headers.get('If-None-Match') is not None for _, _, headers in server.requests],
+                                 [False, True, True])
+                self.assertEqual(Path(download_file_path).read_bytes(), b'v2,changed')
+
+    def test_download_and_extract_url__when_response_cut_short__leaves_final_dir_untouched(self):
+        archive = io.BytesIO()
+        with tarfile.open(fileobj=archive, mode='w') as tar_ref:
+            for name in ('a.bin', 'b.bin'):
+                info = tarfile.TarInfo(f'data/{name}')
+                info.size = 1024
+                tar_ref.addfile(info, io.BytesIO(os.urandom(1024)))
+        final_extraction_dir = os.path.join(self.DownloadsFolder, 'data')
+        Path(final_extraction_dir).mkdir()
+        Path(final_extraction_dir, 'previous.txt').write_bytes(b'previous')
+
+        # Cut at the boundary between the two members, which a stream-mode tarfile reads as a clean end
+        with LocalFileServer({'/data.tar': archive.getvalue()}, disconnects=1, disconnect_after=512 + 1024) as server:
+            with self.assertRaises(ConnectionError):
+                DownloadHelper.download_and_extract_url(server.url('/data.tar'), final_extraction_dir)
+
+        with self.subTest(self, testing_for='final dir untouched'):
+            self.assertEqual(os.listdir(final_extraction_dir), ['previous.txt'])
+
+        with self.subTest(self, testing_for='staging dir removed'):
+            self.assertFalse(Path(final_extraction_dir + '.staging').exists())
+
+    def test_download_file__when_pipelined__extracts_tar_while_downloading(self):
+        members = {'a.txt': b'alpha', 'sub/b.bin': self.DownloadContent}
+        archive = io.BytesIO()
+        with tarfile.open(fileobj=archive, mode='w:gz') as tar_ref:
+            for name, data in members.items():
+                info = tarfile.TarInfo(f'data/{name}')
+                info.size = len(data)
+                tar_ref.addfile(info, io.BytesIO(data))
+
+        with LocalFileServer({'/data.tar.gz': archive.getvalue()}) as server:
+            can_extract, _, final_extraction_dir, download_file_path = DownloadHelper.download_file(
+                data_dir=self.DownloadsFolder, replace_download=True, src_url=server.url('/data.tar.gz'),
+                is_isic=False, replace_unzip_content=True, pipelined=True)
+
+        with self.subTest(self, testing_for='extracted'):
+            self.assertFalse(can_extract)
+            for name, data in members.items():
+                self.assertEqual(Path(final_extraction_dir, name).read_bytes(), data)
+
+        with self.subTest(self, testing_for='kept copy'):
+            self.assertEqual(Path(download_file_path).read_bytes(), archive.getvalue())
+
+        with self.subTest(self, testing_for='single request'):
+            self.assertEqual(len(server.requests), 1)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,51 @@
+# test_download_progress_bar.py
+
+import time
+import unittest
+
+from src.download_progress_bar import DownloadProgress
+
+
+class DownloadProgressTestCase(unittest.TestCase):
+    """Test names are generally self-explanatory and so docstrings not provided on an individual basis other
+    than by exception.
+
+    Keyword arguments:
+    TestCase -- standard class required for tests based on unittest.case
+    """
+
+    def test_download_progress__reports_at_interval_and_on_close(self):
+        reports = []
+
+        with DownloadProgress('data.bin', total=1000, interval=0.02, callback=reports.append, bar=False) as progress:
+            for _ in range(10):
+                progress.update(100)
+                time.sleep(0.01)
+
+        with self.subTest(self, testing_for='interval reports'):
+            self.assertGreater(len(reports), 1)
+            self.assertFalse(any(report['done'] for report in reports[:-1]))
+
+        with self.subTest(self, testing_for='final report'):
+            final = reports[-1]
+            self.assertTrue(final['done'])
+            self.assertEqual((final['bytes'], final['total'], final['eta_seconds']), (1000, 1000, 0.0))
+            self.assertGreater(final['bytes_per_second'], 0)
+
+        with self.subTest(self, testing_for='eta while running'):
+            self.assertTrue(any(report['eta_seconds'] is not None for report in reports[:-1]))
+
+    def test_download_progress__when_no_bytes_arrive__reports_stall(self):
+        reports = []
+
+        with DownloadProgress('data.bin', interval=0.01, stall_timeout=0.05, callback=reports.append,
+                              bar=False) as progress:
+            progress.update(10)
+            time.sleep(0.15)
+
+        self.assertTrue(any(report['stalled'] for report in reports))
+        self.assertFalse(reports[-1]['stalled'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,6 +4,7 @@ import datetime
 import filecmp
 import numpy as np
 import os
+import pandas as pd
 import shutil
 import unittest
 
@@ -65,6 +66,32 @@ class FileToolsTestCase(unittest.TestCase):
         expected = self.TestList[2:3]
         self.assertEqual(actual, expected)
 
+    def test_chunks_generator__iterables_views_and_windows(self):
+        with self.subTest(self, testing_for='generator batched lazily as lists'):
+            chunks = FileTools.chunks_generator((x for x in range(5)), 2)
+            self.assertListEqual(list(chunks), [[0, 1], [2, 3], [4]])
+
+        with self.subTest(self, testing_for='ndarray chunks are views'):
+            array = np.arange(10)
+            chunks = list(FileTools.chunks_generator(array, 4))
+            self.assertEqual([len(chunk) for chunk in chunks], [4, 4, 2])
+            self.assertTrue(all(np.shares_memory(chunk, array) for chunk in chunks))
+
+        with self.subTest(self, testing_for='memoryview chunks are views'):
+            data = bytearray(b'abcdef')
+            chunks = list(FileTools.chunks_generator(memoryview(data), 4))
+            data[0:1] = b'z'
+            self.assertListEqual([bytes(chunk) for chunk in chunks], [b'zbcd', b'ef'])
+
+        with self.subTest(self, testing_for='overlapping windows match for sequences and iterators'):
+            expected = [[0, 1, 2, 3], [2, 3, 4, 5], [4, 5, 6, 7], [6, 7, 8]]
+            self.assertListEqual(list(FileTools.chunks_generator(list(range(9)), 4, step=2)), expected)
+            self.assertListEqual(list(FileTools.chunks_generator(iter(range(9)), 4, step=2)), expected)
+
+        with self.subTest(self, testing_for='invalid chunk size'):
+            with self.assertRaises(ValueError):
+                next(FileTools.chunks_generator(self.TestList, 0))
+
     def test_copy_files_to_class_dirs__files_copied(self):
         info_file_path = self.ClassedFileListFile
         separator = ','
@@ -84,6 +111,14 @@ class FileToolsTestCase(unittest.TestCase):
             file_path = Path(os.path.join(self.NewFolderRoot, 'Class 2', 'image1.jpg'))
             self.assertTrue(Path.exists(file_path))
 
+    def test_copy_files_to_class_dirs__with_hardlinks__files_linked(self):
+        FileTools.copy_files_to_class_dirs(info_file_path=self.ClassedFileListFile, separator=',',
+                                           src_root=self.SourceImagesDir, target_root=self.NewFolderRoot,
+                                           extension='jpg', workers=4, link_mode='hardlink')
+
+        file_path = os.path.join(self.NewFolderRoot, 'Class 2', 'image1.jpg')
+        self.assertTrue(os.path.samefile(file_path, os.path.join(self.SourceImagesDir, 'image1.jpg')))
+
     def test_copy_file_splits_to_class_dirs__files_copied_in_splits(self):
         info_file_path = self.ClassedFileListFile
         separator = ','
@@ -118,6 +153,78 @@ class FileToolsTestCase(unittest.TestCase):
             actual = len(os.listdir(os.path.join(os.path.join(self.NewFolderRoot, split_folder), split_class)))
             self.assertEqual(actual, expected)
 
+    def test_plan_file_splits_to_class_dirs__returns_seeded_plan(self):
+        split_roots = [os.path.join(self.NewFolderRoot, f'split{i}') for i in range(1, 4)]
+
+        plan = FileTools.plan_file_splits_to_class_dirs(self.ClassedFileListFile, self.SourceImagesDir, split_roots,
+                                                        [1, 3, 2], extension='jpg', seed=42)
+
+        with self.subTest(self, testing_for='split counts per class'):
+            actual = plan.groupby(['Class', 'Split']).size().to_dict()
+            expected = {('Class 1', 0): 1, ('Class 1', 1): 3, ('Class 1', 2): 2,
+                        ('Class 2', 0): 1, ('Class 2', 1): 4, ('Class 2', 2): 4}
+            self.assertEqual(actual, expected)
+
+        with self.subTest(self, testing_for='target path'):
+            row = plan[plan['FileName'] == 'image1.jpg'].iloc[0]
+            expected = os.path.join(split_roots[row['Split']], 'Class 2', 'image1.jpg')
+            self.assertEqual(row['Target'], expected)
+
+        with self.subTest(self, testing_for='same seed, same plan'):
+            actual = FileTools.plan_file_splits_to_class_dirs(self.ClassedFileListFile, self.SourceImagesDir,
+                                                              split_roots, [1, 3, 2], extension='jpg', seed=42)
+            self.assertTrue(plan.equals(actual))
+
+    def test_plan_file_splits_to_class_dirs__with_groups__keeps_groups_together(self):
+        split_roots = [os.path.join(self.NewFolderRoot, f'split{i}') for i in range(1, 4)]
+        groups_file_path = os.path.join(self.NewFolderRoot, 'groups.csv')
+        with open(groups_file_path, 'w') as outfile:
+            outfile.write('image,lesion_id\nimage1,L1\nimage1a,L1\nimage1b,L1\nimage2,L2\nimage2a,L2\n')
+
+        for seed in range(5):
+            plan = FileTools.plan_file_splits_to_class_dirs(self.ClassedFileListFile, self.SourceImagesDir,
+                                                            split_roots, [1, 3, 2], extension='jpg', seed=seed,
+                                                            groups_file_path=groups_file_path)
+            with self.subTest(self, testing_for=f'seed {seed}'):
+                actual = plan[plan['FileName'].str.startswith('image1')]['Split'].nunique()
+                self.assertEqual(actual, 1)
+
+    def test_copy_file_splits_to_class_dirs__with_manifest__reuses_plan(self):
+        split_roots = [os.path.join(self.NewFolderRoot, f'split{i}') for i in range(1, 4)]
+        manifest_path = os.path.join(self.NewFolderRoot, 'manifest.csv')
+        kwargs = dict(info_file_path=self.ClassedFileListFile, separator=',', src_root=self.SourceImagesDir,
+                      split_roots=split_roots, splits=[1, 3, 2], extension='jpg', manifest_path=manifest_path,
+                      skip_existing=True)
+
+        FileTools.copy_file_splits_to_class_dirs(**kwargs)
+        copied = sorted(Path(self.NewFolderRoot).rglob('*.jpg'))
+        expected = sorted(str(p.relative_to(self.NewFolderRoot)) for p in copied)
+
+        # Same-size placeholders show whether the second run copies over existing targets
+        for path in copied:
+            path.write_bytes(b'\0' * path.stat().st_size)
+        FileTools.copy_file_splits_to_class_dirs(**kwargs)
+
+        with self.subTest(self, testing_for='same files planned'):
+            actual = sorted(str(p.relative_to(self.NewFolderRoot)) for p in Path(self.NewFolderRoot).rglob('*.jpg'))
+            self.assertEqual(actual, expected)
+
+        with self.subTest(self, testing_for='nothing copied with skip_existing'):
+            self.assertTrue(all(set(path.read_bytes()) <= {0} for path in copied))
+
+        with self.subTest(self, testing_for='changed options rejected'):
+            with self.assertRaises(ValueError):
+                FileTools.copy_file_splits_to_class_dirs(seed=99, **kwargs)
+
+    def test_copy_file_splits_to_class_dirs__when_dry_run__copies_nothing(self):
+        split_roots = [os.path.join(self.NewFolderRoot, f'split{i}') for i in range(1, 4)]
+
+        FileTools.copy_file_splits_to_class_dirs(info_file_path=self.ClassedFileListFile, separator=',',
+                                                 src_root=self.SourceImagesDir, split_roots=split_roots,
+                                                 splits=[1, 3, 2], extension='jpg', dry_run=True)
+
+        self.assertEqual(len(os.listdir(self.NewFolderRoot)), 0)
+
     def test_create_dirs_from_file_header__returns_folder_list(self):
         actual = FileTools.create_dirs_from_file_header(self.ClassedFileListFile, ',', self.NewFolderRoot)
         expected = self.FolderList
@@ -204,6 +311,22 @@ class FileToolsTestCase(unittest.TestCase):
         # Clean up
         shutil.rmtree(dir_path)
 
+    def test_ensure_empty_directory__when_in_background__removes_content(self):
+        dir_path = os.path.join(self.NewFolderRoot, 'fred')
+        sub_dir_path = os.path.join(dir_path, 'fred')
+        Path(sub_dir_path).mkdir(parents=True, exist_ok=True)
+        shutil.copy(self.TestFilePath, dir_path)
+        shutil.copy(self.TestFilePath, sub_dir_path)
+
+        FileTools.ensure_empty_directory(dir_path, in_background=True)
+
+        with self.subTest(self, testing_for='directory empty at once'):
+            self.assertEqual(len(os.listdir(dir_path)), 0)
+
+        with self.subTest(self, testing_for='old content deleted'):
+            FileTools.wait_for_background_deletions()
+            self.assertEqual(os.listdir(self.NewFolderRoot), ['fred'])
+
     def test_lines_list_from_file__returns_list(self):
         path = self.TestFilePath
 
@@ -211,6 +334,20 @@ class FileToolsTestCase(unittest.TestCase):
         actual = FileTools.lines_list_from_file(path)
         self.assertListEqual(expected, actual)
 
+    def test_lines_generator__yields_stripped_lines(self):
+        path = self.TestFilePath
+        expected = self.TestList
+
+        with self.subTest(self, testing_for='single lines'):
+            self.assertListEqual(list(FileTools.lines_generator(path)), expected)
+
+        with self.subTest(self, testing_for='memory-mapped'):
+            self.assertListEqual(list(FileTools.lines_generator(path, use_mmap=True)), expected)
+
+        with self.subTest(self, testing_for='chunks'):
+            chunks = list(FileTools.lines_generator(path, chunk_size=2, use_mmap=True))
+            self.assertListEqual(chunks, [expected[i: i + 2] for i in range(0, len(expected), 2)])
+
     def test_make_datetime_named_archive__default_datestamp__returns_file_path_in_desired_format(self):
         root = self.Root
         sub = 'test_for_archive'
@@ -321,6 +458,109 @@ class FileToolsTestCase(unittest.TestCase):
             images = np.load(file=final_images_file_path, allow_pickle=True)
             print(images.shape)
 
+    def test_create_numpy_archive_from_images_dir__with_workers__matches_serial_file(self):
+        serial_file_path = os.path.join(self.NewFolderRoot, 'serial')
+        parallel_file_path = os.path.join(self.NewFolderRoot, 'parallel')
+
+        FileTools.create_numpy_archive_from_images_dir(self.ImagesFolder, serial_file_path, (12, 12), '.jpg')
+        FileTools.create_numpy_archive_from_images_dir(self.ImagesFolder, parallel_file_path, (12, 12), '.jpg',
+                                                       workers=2)
+
+        self.assertTrue(filecmp.cmp(serial_file_path + '.npy', parallel_file_path + '.npy', shallow=False))
+
+    def test_create_numpy_archive_from_images_dir__when_streaming__saves_compact_images(self):
+        images_file_path = os.path.join(self.NewFolderRoot, 'images')
+        streamed_file_path = os.path.join(self.NewFolderRoot, 'streamed')
+
+        FileTools.create_numpy_archive_from_images_dir(self.ImagesFolder, images_file_path, (12, 12), '.jpg')
+        FileTools.create_numpy_archive_from_images_dir(self.ImagesFolder, streamed_file_path, (12, 12), '.jpg',
+                                                       streaming=True, batch_size=4)
+
+        expected = np.load(images_file_path + '.npy')
+        actual = np.load(streamed_file_path + '.npy')
+
+        with self.subTest(self, testing_for='dtype'):
+            self.assertEqual(actual.dtype, np.uint8)
+
+        with self.subTest(self, testing_for='content'):
+            self.assertTrue(np.array_equal(actual, expected))
+
+    def test_create_numpy_archive_from_images_dir__when_values_out_of_range__keeps_previous_archive(self):
+        streamed_file_path = os.path.join(self.NewFolderRoot, 'streamed')
+        FileTools.create_numpy_archive_from_images_dir(self.ImagesFolder, streamed_file_path, (12, 12), '.jpg',
+                                                       streaming=True, batch_size=4)
+        expected = Path(streamed_file_path + '.npy').read_bytes()
+
+        with self.subTest(self, testing_for='raises rather than wrapping'):
+            with self.assertRaises(Exception) as context:
+                FileTools.create_numpy_archive_from_images_dir(self.ImagesFolder, streamed_file_path, (12, 12),
+                                                               '.jpg', streaming=True, dtype='int8', batch_size=4)
+            self.assertIn('outside the range of int8', str(context.exception))
+
+        with self.subTest(self, testing_for='previous archive intact'):
+            self.assertEqual(Path(streamed_file_path + '.npy').read_bytes(), expected)
+            self.assertFalse(Path(streamed_file_path + '.tmp.npy').exists())
+
+    def test_create_numpy_archive_from_images_dir__with_pil_engine__close_to_skimage(self):
+        images_file_path = os.path.join(self.NewFolderRoot, 'images')
+        pil_file_path = os.path.join(self.NewFolderRoot, 'pil')
+
+        FileTools.create_numpy_archive_from_images_dir(self.ImagesFolder, images_file_path, (12, 12), '.jpg')
+        FileTools.create_numpy_archive_from_images_dir(self.ImagesFolder, pil_file_path, (12, 12), '.jpg',
+                                                       resize_engine='pil')
+
+        expected = np.load(images_file_path + '.npy')
+        actual = np.load(pil_file_path + '.npy')
+
+        with self.subTest(self, testing_for='shape'):
+            self.assertEqual(actual.shape, expected.shape)
+
+        with self.subTest(self, testing_for='mean pixel difference'):
+            self.assertLess(np.mean(np.abs(actual - expected)), 16)
+
+        with self.subTest(self, testing_for='unknown engine'):
+            with self.assertRaises(ValueError):
+                FileTools.create_numpy_archive_from_images_dir(self.ImagesFolder, pil_file_path, (12, 12), '.jpg',
+                                                               resize_engine='fred')
+
+    def test_create_numpy_archive_from_images_dir__when_incremental__decodes_only_changes(self):
+        src_dir = os.path.join(self.NewFolderRoot, 'incremental_source')
+        images_file_path = os.path.join(self.NewFolderRoot, 'images')
+        incremental_file_path = os.path.join(self.NewFolderRoot, 'incremental')
+        shutil.copytree(self.ImagesFolder, src_dir)
+        os.remove(os.path.join(src_dir, 'image5b.jpg'))
+
+        FileTools.create_numpy_archive_from_images_dir(src_dir, incremental_file_path, (12, 12), incremental=True)
+
+        with self.subTest(self, testing_for='unchanged source'):
+            actual = FileTools.create_numpy_archive_from_images_dir(src_dir, incremental_file_path, (12, 12),
+                                                                    incremental=True)
+            self.assertTrue(actual.endswith('up to date'))
+
+        with self.subTest(self, testing_for='added file'):
+            shutil.copy(os.path.join(self.ImagesFolder, 'image5b.jpg'), src_dir)
+            actual = FileTools.create_numpy_archive_from_images_dir(src_dir, incremental_file_path, (12, 12),
+                                                                    incremental=True)
+            self.assertTrue(actual.endswith('(1 of 18 images decoded)'))
+
+        with self.subTest(self, testing_for='content matches full rebuild'):
+            FileTools.create_numpy_archive_from_images_dir(src_dir, images_file_path, (12, 12))
+            self.assertTrue(filecmp.cmp(images_file_path + '.npy', incremental_file_path + '.npy', shallow=False))
+
+        with self.subTest(self, testing_for='deleted file'):
+            os.remove(os.path.join(src_dir, 'image1.jpg'))
+            FileTools.create_numpy_archive_from_images_dir(src_dir, incremental_file_path, (12, 12),
+                                                           incremental=True)
+            actual = len(np.load(incremental_file_path + '.npy'))
+            self.assertEqual(actual, 17)
+
+        with self.subTest(self, testing_for='archive rewritten by a run that was not incremental'):
+            FileTools.create_numpy_archive_from_images_dir(src_dir, incremental_file_path, (8, 8))
+            actual = FileTools.create_numpy_archive_from_images_dir(src_dir, incremental_file_path, (12, 12),
+                                                                    incremental=True)
+            self.assertTrue(actual.endswith('(17 of 17 images decoded)'))
+            self.assertEqual(np.load(incremental_file_path + '.npy').shape[1:3], (12, 12))
+
     def test_path_of_first_file_of_type__when_found__returns_path(self):
 
         with self.subTest(self, testing_for='file exists'):
@@ -418,6 +658,19 @@ class FileToolsTestCase(unittest.TestCase):
             expected = 12
             self.assertTrue(actual == expected)
 
+    def test_df_from_excel_workbook__parallel_with_columns_and_dtypes(self):
+        serial = FileTools.df_from_excel_workbook(self.TestExcelWorkbookPath, ['SheetToIgnore'])
+        parallel = FileTools.df_from_excel_workbook(self.TestExcelWorkbookPath, ['SheetToIgnore'], workers=2)
+        with self.subTest(self, testing_for='Parallel matches serial'):
+            pd.testing.assert_frame_equal(parallel, serial)
+
+        df = FileTools.df_from_excel_workbook(self.TestExcelWorkbookPath, ['SheetToIgnore'], usecols=['Field'],
+                                              dtype={'Field': 'string'})
+        with self.subTest(self, testing_for='Column subset and dtype'):
+            self.assertListEqual(list(df.columns), ['Source', 'Field'])
+            self.assertEqual(str(df['Field'].dtype), 'string')
+            self.assertListEqual(list(df['Source'].unique()), ['SheetA', 'SheetB', 'SheetC'])
+
     def test_df_list_from_excel_workbook(self):
         df = FileTools.df_list_from_excel_workbook(self.TestExcelWorkbookPath, ['SheetToIgnore'])
         with self.subTest(self, testing_for='Number of DataFrames'):
@@ -440,6 +693,25 @@ class FileToolsTestCase(unittest.TestCase):
 
             self.assertTrue(expected)
 
+    def test_list_lines_with_term__with_several_terms__returns_lines_with_any(self):
+        single = FileTools.list_lines_with_term(self.NotebookFilePath, 'import')
+        several = FileTools.list_lines_with_term(self.NotebookFilePath, ['import', 'print'])
+
+        self.assertGreater(len(several), len(single))
+        self.assertTrue(set(single) <= set(several))
+
+    def test_lines_with_term_in_files__matches_list_lines_with_term(self):
+        notebooks_dir = Path(self.NotebookFilePath).parent
+        expected = [(str(path), line) for path in sorted(notebooks_dir.rglob('*.ipynb'))
+                    for line in FileTools.list_lines_with_term(str(path), 'import', '#')]
+
+        for workers in (1, 2):
+            with self.subTest(self, testing_for=f'{workers} workers'):
+                actual = list(FileTools.lines_with_term_in_files(str(notebooks_dir / '**' / '*.ipynb'), 'import',
+                                                                 '#', workers=workers))
+                self.assertEqual([(file_path, line) for file_path, _, line in actual], expected)
+                self.assertTrue(all(line_no > 0 for _, line_no, _ in actual))
+
 
 if __name__ == '__main__':
     unittest.main()
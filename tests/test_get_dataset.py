@@ -0,0 +1,110 @@
+# test_get_dataset.py
+
+import contextlib
+import io
+import json
+import os
+import tarfile
+import unittest
+import zipfile
+
+from pathlib import Path
+from src.file_tools import FileTools
+from tests.http_test_server import LocalFileServer
+
+import get_dataset
+
+
+class GetDatasetTestCase(unittest.TestCase):
+    """Test names are generally self-explanatory and so docstrings not provided on an individual basis other
+    than by exception.
+
+    Keyword arguments:
+    TestCase -- standard class required for tests based on unittest.case
+    """
+
+    def setUp(self):
+        """Fixtures used by tests."""
+        self.Root = Path(__file__).parent
+        self.DownloadsFolder = os.path.join(self.Root, 'test_for_downloads')
+        self.DataDir = os.path.join(self.DownloadsFolder, 'data')
+        self.OtherDataDir = os.path.join(self.DownloadsFolder, 'other_data')
+        self.ManifestPath = os.path.join(self.DownloadsFolder, 'manifest.json')
+        FileTools.ensure_empty_directory(self.DownloadsFolder)
+
+        # Large enough that, on a throttled server, it arrives after the small tar
+        self.ZipMember = os.urandom(300000)
+        zip_buffer = io.BytesIO()
+        with zipfile.ZipFile(zip_buffer, 'w') as zip_ref:
+            zip_ref.writestr('first/a.bin', self.ZipMember)
+        tar_buffer = io.BytesIO()
+        with tarfile.open(fileobj=tar_buffer, mode='w:gz') as tar_ref:
+            info = tarfile.TarInfo('second/b.txt')
+            info.size = 5
+            tar_ref.addfile(info, io.BytesIO(b'bravo'))
+        self.Files = {'/first.zip': zip_buffer.getvalue(), '/second.tar.gz': tar_buffer.getvalue()}
+
+    def tearDown(self) -> None:
+        FileTools.ensure_empty_directory(self.DownloadsFolder)
+
+    def _args(self, items: list):
+        with open(self.ManifestPath, 'w', encoding='utf-8') as outfile:
+            json.dump(items, outfile)
+
+        return get_dataset.parse_args(['-d', self.DataDir, '-m', self.ManifestPath, '-rd', '-ruc'])
+
+    def test_download_and_extract_manifest__downloads_concurrently_and_extracts_each(self):
+        with LocalFileServer(self.Files, rate=1000000) as server:
+            items = [{'src_url': server.url('/first.zip'), 'working_dir': 'one'},
+                     {'src_url': server.url('/second.tar.gz'), 'working_dir': 'two'},
+                     {'src_url': server.url('/first.zip'), 'data_dir': self.OtherDataDir}]
+            output = io.StringIO()
+            with contextlib.redirect_stdout(output):
+                timings = get_dataset.download_and_extract_manifest(self._args(items))
+
+        with self.subTest(self, testing_for='extracted'):
+            self.assertEqual(Path(self.DataDir, 'one', 'first', 'a.bin').read_bytes(), self.ZipMember)
+            self.assertEqual(Path(self.DataDir, 'two', 'second', 'b.txt').read_bytes(), b'bravo')
+            self.assertEqual(Path(self.OtherDataDir, 'first', 'a.bin').read_bytes(), self.ZipMember)
+
+        with self.subTest(self, testing_for='timings per item, including repeated URLs'):
+            self.assertEqual(len(timings), 3)
+            self.assertTrue(all('download' in timing and 'extract' in timing for timing in timings))
+
+        with self.subTest(self, testing_for='summary table in manifest order'):
+            lines = output.getvalue().splitlines()
+            header = lines.index(next(line for line in lines if line.strip().startswith('download (s)')))
+            files = [line.split()[-1] for line in lines[header + 1: header + 4]]
+            self.assertEqual(files, ['first.zip', 'second.tar.gz', 'first.zip'])
+
+    def test_manifest_items__with_unknown_key__raises_value_error(self):
+        args = self._args([{'src_url': 'http://127.0.0.1/first.zip', 'working_directory': 'one'}])
+
+        with self.assertRaises(ValueError):
+            get_dataset.manifest_items(args)
+
+    def test_manifest_items__without_src_url__raises_value_error(self):
+        args = self._args([{'src_url': 'http://127.0.0.1/first.zip'}, {'working_dir': 'one'}])
+
+        with self.assertRaises(ValueError):
+            get_dataset.manifest_items(args)
+
+    def test_manifest_items__with_same_download_path__raises_value_error(self):
+        for second_url in ('http://127.0.0.1/first.zip', 'http://127.0.0.2/data/first.zip'):
+            with self.subTest(self, testing_for=second_url):
+                args = self._args([{'src_url': 'http://127.0.0.1/first.zip', 'working_dir': 'one'},
+                                   {'src_url': second_url, 'working_dir': 'two'}])
+                with self.assertRaises(ValueError):
+                    get_dataset.manifest_items(args)
+
+    def test_manifest_items__overrides_command_line_arguments(self):
+        args = self._args([{'src_url': 'http://127.0.0.1/first.zip', 'working_dir': 'one', 'is_isic': True}])
+
+        item = get_dataset.manifest_items(args)[0]
+
+        self.assertEqual((item.src_url, item.working_dir, item.is_isic, item.data_dir),
+                         ('http://127.0.0.1/first.zip', 'one', True, self.DataDir))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+# test_notebook_index.py
+
+import json
+import os
+import unittest
+
+from pathlib import Path
+from unittest import mock
+from src import notebook_index
+from src.file_tools import FileTools
+from src.notebook_index import NotebookImportIndex
+
+
+class NotebookImportIndexTestCase(unittest.TestCase):
+    """Test names are generally self-explanatory and so docstrings not provided on an individual basis other
+    than by exception.
+
+    Keyword arguments:
+    TestCase -- standard class required for tests based on unittest.case
+    """
+
+    def setUp(self):
+        """Fixtures used by tests."""
+        self.Root = Path(__file__).parent
+        self.NotebookFilePath = os.path.join(self.Root, 'notebooks', 'TestNotebook.ipynb')
+        self.IndexDir = os.path.join(self.Root, 'test_for_notebook_index')
+        self.IndexPath = os.path.join(self.IndexDir, 'index.json')
+        FileTools.ensure_empty_directory(self.IndexDir)
+
+    def tearDown(self) -> None:
+        FileTools.ensure_empty_directory(self.IndexDir)
+
+    def write_notebook(self, file_name: str, code_sources: list) -> str:
+        cells = [{'cell_type': 'markdown', 'metadata': {}, 'source': ['import from markdown\n']}]
+        for source in code_sources:
+            cells.append({'cell_type': 'code', 'execution_count': 1, 'metadata': {}, 'source': source,
+                          'outputs': [{'output_type': 'display_data', 'metadata': {},
+                                       'data': {'image/png': 'aW1wb3J0' * 10000, 'text/plain': ['import in output']}}]})
+        notebook_path = os.path.join(self.IndexDir, file_name)
+        with open(notebook_path, 'w', encoding='utf-8') as outfile:
+            json.dump({'cells': cells, 'metadata': {}, 'nbformat': 4, 'nbformat_minor': 5}, outfile)
+        return notebook_path
+
+    @unittest.skipUnless(notebook_index.ijson, 'ijson not installed')
+    def test_update__when_streaming__indexes_code_cell_imports_only(self):
+        notebook_path = self.write_notebook('a.ipynb', [['%matplotlib inline\n', 'import numpy as np\n'],
+                                                        'from os import path\nprint(path)'])
+
+        actual = NotebookImportIndex(self.IndexPath).update(self.IndexDir, save=False)
+
+        self.assertEqual(actual, {notebook_path: ['import numpy as np', 'from os import path']})
+
+    def test_update__indexes_code_cell_imports_only(self):
+        notebook_path = self.write_notebook('a.ipynb', [['%matplotlib inline\n', 'import numpy as np\n'],
+                                                        'from os import path\nprint(path)'])
+
+        with self.subTest(self, testing_for='json fallback'):
+            with mock.patch.object(notebook_index, 'ijson', None):
+                actual = NotebookImportIndex(self.IndexPath).update(self.IndexDir, save=False)
+            self.assertEqual(actual, {notebook_path: ['import numpy as np', 'from os import path']})
+
+        with self.subTest(self, testing_for='existing notebook'):
+            index = NotebookImportIndex(self.IndexPath)
+            index.update(self.NotebookFilePath, save=False)
+            self.assertEqual(index.all_imports(), ['from tkinter import Label', 'import ipywidgets',
+                                                   'import tkinter'])
+
+    def test_update__when_unchanged__skips_notebook(self):
+        notebook_path = self.write_notebook('a.ipynb', ['import sys'])
+        NotebookImportIndex(self.IndexPath).update(self.IndexDir)
+
+        with self.subTest(self, testing_for='unchanged'):
+            index = NotebookImportIndex(self.IndexPath)
+            index.entries[notebook_path]['imports'] = ['import marker']
+            self.assertEqual(index.update(self.IndexDir), {notebook_path: ['import marker']})
+
+        with self.subTest(self, testing_for='changed'):
+            self.write_notebook('a.ipynb', ['import sys', 'import json'])
+            stat = os.stat(notebook_path)
+            os.utime(notebook_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000000))
+            actual = NotebookImportIndex(self.IndexPath).update(self.IndexDir)
+            self.assertEqual(actual, {notebook_path: ['import sys', 'import json']})
+
+        with self.subTest(self, testing_for='removed'):
+            os.remove(notebook_path)
+            index = NotebookImportIndex(self.IndexPath)
+            index.update(self.IndexDir)
+            self.assertEqual(index.entries, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+# test_progress_reporter.py
+
+import unittest
+
+from src.progress_reporter import LoggingProgressReporter, ProgressReporter, TqdmProgressReporter
+
+
+class ProgressReporterTestCase(unittest.TestCase):
+    """Test names are generally self-explanatory and so docstrings not provided on an individual basis other
+    than by exception.
+
+    Keyword arguments:
+    TestCase -- standard class required for tests based on unittest.case
+    """
+
+    def test_create__returns_expected_reporter(self):
+        with self.subTest(self, testing_for='default'):
+            self.assertEqual(type(ProgressReporter.create()), ProgressReporter)
+        with self.subTest(self, testing_for='log'):
+            self.assertIsInstance(ProgressReporter.create('log'), LoggingProgressReporter)
+        with self.subTest(self, testing_for='tqdm'):
+            self.assertIsInstance(ProgressReporter.create('tqdm'), TqdmProgressReporter)
+        with self.subTest(self, testing_for='existing reporter'):
+            reporter = ProgressReporter()
+            self.assertIs(ProgressReporter.create(reporter), reporter)
+        with self.subTest(self, testing_for='unknown'):
+            with self.assertRaises(ValueError):
+                ProgressReporter.create('fred')
+
+    def test_summary__counts_files_and_bytes_per_group(self):
+        reporter = ProgressReporter()
+        reporter.start(total=3)
+        reporter.update('split1', num_bytes=100)
+        reporter.update('split1', num_bytes=50)
+        reporter.update('split2', num_bytes=10)
+        summary = reporter.finish()
+
+        with self.subTest(self, testing_for='totals'):
+            self.assertEqual((summary['files'], summary['bytes']), (3, 160))
+        with self.subTest(self, testing_for='groups'):
+            actual = {group: (counter['files'], counter['bytes']) for group, counter in summary['groups'].items()}
+            self.assertEqual(actual, {'split1': (2, 150), 'split2': (1, 10)})
+
+    def test_logging_reporter__rate_limits_progress_lines(self):
+        lines = []
+        reporter = LoggingProgressReporter(interval=3600, write=lines.append)
+        reporter.start(total=1000)
+        for i in range(1000):
+            reporter.update('split1', num_bytes=1)
+        reporter.finish()
+
+        # Just the group line and the throughput summary
+        self.assertEqual(len(lines), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+# test_sharded_archive.py
+
+import numpy as np
+import os
+import unittest
+
+from pathlib import Path
+from PIL import Image
+from src.file_tools import FileTools
+from src.sharded_archive import ShardedArchive
+
+
+class ShardedArchiveTestCase(unittest.TestCase):
+    """Test names are generally self-explanatory and so docstrings not provided on an individual basis other
+    than by exception.
+
+    Keyword arguments:
+    TestCase -- standard class required for tests based on unittest.case
+    """
+
+    def setUp(self):
+        """Fixtures used by tests."""
+        self.Root = Path(__file__).parent
+        self.ImagesFolder = os.path.join(self.Root, 'source_files')
+        self.NewFolderRoot = os.path.join(self.Root, 'test_for_shards')
+        self.ArchiveDir = os.path.join(self.NewFolderRoot, 'shards')
+        FileTools.ensure_empty_directory(self.NewFolderRoot)
+
+    def tearDown(self) -> None:
+        FileTools.ensure_empty_directory(self.NewFolderRoot)
+
+    def test_create_sharded_numpy_archive_from_images_dir__matches_single_archive(self):
+        images_file_path = os.path.join(self.NewFolderRoot, 'images')
+        FileTools.create_numpy_archive_from_images_dir(self.ImagesFolder, images_file_path, (12, 12), '.jpg')
+        FileTools.create_sharded_numpy_archive_from_images_dir(self.ImagesFolder, self.ArchiveDir, shard_size=5,
+                                                               new_shape=(12, 12))
+        expected = np.load(images_file_path + '.npy')
+
+        archive = ShardedArchive(self.ArchiveDir)
+
+        with self.subTest(self, testing_for='number of shards'):
+            self.assertEqual(len(archive.index['shards']), 4)
+
+        with self.subTest(self, testing_for='number of images'):
+            self.assertEqual(len(archive), len(expected))
+
+        with self.subTest(self, testing_for='access by position'):
+            self.assertTrue(all(np.array_equal(archive[i], expected[i]) for i in range(len(archive))))
+
+        with self.subTest(self, testing_for='access by file name'):
+            self.assertTrue(np.array_equal(archive['image1.jpg'], expected[archive.file_names.index('image1.jpg')]))
+
+        with self.subTest(self, testing_for='unknown file name'):
+            with self.assertRaises(KeyError):
+                dummy = archive['fred.jpg']
+
+    def test_create_sharded_numpy_archive_from_images_dir__mixed_shapes(self):
+        FileTools.create_sharded_numpy_archive_from_images_dir(self.ImagesFolder, self.ArchiveDir, shard_size=5)
+
+        archive = ShardedArchive(self.ArchiveDir)
+        expected = np.asarray(Image.open(os.path.join(self.ImagesFolder, 'image1high.jpg')))
+
+        self.assertTrue(np.array_equal(archive['image1high.jpg'], expected))
+
+    def test_create_sharded_numpy_archive_from_images_dir__append_only_adds_new_images(self):
+        FileTools.create_sharded_numpy_archive_from_images_dir(self.ImagesFolder, self.ArchiveDir, shard_size=5,
+                                                               new_shape=(12, 12))
+
+        actual = FileTools.create_sharded_numpy_archive_from_images_dir(self.ImagesFolder, self.ArchiveDir,
+                                                                        shard_size=5, new_shape=(12, 12),
+                                                                        append=True)
+
+        with self.subTest(self, testing_for='result'):
+            self.assertTrue(actual.startswith('No new'))
+
+        with self.subTest(self, testing_for='number of images'):
+            self.assertEqual(len(ShardedArchive(self.ArchiveDir)), 18)
+
+
+if __name__ == '__main__':
+    unittest.main()
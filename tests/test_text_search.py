@@ -0,0 +1,55 @@
+# test_text_search.py
+
+import os
+import unittest
+
+from pathlib import Path
+from src.file_tools import FileTools
+from src.text_search import TextSearch
+
+
+class TextSearchTestCase(unittest.TestCase):
+    """Test names are generally self-explanatory and so docstrings not provided on an individual basis other
+    than by exception.
+
+    Keyword arguments:
+    TestCase -- standard class required for tests based on unittest.case
+    """
+
+    def setUp(self):
+        """Fixtures used by tests."""
+        self.Root = Path(__file__).parent
+        self.SearchDir = os.path.join(self.Root, 'test_for_search')
+        FileTools.ensure_empty_directory(self.SearchDir)
+        self.FilePath = os.path.join(self.SearchDir, 'log.txt')
+        Path(self.FilePath).write_bytes(b'start\r\nimport numpy as np\r\nnothing\r\nfrom os import path\\n\r\n'
+                                        b'caf\xc3\xa9 import')
+
+    def tearDown(self) -> None:
+        FileTools.ensure_empty_directory(self.SearchDir)
+
+    def test_search_file__returns_line_numbers_and_normalised_lines(self):
+        expected = [(2, 'import numpy as np'), (4, 'from os import path'), (5, 'café import')]
+
+        for kwargs in ({}, {'use_mmap': True}, {'block_size': 8}):
+            with self.subTest(self, testing_for=str(kwargs)):
+                self.assertEqual(list(TextSearch('import').search_file(self.FilePath, **kwargs)), expected)
+
+    def test_search_file__with_several_terms__reports_each_line_once(self):
+        actual = list(TextSearch(['from', 'import', 'os']).search_file(self.FilePath))
+
+        self.assertEqual([line_no for line_no, _ in actual], [2, 4, 5])
+
+    def test_search_files__when_glob__searches_matching_files(self):
+        Path(self.SearchDir, 'sub').mkdir()
+        Path(self.SearchDir, 'sub', 'other.txt').write_bytes(b'import sys\n')
+        Path(self.SearchDir, 'sub', 'skipped.csv').write_bytes(b'import,csv\n')
+
+        actual = list(TextSearch.search_files(os.path.join(self.SearchDir, '**', '*.txt'), 'import', workers=2))
+
+        self.assertEqual([(Path(file_path).name, line_no) for file_path, line_no, _ in actual],
+                         [('log.txt', 2), ('log.txt', 4), ('log.txt', 5), ('other.txt', 1)])
+
+
+if __name__ == '__main__':
+    unittest.main()